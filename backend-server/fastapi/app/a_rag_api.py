@@ -9,16 +9,18 @@ import re
 import logging
 import pickle
 import traceback
-from typing import List, Dict, Tuple, Set
+from typing import List, Dict, Optional, Tuple, Set
 from dotenv import load_dotenv
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from sqlalchemy import create_engine, text
+from sqlalchemy import bindparam, create_engine, text
 from sqlalchemy.orm import sessionmaker
 import faiss
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
+from app.topk_selector import TopKHeap, iter_batches
+
 # ================================================================
 # [1] 환경 설정 (세그폴트 방지)
 # ================================================================
@@ -70,6 +72,12 @@ try:
     DB_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     local_engine = create_engine(DB_URL)
     SessionLocal = sessionmaker(bind=local_engine, autocommit=False, autoflush=False)
+    _TITLE_QUERY = text(
+        "SELECT id, title FROM recipe_new WHERE id IN :ids"
+    ).bindparams(bindparam("ids", expanding=True))
+    _DETAIL_QUERY = text(
+        "SELECT * FROM recipe_new WHERE id IN :ids"
+    ).bindparams(bindparam("ids", expanding=True))
     print(f"✅ (rag_api) DB 연결 엔진 생성 성공 (대상: {DB_HOST}:{DB_PORT})")
 except Exception as e:
     print(f"🚨 (rag_api) [오류] DB 엔진 생성 실패: {e}")
@@ -145,7 +153,15 @@ def calculate_weighted_score(
 def classify_user_ingredients(ingredients: List[str]) -> Set[str]:
     return {extract_name(ing) for ing in ingredients}
 
-def recommend_recipes_new_table(user_ingredients: List[str], top_k: int = 538) -> List[Dict]:
+def recommend_recipes_new_table(
+    user_ingredients: List[str],
+    top_k: int = 538,
+    limit: Optional[int] = None
+) -> List[Dict]:
+    """
+    limit을 지정하면 상위 limit개만 힙으로 유지하고, 남은 후보가 k번째 점수를
+    넘을 수 없으면 조기 종료한다. recipe_new 전체 행(SELECT *)은 최종 페이지만 조회.
+    """
     if index is None:
         raise Exception("FAISS 인덱스가 로드되지 않았습니다.")
     user_set = classify_user_ingredients(user_ingredients)
@@ -161,29 +177,62 @@ def recommend_recipes_new_table(user_ingredients: List[str], top_k: int = 538) -
                 rid = metadata[idx].get("id")
                 if rid and (rid not in best or dist < best[rid][1]):
                     best[rid] = (idx, dist)
-        results = []
+
+        # 정렬 키 (주재료 매칭 수, 가중 점수) 의 상한: 모든 재료가 주/부재료 양쪽에 매칭된 경우
+        max_matches = len(user_set)
+        max_match_score = max_matches * (2.0 + 1.0) * 100
+
+        heap = TopKHeap(limit)
         seen = set()
-        for idx, dist in sorted(best.values(), key=lambda x: x[1]):
-            doc = metadata[idx]
-            rid = doc.get("id")
-            row = session.execute(
-                text("SELECT * FROM recipe_new WHERE id=:id"),
-                {"id": rid}
-            ).fetchone()
-            if not row or row.title in seen:
-                continue
-            seen.add(row.title)
-            recipe_ing_data = RECIPE_INGREDIENT_MAP.get(rid, {"main": set(), "sub": set()})
-            final_score, matched_main, matched_sub = calculate_weighted_score(
-                user_set,
-                recipe_ing_data["main"],
-                recipe_ing_data["sub"],
-                dist,
-                main_weight=2.0
-            )
-            if len(matched_main) == 0 and len(matched_sub) == 0:
-                continue
+        stopped_early = False
+        candidates = sorted(best.values(), key=lambda x: x[1])
+        for batch in iter_batches(candidates):
+            ids = [metadata[idx].get("id") for idx, _ in batch]
+            titles = {
+                row.id: row.title
+                for row in session.execute(_TITLE_QUERY, {"ids": ids}).fetchall()
+            }
+            for idx, dist in batch:
+                if not heap.can_beat((max_matches, max_match_score + 1 / (1 + dist))):
+                    stopped_early = True
+                    break
+                rid = metadata[idx].get("id")
+                title = titles.get(rid)
+                if title is None or title in seen:
+                    continue
+                seen.add(title)
+                recipe_ing_data = RECIPE_INGREDIENT_MAP.get(rid, {"main": set(), "sub": set()})
+                final_score, matched_main, matched_sub = calculate_weighted_score(
+                    user_set,
+                    recipe_ing_data["main"],
+                    recipe_ing_data["sub"],
+                    dist,
+                    main_weight=2.0
+                )
+                if len(matched_main) == 0 and len(matched_sub) == 0:
+                    continue
+                heap.push(
+                    (len(matched_main), final_score),
+                    (rid, final_score, matched_main, matched_sub, dist, recipe_ing_data)
+                )
+            if stopped_early:
+                break
+
+        page = heap.sorted_items()
+        rows = {}
+        if page:
+            rows = {
+                row.id: row
+                for row in session.execute(
+                    _DETAIL_QUERY, {"ids": [entry[0] for entry in page]}
+                ).fetchall()
+            }
 
+        results = []
+        for rid, final_score, matched_main, matched_sub, dist, recipe_ing_data in page:
+            row = rows.get(rid)
+            if not row:
+                continue
             recipe_details = dict(row._mapping)
             recipe_details["weighted_score"] = final_score
             recipe_details["matched_main_ingredients"] = matched_main
@@ -197,7 +246,7 @@ def recommend_recipes_new_table(user_ingredients: List[str], top_k: int = 538) -
             )
 
             results.append(recipe_details)
-        results.sort(key=lambda x: (len(x["matched_main_ingredients"]), x["weighted_score"]), reverse=True)
+        logger.info(f"RAG 추천: {len(results)}개 반환 (조기 종료: {stopped_early})")
         return results
     finally:
         session.close()
@@ -216,7 +265,11 @@ class RagRequest(BaseModel):
 def run_rag_search(request: RagRequest) -> Dict:
     try:
         ingredients_list = [item.strip() for item in request.raw_text.split(",")]
-        ranked_recipes = recommend_recipes_new_table(user_ingredients=ingredients_list, top_k=538)
+        ranked_recipes = recommend_recipes_new_table(
+            user_ingredients=ingredients_list,
+            top_k=538,
+            limit=request.top_k
+        )
         if not ranked_recipes:
             return {"success": True, "recipes": {}}
 
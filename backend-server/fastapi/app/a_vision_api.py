@@ -2,6 +2,8 @@ from fastapi import APIRouter, HTTPException, UploadFile, File
 from typing import Optional
 import logging
 
+from .fast_json import fast_json_response
+
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
@@ -142,10 +144,10 @@ def detect_ingredients(file: UploadFile = File(...)) -> dict:
         logger.info(f"완료: 총 {len(ingredients)}개 검출")
         logger.info("=" * 60)
         
-        return {
+        return fast_json_response({
             "success": True,
             "pipeline": detection
-        }
+        })
         
     except HTTPException:
         raise
@@ -212,7 +214,7 @@ def predict_ingredients(
         logger.info("=" * 60)
         
         # 프론트엔드가 기대하는 형식: 재료 리스트만 반환
-        return ingredients
+        return fast_json_response(ingredients)
         
     except HTTPException:
         raise
@@ -1,9 +1,24 @@
-from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, Query, UploadFile, File
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, Query, UploadFile, File, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 from app.faiss_search import recommend_recipes
 from app.faiss_search_weighted import recommend_recipes_weighted
 from app.faiss_search_new import recommend_recipes_new_table
+from app.fast_json import dumps_json, fast_json_response
+from app.audio_io import debug_save_audio, stt_files
+from app.http_clients import http_clients
+from app.inference_executor import InferenceQueueFull, llm_executor
+from app.ranking_cache import (
+    RANKING_WINDOW,
+    decode_cursor,
+    encode_cursor,
+    make_query_token,
+    parse_fields,
+    project_fields,
+    ranking_cache
+)
 import time
 import httpx
 import os
@@ -11,6 +26,7 @@ import uuid
 import logging
 import asyncio
 import json
+from contextlib import aclosing
 
 # 라우터 생성 및 CORS 설정
 router = APIRouter()
@@ -62,17 +78,54 @@ async def apply_rag_if_enabled(
         # RAG 실패 시 원본 결과 반환
         return results
 
-# /recommend 엔드포인트 (recipe_new 테이블 사용 - 가중치 기반 추천)
-@router.post("/recommend", response_model=List[dict])
-async def recommend(req: RecommendRequest, use_rag: bool = Query(False, description="RAG 활성화 여부")):
+# 추천 결과 페이지 구성 (페이지네이션 + 필드 선택)
+DEFAULT_PAGE_SIZE = 20
+RAG_FIELDS = ["recommendation_text", "enhanced"]
+
+async def build_recommendation_page(
+    endpoint: str,
+    req: RecommendRequest,
+    use_rag: bool,
+    response: Response,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+) -> List[dict]:
     """
-    recipe_new 테이블 기반 주재료/부재료 가중치 추천 (기본 엔드포인트)
+    recipe_new 추천 결과를 페이지 단위로 반환
     
-    Query Parameters:
-        use_rag: True면 FAISS 검색 후 LLM으로 추천 문구 생성 (RAG)
+    limit/offset/cursor가 모두 없으면 기존과 같이 전체 목록을 반환한다.
+    페이지 요청 시 랭킹은 질의 토큰별로 ranking_cache에 잠시 보관되어
+    다음 페이지 요청은 재계산 없이 캐시에서 잘라서 반환한다.
+    RAG는 반환되는 페이지의 레시피에만 적용된다.
+    
+    응답 헤더:
+        X-Query-Token: 질의 토큰
+        X-Next-Cursor: 다음 페이지 커서 (마지막 페이지면 없음)
+        X-Total-Count: 전체 결과 수 (랭킹 전체가 계산된 경우만)
     """
-    try:
-        # recipe_new 테이블 사용 (FAISS 검색)
+    projection = parse_fields(fields)
+    if projection and use_rag:
+        projection = projection + [f for f in RAG_FIELDS if f not in projection]
+    
+    payload = {
+        "ingredients": req.ingredients,
+        "main_ingredients": req.main_ingredients,
+        "sub_ingredients": req.sub_ingredients,
+        "main_weight": req.main_weight,
+    }
+    token = make_query_token(endpoint, payload)
+    if cursor:
+        try:
+            cursor_token, offset = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if cursor_token != token:
+            raise HTTPException(status_code=400, detail="커서가 현재 요청과 일치하지 않습니다.")
+    
+    # 페이지 요청이 아니면 기존 동작 유지 (전체 목록)
+    if limit is None and cursor is None and offset == 0:
         results = recommend_recipes_new_table(
             user_ingredients=req.ingredients,
             user_main_ingredients=req.main_ingredients,
@@ -81,15 +134,77 @@ async def recommend(req: RecommendRequest, use_rag: bool = Query(False, descript
         )
         if not results:
             raise HTTPException(status_code=404, detail="조건에 맞는 레시피가 없습니다.")
-        
-        # RAG 옵션이 활성화된 경우 LLM으로 추천 문구 생성
         results = await apply_rag_if_enabled(
             results=results,
             user_ingredients=req.ingredients,
             use_rag=use_rag
         )
-        
-        return results
+        return project_fields(results, projection) if projection else results
+    
+    page_size = limit or DEFAULT_PAGE_SIZE
+    # 다음 페이지 존재 여부 확인을 위해 한 개 더 필요
+    needed = offset + page_size + 1
+    cached = ranking_cache.get(token, needed)
+    if cached is None:
+        window = max(RANKING_WINDOW, needed)
+        ranking = recommend_recipes_new_table(
+            user_ingredients=req.ingredients,
+            user_main_ingredients=req.main_ingredients,
+            user_sub_ingredients=req.sub_ingredients,
+            main_weight=req.main_weight,
+            limit=window
+        )
+        complete = len(ranking) < window
+        ranking_cache.put(token, ranking, complete)
+    else:
+        ranking, complete = cached
+    
+    if not ranking:
+        raise HTTPException(status_code=404, detail="조건에 맞는 레시피가 없습니다.")
+    
+    # 캐시된 랭킹이 RAG 결과로 오염되지 않도록 사본 사용
+    page = [dict(r) for r in ranking[offset:offset + page_size]]
+    page = await apply_rag_if_enabled(
+        results=page,
+        user_ingredients=req.ingredients,
+        use_rag=use_rag
+    )
+    
+    response.headers["X-Query-Token"] = token
+    if offset + page_size < len(ranking):
+        response.headers["X-Next-Cursor"] = encode_cursor(token, offset + page_size)
+    if complete:
+        response.headers["X-Total-Count"] = str(len(ranking))
+    
+    return project_fields(page, projection) if projection else page
+
+# /recommend 엔드포인트 (recipe_new 테이블 사용 - 가중치 기반 추천)
+@router.post("/recommend", response_model=List[dict])
+async def recommend(
+    req: RecommendRequest,
+    response: Response,
+    use_rag: bool = Query(False, description="RAG 활성화 여부"),
+    limit: Optional[int] = Query(None, ge=1, le=100, description="페이지 크기 (미지정 시 전체 반환)"),
+    offset: int = Query(0, ge=0, description="페이지 시작 위치"),
+    cursor: Optional[str] = Query(None, description="이전 응답의 X-Next-Cursor 값"),
+    fields: Optional[str] = Query(None, description="반환할 필드 (예: id,title,score)")
+):
+    """
+    recipe_new 테이블 기반 주재료/부재료 가중치 추천 (기본 엔드포인트)
+    
+    Query Parameters:
+        use_rag: True면 FAISS 검색 후 LLM으로 추천 문구 생성 (RAG)
+        limit/offset/cursor: 페이지네이션 (다음 페이지 커서는 X-Next-Cursor 헤더)
+        fields: 쉼표로 구분한 필드 선택 (content 등 큰 필드 제외용)
+    """
+    try:
+        results = await build_recommendation_page(
+            "recommend", req, use_rag, response,
+            limit=limit, offset=offset, cursor=cursor, fields=fields
+        )
+        return fast_json_response(results, response)
+    except HTTPException:
+        raise
     except Exception as e:
         import logging
         logger = logging.getLogger(__name__)
@@ -112,7 +227,7 @@ def measure_performance(req: RecommendRequest):
     )
     execution_time = time.time() - start_time
     
-    return {
+    return fast_json_response({
         "ingredients": req.ingredients,
         "main_ingredients": req.main_ingredients,
         "sub_ingredients": req.sub_ingredients,
@@ -120,7 +235,7 @@ def measure_performance(req: RecommendRequest):
         "results_count": len(results),
         "execution_time": round(execution_time, 3),
         "results": results[:5]  # 상위 5개만 반환
-    }
+    })
 
 # /system/status 엔드포인트 (시스템 상태 확인)
 @router.get("/system/status")
@@ -156,8 +271,19 @@ def system_status():
             "message": "GPU를 사용할 수 없습니다. CPU 모드로 실행 중입니다."
         }
     
+    from .cook_session import session_manager
+    from .llm_client import llm_client
+    from .rag_text_cache import rag_text_cache
+    from .step_cache import modified_step_cache
+    
     return {
         "gpu": gpu_info,
+        "rag_text_cache": rag_text_cache.stats(),
+        "llm_client": llm_client.stats(),
+        "upstream_http": http_clients.stats(),
+        "cook_sessions": session_manager.backend.stats(),
+        "modified_step_cache": modified_step_cache.stats(),
+        "llm_executor": llm_executor.stats(),
         "timestamp": time.time()
     }
 
@@ -181,10 +307,7 @@ async def websocket_chat_endpoint(
     logger.info(f"클라이언트와 WebSocket 연결 성공. user_id={user_id}, recipe_id={recipe_id}")
     
     AI_SERVER_URL = os.getenv("AI_SERVER_URL", "http://203.252.240.65:8001")
-    TEMP_DIR = "/tmp"
-    os.makedirs(TEMP_DIR, exist_ok=True)
     
-    local_temp_files = []
     server1_response_files = []
     
     # 세션 및 레시피 정보 관리
@@ -204,10 +327,9 @@ async def websocket_chat_endpoint(
     # 레시피 정보 로드 (recipe_id가 있는 경우)
     if user_id and recipe_id:
         try:
-            session = session_manager.create_session(user_id, recipe_id)
             from .cook_api import load_recipe_data
             recipe_data = await load_recipe_data(recipe_id)
-            session.recipe_data = recipe_data
+            await session_manager.create_session(user_id, recipe_id, recipe_data)
             logger.info(f"레시피 정보 로드 완료: {recipe_data.get('title', 'Unknown')}")
         except Exception as e:
             logger.error(f"레시피 정보 로드 실패: {e}")
@@ -215,7 +337,7 @@ async def websocket_chat_endpoint(
     try:
         # 초기 인사말 전송 (레시피 정보가 있으면 RAG 프롬프트 사용)
         try:
-            async with httpx.AsyncClient(timeout=90.0) as client:
+            async with http_clients.borrow("ai") as client:
                 if recipe_data:
                     # RAG 프롬프트로 인사말 생성
                     recipe_json = {
@@ -228,7 +350,7 @@ async def websocket_chat_endpoint(
                     # 현재 세션의 제약사항 가져오기
                     constraints = []
                     if user_id:
-                        session = session_manager.get_session(user_id)
+                        session = await session_manager.get_session(user_id)
                         if session:
                             constraints = constraints_to_dict_list(session.constraints)
                     
@@ -267,19 +389,15 @@ async def websocket_chat_endpoint(
 
         # 사용자 음성 요청 처리 루프
         while True:
-            # 1. 클라이언트 음성 수신 및 임시 파일 생성
+            # 1. 클라이언트 음성 수신 (메모리에 유지, 디버그 설정 시에만 파일 저장)
             wav_data = await websocket.receive_bytes()
             uid = str(uuid.uuid4())
-            wav_path = os.path.join(TEMP_DIR, f"{uid}.wav")
-            local_temp_files.append(wav_path)
-            with open(wav_path, 'wb') as f: f.write(wav_data)
+            debug_save_audio(wav_data, uid)
             
             # 2. STT 요청 및 사용자 텍스트 우선 전송
             user_text = ""
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                with open(wav_path, "rb") as f_wav:
-                    files = {"audio": (f"{uid}.wav", f_wav, "audio/wav")}
-                    stt_response = await client.post(f"{AI_SERVER_URL}/stt", files=files)
+            async with http_clients.borrow("stt") as client:
+                stt_response = await client.post(f"{AI_SERVER_URL}/stt", files=stt_files(wav_data, uid))
                 stt_response.raise_for_status()
                 user_text = stt_response.json()["text"]
                 
@@ -287,22 +405,24 @@ async def websocket_chat_endpoint(
                 logger.info(f"사용자 텍스트 우선 전송 완료: {user_text}")
             
             # 3. 제약사항 감지 및 세션에 추가
+            # (LLM/TTS 호출 전에 바로 저장 - 호출이 실패해도 제약사항은 남고,
+            #  응답 생성 중 /cook/* 에서 바뀐 내용을 덮어쓰지 않음)
+            session = None
             if user_id:
-                session = session_manager.get_session(user_id)
-                if session:
-                    # 사용자 메시지에서 제약사항 파싱
-                    detected_constraints = constraint_parser.parse_message(user_text)
-                    if detected_constraints:
-                        for constraint in detected_constraints:
-                            session_manager.add_constraint(user_id, constraint)
-                        logger.info(f"제약사항 감지 및 추가: {[c.type for c in detected_constraints]}")
+                async with session_manager.turn(user_id) as session:
+                    if session:
+                        # 사용자 메시지에서 제약사항 파싱
+                        detected_constraints = constraint_parser.parse_message(user_text)
+                        if detected_constraints:
+                            for constraint in detected_constraints:
+                                session_manager.merge_constraint(session, constraint)
+                            logger.info(f"제약사항 감지 및 추가: {[c.type for c in detected_constraints]}")
             
             # 4. LLM/TTS 요청 및 결과 전송
-            async with httpx.AsyncClient(timeout=90.0) as client:
+            async with http_clients.borrow("ai") as client:
                 # 레시피 정보가 있고 "다음"이라고 말한 경우
                 if recipe_data and user_text.strip() in ["다음", "다음 단계", "다음으로"]:
                     # RAG 프롬프트로 단계 안내 생성
-                    session = session_manager.get_session(user_id) if user_id else None
                     current_step_index = session.current_step if session else 0
                     
                     steps = recipe_data.get("instructions", [])
@@ -338,9 +458,11 @@ async def websocket_chat_endpoint(
                         llm_response.raise_for_status()
                         bot_response_text = llm_response.json().get("response", current_step_text)
                         
-                        # 다음 단계로 이동
+                        # 다음 단계로 이동 (최신 세션 기준, 그사이 다른 곳에서 넘겼으면 그대로 둠)
                         if session:
-                            session.current_step += 1
+                            async with session_manager.turn(user_id) as latest:
+                                if latest and latest.current_step == current_step_index:
+                                    latest.current_step += 1
                     else:
                         bot_response_text = "모든 단계를 완료했습니다!"
                     
@@ -355,7 +477,6 @@ async def websocket_chat_endpoint(
                     # 일반 대화 또는 제약사항 언급 시
                     if recipe_data and user_id:
                         # 레시피 정보와 제약사항을 포함한 프롬프트 생성
-                        session = session_manager.get_session(user_id)
                         constraints = []
                         if session:
                             constraints = constraints_to_dict_list(session.constraints)
@@ -407,18 +528,12 @@ async def websocket_chat_endpoint(
     except Exception as e:
         logger.error(f"WebSocket 처리 중 예상치 못한 에러 발생: {e}")
     finally:
-        # 세션 종료 시 모든 임시 파일 정리
+        # 세션 종료 시 AI 서버의 응답 오디오 정리
         logger.info("세션 종료. 파일 정리를 시작합니다.")
-        for file_path in local_temp_files:
-            try:
-                if os.path.exists(file_path): os.remove(file_path)
-            except Exception as e:
-                logger.error(f"로컬 임시 파일 삭제 실패 {file_path}: {e}")
-        
         if server1_response_files:
             logger.info(f"서버 1의 응답 오디오 파일 {len(server1_response_files)}개 정리 시작...")
             try:
-                async with httpx.AsyncClient() as client:
+                async with http_clients.borrow("ai") as client:
                     delete_tasks = [client.delete(f"{AI_SERVER_URL}/audio/{fname}") for fname in server1_response_files]
                     await asyncio.gather(*delete_tasks, return_exceptions=True)
                 logger.info("서버 1 응답 오디오 파일 정리 완료.")
@@ -447,7 +562,7 @@ def recommend_legacy(req: RecommendRequest):
         results = recommend_recipes(req.ingredients)
         if not results:
             raise HTTPException(status_code=404, detail="조건에 맞는 레시피가 없습니다.")
-        return results
+        return fast_json_response(results)
     except Exception as e:
         import logging
         logger = logging.getLogger(__name__)
@@ -458,32 +573,28 @@ def recommend_legacy(req: RecommendRequest):
 @router.post("/recommend/weighted", response_model=List[dict])
 async def recommend_weighted(
     req: RecommendRequest,
-    use_rag: bool = Query(False, description="RAG 활성화 여부")
+    response: Response,
+    use_rag: bool = Query(False, description="RAG 활성화 여부"),
+    limit: Optional[int] = Query(None, ge=1, le=100, description="페이지 크기 (미지정 시 전체 반환)"),
+    offset: int = Query(0, ge=0, description="페이지 시작 위치"),
+    cursor: Optional[str] = Query(None, description="이전 응답의 X-Next-Cursor 값"),
+    fields: Optional[str] = Query(None, description="반환할 필드 (예: id,title,score)")
 ):
     """
     recipe_new 테이블 기반 주재료/부재료 가중치 추천 (명시적 엔드포인트)
     
     Query Parameters:
         use_rag: True면 FAISS 검색 후 LLM으로 추천 문구 생성 (RAG)
+        limit/offset/cursor/fields: /recommend와 동일
     """
     try:
-        results = recommend_recipes_new_table(
-            user_ingredients=req.ingredients,
-            user_main_ingredients=req.main_ingredients,
-            user_sub_ingredients=req.sub_ingredients,
-            main_weight=req.main_weight
-        )
-        if not results:
-            raise HTTPException(status_code=404, detail="조건에 맞는 레시피가 없습니다.")
-        
-        # RAG 옵션이 활성화된 경우 LLM으로 추천 문구 생성
-        results = await apply_rag_if_enabled(
-            results=results,
-            user_ingredients=req.ingredients,
-            use_rag=use_rag
+        results = await build_recommendation_page(
+            "recommend", req, use_rag, response,
+            limit=limit, offset=offset, cursor=cursor, fields=fields
         )
-        
-        return results
+        return fast_json_response(results, response)
+    except HTTPException:
+        raise
     except Exception as e:
         import logging
         logger = logging.getLogger(__name__)
@@ -494,37 +605,145 @@ async def recommend_weighted(
 @router.post("/recommend/new", response_model=List[dict])
 async def recommend_new_table(
     req: RecommendRequest,
-    use_rag: bool = Query(False, description="RAG 활성화 여부")
+    response: Response,
+    use_rag: bool = Query(False, description="RAG 활성화 여부"),
+    limit: Optional[int] = Query(None, ge=1, le=100, description="페이지 크기 (미지정 시 전체 반환)"),
+    offset: int = Query(0, ge=0, description="페이지 시작 위치"),
+    cursor: Optional[str] = Query(None, description="이전 응답의 X-Next-Cursor 값"),
+    fields: Optional[str] = Query(None, description="반환할 필드 (예: id,title,score)")
 ):
     """
     recipe_new 테이블 기반 추천 (별칭, /recommend와 동일)
     
     Query Parameters:
         use_rag: True면 FAISS 검색 후 LLM으로 추천 문구 생성 (RAG)
+        limit/offset/cursor/fields: /recommend와 동일
     """
-    return await recommend(req, use_rag=use_rag)
+    return await recommend(
+        req, response, use_rag=use_rag,
+        limit=limit, offset=offset, cursor=cursor, fields=fields
+    )
+
+# 스트리밍 추천 엔드포인트 (NDJSON / SSE)
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+def encode_stream_event(event: dict, stream_format: str) -> bytes:
+    """스트리밍 이벤트 한 개를 NDJSON 줄 또는 SSE 메시지로 인코딩"""
+    body = dumps_json(event)
+    if stream_format == "sse":
+        return b"event: " + event["type"].encode("utf-8") + b"\ndata: " + body + b"\n\n"
+    return body + b"\n"
+
+@router.post("/recommend/stream")
+async def recommend_stream(
+    req: RecommendRequest,
+    use_rag: bool = Query(False, description="RAG 활성화 여부"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=100, description="전송할 레시피 수"),
+    fields: Optional[str] = Query(None, description="반환할 필드 (예: id,title,score)"),
+    stream_format: str = Query("ndjson", alias="format", pattern="^(ndjson|sse)$", description="ndjson 또는 sse")
+):
+    """
+    recipe_new 추천 결과 스트리밍 (/recommend와 같은 랭킹)
+    
+    상위 레시피 카드를 먼저 전송하고, use_rag=true이면 각 레시피의
+    추천 문구를 LLM 호출이 끝나는 순서대로 이어서 전송한다.
+    
+    이벤트 형식 (NDJSON 한 줄 또는 SSE data):
+        {"type": "recipe", "rank": 0, "data": {...}}
+        {"type": "recommendation_text", "rank": 0, "id": 1, "recommendation_text": "...", "enhanced": true}
+        {"type": "done", "count": 20}
+        {"type": "error", "detail": "..."}
+    """
+    logger = logging.getLogger(__name__)
+    projection = parse_fields(fields)
+    
+    async def event_stream():
+        try:
+            # 점수 계산은 동기 함수이므로 이벤트 루프를 막지 않도록 스레드에서 실행
+            results = await run_in_threadpool(
+                recommend_recipes_new_table,
+                user_ingredients=req.ingredients,
+                user_main_ingredients=req.main_ingredients,
+                user_sub_ingredients=req.sub_ingredients,
+                main_weight=req.main_weight,
+                limit=limit
+            )
+        except Exception as e:
+            logger.error(f"스트리밍 추천 오류: {str(e)}")
+            yield encode_stream_event({"type": "error", "detail": f"추천 오류: {str(e)}"}, stream_format)
+            return
+        
+        if not results:
+            yield encode_stream_event({"type": "error", "detail": "조건에 맞는 레시피가 없습니다."}, stream_format)
+            return
+        
+        # 1) 랭킹된 레시피 카드 우선 전송
+        for rank, recipe in enumerate(results):
+            data = project_fields([recipe], projection)[0] if projection else recipe
+            yield encode_stream_event({"type": "recipe", "rank": rank, "data": data}, stream_format)
+        
+        # 2) RAG 추천 문구는 완료되는 순서대로 전송
+        if use_rag:
+            from .faiss_rag_service import iter_enhanced_recipes
+            async for rank, recipe in iter_enhanced_recipes(results, req.ingredients, top_n=20):
+                yield encode_stream_event({
+                    "type": "recommendation_text",
+                    "rank": rank,
+                    "id": recipe.get("id"),
+                    "recommendation_text": recipe.get("recommendation_text", ""),
+                    "enhanced": recipe.get("enhanced", False)
+                }, stream_format)
+        
+        yield encode_stream_event({"type": "done", "count": len(results)}, stream_format)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type=STREAM_MEDIA_TYPES[stream_format],
+        # nginx 프록시 버퍼링 비활성화 (이벤트 즉시 전달)
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def llama_chat_messages(request: dict) -> List[dict]:
+    """/llama/chat 요청 → 채팅 메시지 목록 (단일 message면 요리 도우미 시스템 메시지를 붙임)"""
+    # 메시지 추출
+    messages = request.get("messages", [])
+    user_message = request.get("message", "")
+    
+    # 단일 메시지인 경우 리스트로 변환
+    if user_message and not messages:
+        messages = [
+            {"role": "system", "content": "너는 친절한 한국 요리 도우미 셰프야. 사용자의 요리 관련 질문에 도움을 줘."},
+            {"role": "user", "content": user_message}
+        ]
+    return messages
+
+def recipe_guide_prompt(recipe_data: dict) -> str:
+    """/llama/recipe-guide 요청 → 요리 가이드 프롬프트"""
+    # 레시피 정보 추출
+    recipe_title = recipe_data.get("title", "레시피")
+    recipe_ingredients = recipe_data.get("ingredients", "")
+    recipe_content = recipe_data.get("content", "")
+    
+    return f"""다음 레시피에 대한 요리 가이드를 시작합니다.
+
+레시피 이름: {recipe_title}
+재료: {recipe_ingredients}
+조리법: {recipe_content[:500]}
+
+이 레시피에 대한 친절하고 단계별 요리 가이드를 제공해주세요. 첫 번째 단계부터 시작해서 차근차근 설명해주세요."""
 
 # LLM 챗봇 연동 엔드포인트 (Hugging Face 모델 사용)
 @router.post("/llama/chat")
-def llama_chat(request: dict):
-    """LLM 챗봇과 대화 (Hugging Face 모델 사용)"""
+async def llama_chat(request: dict):
+    """LLM 챗봇과 대화 (Hugging Face 모델 사용, 전용 추론 스레드에서 생성)"""
     try:
-        from .llm_service import get_llm_service
-        
-        # 메시지 추출
-        messages = request.get("messages", [])
-        user_message = request.get("message", "")
+        from .llm_service import aget_llm_service
         
-        # 단일 메시지인 경우 리스트로 변환
-        if user_message and not messages:
-            messages = [
-                {"role": "system", "content": "너는 친절한 한국 요리 도우미 셰프야. 사용자의 요리 관련 질문에 도움을 줘."},
-                {"role": "user", "content": user_message}
-            ]
+        messages = llama_chat_messages(request)
         
         # LLM 서비스 호출
-        llm_service = get_llm_service()
-        response_text = llm_service.chat(
+        llm_service = await aget_llm_service()
+        response_text = await llm_service.achat(
             messages=messages,
             max_length=256,
             temperature=0.7
@@ -536,6 +755,8 @@ def llama_chat(request: dict):
             "status": "success"
         }
         
+    except InferenceQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         import logging
         logger = logging.getLogger(__name__)
@@ -543,28 +764,17 @@ def llama_chat(request: dict):
         raise HTTPException(status_code=500, detail=f"LLM 챗봇 오류: {str(e)}")
 
 @router.post("/llama/recipe-guide")
-def llama_recipe_guide(recipe_data: dict):
+async def llama_recipe_guide(recipe_data: dict):
     """선택된 레시피로 LLM 챗봇 가이드 시작 (Hugging Face 모델 사용)"""
     try:
-        from .llm_service import get_llm_service
+        from .llm_service import aget_llm_service
         
-        # 레시피 정보 추출
         recipe_title = recipe_data.get("title", "레시피")
-        recipe_ingredients = recipe_data.get("ingredients", "")
-        recipe_content = recipe_data.get("content", "")
-        
-        # 프롬프트 생성
-        prompt = f"""다음 레시피에 대한 요리 가이드를 시작합니다.
-
-레시피 이름: {recipe_title}
-재료: {recipe_ingredients}
-조리법: {recipe_content[:500]}
-
-이 레시피에 대한 친절하고 단계별 요리 가이드를 제공해주세요. 첫 번째 단계부터 시작해서 차근차근 설명해주세요."""
+        prompt = recipe_guide_prompt(recipe_data)
         
         # LLM 서비스 호출
-        llm_service = get_llm_service()
-        guide_text = llm_service.generate(
+        llm_service = await aget_llm_service()
+        guide_text = await llm_service.agenerate(
             prompt=prompt,
             max_length=512,
             temperature=0.7
@@ -577,6 +787,8 @@ def llama_recipe_guide(recipe_data: dict):
             "status": "success"
         }
         
+    except InferenceQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         import logging
         logger = logging.getLogger(__name__)
@@ -590,18 +802,18 @@ def hello():
 
 # LLM 테스트 엔드포인트
 @router.post("/llm/test")
-def test_llm(request: dict):
+async def test_llm(request: dict):
     """Hugging Face LLM 테스트 엔드포인트"""
     try:
-        from .llm_service import get_llm_service
+        from .llm_service import aget_llm_service
         
         prompt = request.get("prompt", "안녕하세요!")
         max_length = request.get("max_length", 128)
         temperature = request.get("temperature", 0.7)
         
-        llm_service = get_llm_service()
+        llm_service = await aget_llm_service()
         
-        result = llm_service.generate(
+        result = await llm_service.agenerate(
             prompt=prompt,
             max_length=max_length,
             temperature=temperature
@@ -617,12 +829,134 @@ def test_llm(request: dict):
             "response_length": len(result)
         }
         
+    except InferenceQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         import logging
         logger = logging.getLogger(__name__)
         logger.error(f"LLM 테스트 오류: {str(e)}")
         raise HTTPException(status_code=500, detail=f"LLM 테스트 오류: {str(e)}")
 
+# ---------------- LLM 토큰 스트리밍 (/llama/chat, /llama/recipe-guide, /llm/test) ----------------
+
+LLM_STREAM_KINDS = ("chat", "recipe-guide", "test")
+
+async def llm_stream_events(kind: str, payload: dict) -> AsyncIterator[dict]:
+    """
+    LLM 응답을 생성되는 대로 이벤트로 변환 (HTTP 스트리밍/WebSocket 공통)
+    
+    이벤트 형식:
+        {"type": "token", "text": "..."}
+        {"type": "done", "response": "...", "model": "...", "ttft_ms": 120.5, "elapsed_ms": 2300.1}
+        {"type": "error", "status": 503, "detail": "..."}
+    """
+    logger = logging.getLogger(__name__)
+    started = time.perf_counter()
+    first_token_ms = None
+    chunks: List[str] = []
+    try:
+        from .llm_service import aget_llm_service
+        
+        llm_service = await aget_llm_service()
+        if kind == "chat":
+            stream = llm_service.astream_chat(llama_chat_messages(payload), max_length=256, temperature=0.7)
+        elif kind == "recipe-guide":
+            stream = llm_service.astream(recipe_guide_prompt(payload), max_length=512, temperature=0.7)
+        else:
+            stream = llm_service.astream(
+                payload.get("prompt", "안녕하세요!"),
+                max_length=payload.get("max_length", 128),
+                temperature=payload.get("temperature", 0.7)
+            )
+        
+        async with aclosing(stream):
+            async for text in stream:
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - started) * 1000
+                chunks.append(text)
+                yield {"type": "token", "text": text}
+    except InferenceQueueFull as e:
+        yield {"type": "error", "status": 503, "detail": str(e)}
+        return
+    except Exception as e:
+        logger.error(f"LLM 스트리밍 오류 ({kind}): {str(e)}")
+        yield {"type": "error", "status": 500, "detail": f"LLM 스트리밍 오류: {str(e)}"}
+        return
+    
+    yield {
+        "type": "done",
+        "response": "".join(chunks).strip(),
+        "model": llm_service.model_name,
+        "ttft_ms": round(first_token_ms, 1) if first_token_ms is not None else None,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+    }
+
+def llm_streaming_response(kind: str, payload: dict, stream_format: str) -> StreamingResponse:
+    async def event_stream():
+        async with aclosing(llm_stream_events(kind, payload)) as events:
+            async for event in events:
+                yield encode_stream_event(event, stream_format)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type=STREAM_MEDIA_TYPES[stream_format],
+        # nginx 프록시 버퍼링 비활성화 (토큰 즉시 전달)
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/llama/chat/stream")
+async def llama_chat_stream(
+    request: dict,
+    stream_format: str = Query("ndjson", alias="format", pattern="^(ndjson|sse)$", description="ndjson 또는 sse")
+):
+    """/llama/chat의 토큰 스트리밍 버전 (연결이 끊기면 생성도 중단)"""
+    return llm_streaming_response("chat", request, stream_format)
+
+@router.post("/llama/recipe-guide/stream")
+async def llama_recipe_guide_stream(
+    recipe_data: dict,
+    stream_format: str = Query("ndjson", alias="format", pattern="^(ndjson|sse)$", description="ndjson 또는 sse")
+):
+    """/llama/recipe-guide의 토큰 스트리밍 버전"""
+    return llm_streaming_response("recipe-guide", recipe_data, stream_format)
+
+@router.post("/llm/test/stream")
+async def test_llm_stream(
+    request: dict,
+    stream_format: str = Query("ndjson", alias="format", pattern="^(ndjson|sse)$", description="ndjson 또는 sse")
+):
+    """/llm/test의 토큰 스트리밍 버전"""
+    return llm_streaming_response("test", request, stream_format)
+
+@router.websocket("/ws/llama")
+async def websocket_llama_stream(websocket: WebSocket):
+    """
+    LLM 토큰 스트리밍 WebSocket
+    
+    요청 (텍스트 JSON, 한 번에 하나씩):
+        {"kind": "chat", "message": "..."} / {"kind": "recipe-guide", "title": ...} / {"kind": "test", "prompt": ...}
+    응답: llm_stream_events와 같은 이벤트를 JSON 텍스트로 전송 (done 또는 error로 끝남)
+    """
+    logger = logging.getLogger(__name__)
+    await websocket.accept()
+    try:
+        while True:
+            try:
+                payload = json.loads(await websocket.receive_text())
+            except json.JSONDecodeError:
+                await websocket.send_text(json.dumps({"type": "error", "status": 400, "detail": "JSON 형식이 아닙니다."}))
+                continue
+            kind = payload.get("kind", "chat") if isinstance(payload, dict) else None
+            if kind not in LLM_STREAM_KINDS:
+                await websocket.send_text(json.dumps({"type": "error", "status": 400, "detail": f"알 수 없는 kind: {kind}"}))
+                continue
+            # 전송 중 연결이 끊기면 aclosing이 스트림을 닫아 추론 작업도 취소
+            async with aclosing(llm_stream_events(kind, payload)) as events:
+                async for event in events:
+                    await websocket.send_text(json.dumps(event, ensure_ascii=False))
+    except WebSocketDisconnect:
+        logger.info("LLM 스트리밍 WebSocket 연결 종료")
+
 @router.get("/llm/status")
 def get_llm_status():
     """LLM 모델 상태 확인"""
@@ -635,7 +969,12 @@ def get_llm_status():
             "model_name": llm_service.model_name,
             "device": llm_service.device,
             "is_loaded": llm_service.is_loaded(),
-            "status": "ready" if llm_service.is_loaded() else "not_loaded"
+            "status": "ready" if llm_service.is_loaded() else "not_loaded",
+            "load": llm_service.load_info(),
+            "generation": llm_service.generation_stats(),
+            "prefix_cache": llm_service.prefix_cache_stats(),
+            "speculative": llm_service.speculative_stats(),
+            "executor": llm_executor.stats()
         }
         
     except Exception as e:
@@ -698,7 +1037,7 @@ def predict_ingredients(
         logger.info("=" * 60)
         
         # 프론트엔드가 기대하는 형식: 재료 리스트만 반환
-        return ingredients
+        return fast_json_response(ingredients)
         
     except HTTPException:
         raise
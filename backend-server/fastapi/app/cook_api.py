@@ -10,6 +10,8 @@ import logging
 import httpx
 import os
 
+from .recipe_steps import get_steps
+from .step_cache import make_step_key, modified_step_cache
 from .cook_session import (
     session_manager, 
     constraint_parser, 
@@ -57,11 +59,11 @@ class StepResponse(BaseModel):
 async def select_recipe(req: SelectRecipeRequest):
     """레시피 선택 및 세션 생성"""
     try:
-        session = session_manager.create_session(req.user_id, req.recipe_id)
-        
         # 레시피 데이터 로드 (실제로는 DB에서)
         recipe_data = await load_recipe_data(req.recipe_id)
-        session.recipe_data = recipe_data
+        session = await session_manager.create_session(req.user_id, req.recipe_id, recipe_data)
+        # 첫 단계 미리 생성
+        prefetch_step(session, 0)
         
         return SessionResponse(
             success=True,
@@ -76,19 +78,22 @@ async def select_recipe(req: SelectRecipeRequest):
 async def add_constraint(req: AddConstraintRequest):
     """제약사항 추가"""
     try:
-        session = session_manager.get_session(req.user_id)
-        if not session:
-            raise HTTPException(status_code=404, detail="세션을 찾을 수 없습니다")
-        
-        # 자연어 파싱 또는 직접 제약사항 사용
-        if req.parsed_constraints:
-            constraints = req.parsed_constraints
-        else:
-            constraints = constraint_parser.parse_message(req.message)
+        async with session_manager.turn(req.user_id) as session:
+            if not session:
+                raise HTTPException(status_code=404, detail="세션을 찾을 수 없습니다")
+            
+            # 자연어 파싱 또는 직접 제약사항 사용
+            if req.parsed_constraints:
+                constraints = req.parsed_constraints
+            else:
+                constraints = constraint_parser.parse_message(req.message)
+            
+            # 제약사항 추가 (턴 끝에 한 번만 저장)
+            for constraint in constraints:
+                session_manager.merge_constraint(session, constraint)
         
-        # 제약사항 추가
-        for constraint in constraints:
-            session_manager.add_constraint(req.user_id, constraint)
+        # 제약사항이 바뀌었으므로 이전 요구로 미리 생성하던 단계는 취소하고 현재 단계를 새로 생성
+        prefetch_step(session, session.current_step)
         
         return SessionResponse(
             success=True,
@@ -103,37 +108,29 @@ async def add_constraint(req: AddConstraintRequest):
 async def next_step(req: NextStepRequest):
     """다음 단계로 이동"""
     try:
-        session = session_manager.get_session(req.user_id)
-        if not session:
-            raise HTTPException(status_code=404, detail="세션을 찾을 수 없습니다")
-        
-        if not session.recipe_data:
-            raise HTTPException(status_code=400, detail="레시피 데이터가 없습니다")
-        
-        # 현재 단계 텍스트 가져오기
-        steps = session.recipe_data.get('instructions', [])
-        if session.current_step >= len(steps):
-            raise HTTPException(status_code=400, detail="모든 단계를 완료했습니다")
-        
-        original_step = steps[session.current_step]
-        
-        # 룰 기반 수정 적용
-        modification_result = rule_modifier.apply_modifications(
-            original_step, 
-            session.constraints
-        )
-        
-        # LLM을 통한 자연어 보정
-        modified_step = await generate_modified_step_with_llm(
-            session.recipe_data.get('title', ''),
-            session.current_step,
-            original_step,
-            session.constraints
-        )
-        
-        # 다음 단계로 이동
-        session.current_step += 1
-        
+        async with session_manager.turn(req.user_id) as session:
+            if not session:
+                raise HTTPException(status_code=404, detail="세션을 찾을 수 없습니다")
+
+            if not session.recipe_data:
+                raise HTTPException(status_code=400, detail="레시피 데이터가 없습니다")
+
+            # 현재 단계 텍스트 가져오기
+            steps = session.recipe_data.get('instructions', [])
+            if session.current_step >= len(steps):
+                raise HTTPException(status_code=400, detail="모든 단계를 완료했습니다")
+
+            original_step = steps[session.current_step]
+
+            # 룰/LLM 수정 결과 (레시피·단계·제약사항이 같으면 캐시 재사용)
+            modified_step = await get_modified_step(session, session.current_step)
+
+            # 다음 단계로 이동 (턴 끝에 저장)
+            session.current_step += 1
+
+        # 사용자가 이 단계를 요리하는 동안 다음 단계를 미리 생성
+        prefetch_step(session, session.current_step)
+
         return StepResponse(
             success=True,
             step_index=session.current_step - 1,
@@ -149,7 +146,7 @@ async def next_step(req: NextStepRequest):
 async def get_current_step(user_id: str):
     """현재 단계 조회"""
     try:
-        session = session_manager.get_session(user_id)
+        session = await session_manager.get_session(user_id)
         if not session:
             raise HTTPException(status_code=404, detail="세션을 찾을 수 없습니다")
         
@@ -162,13 +159,10 @@ async def get_current_step(user_id: str):
         
         original_step = steps[session.current_step]
         
-        # LLM을 통한 자연어 보정
-        modified_step = await generate_modified_step_with_llm(
-            session.recipe_data.get('title', ''),
-            session.current_step,
-            original_step,
-            session.constraints
-        )
+        # 룰/LLM 수정 결과 (레시피·단계·제약사항이 같으면 캐시 재사용)
+        modified_step = await get_modified_step(session, session.current_step)
+        # 다음 단계 미리 생성
+        prefetch_step(session, session.current_step + 1)
         
         return StepResponse(
             success=True,
@@ -185,7 +179,8 @@ async def get_current_step(user_id: str):
 async def clear_session(user_id: str):
     """세션 삭제"""
     try:
-        success = session_manager.clear_session(user_id)
+        success = await session_manager.clear_session(user_id)
+        modified_step_cache.cancel_prefetch(user_id)
         if success:
             return {"success": True, "message": "세션이 삭제되었습니다"}
         else:
@@ -214,19 +209,9 @@ async def load_recipe_data(recipe_id: int) -> Dict:
             if not result:
                 raise Exception(f"레시피 ID {recipe_id}를 찾을 수 없습니다")
             
-            # 조리법을 단계별로 분리
+            # 조리법을 단계별로 분리 (레시피 챗봇과 같은 분리기, content 기준 캐시)
             content = result.content or ""
-            instructions = []
-            
-            if content:
-                # 줄바꿈으로 분리하고 번호가 있는 단계들만 추출
-                lines = content.split('\n')
-                step_num = 1
-                for line in lines:
-                    line = line.strip()
-                    if line and not line.startswith('#'):  # 빈 줄과 주석 제외
-                        instructions.append(f"{step_num}. {line}")
-                        step_num += 1
+            instructions = [f"{i}. {step}" for i, step in enumerate(get_steps(content), start=1)]
             
             # 재료 리스트 파싱
             ingredients_str = result.ingredients or ""
@@ -260,43 +245,97 @@ async def load_recipe_data(recipe_id: int) -> Dict:
             "ingredients": ["김치", "계란", "밥", "참기름", "깨"]
         }
 
+def _step_key(session: SessionState, step_index: int) -> str:
+    original_step = session.recipe_data['instructions'][step_index]
+    return make_step_key(session.recipe_id, step_index, session.constraints, original_step)
+
+def _step_builder(session: SessionState, step_index: int):
+    """단계 생성 코루틴 팩토리 (세션 값은 지금 시점으로 고정)"""
+    title = session.recipe_data.get('title', '')
+    original_step = session.recipe_data['instructions'][step_index]
+    constraints = list(session.constraints)
+    return lambda: build_modified_step(title, step_index, original_step, constraints)
+
+async def get_modified_step(session: SessionState, step_index: int) -> str:
+    """수정된 단계 조회 (캐시 → 생성). LLM 실패 시 폴백 문장은 캐시하지 않음"""
+    try:
+        return await modified_step_cache.get_or_build(
+            _step_key(session, step_index),
+            _step_builder(session, step_index)
+        )
+    except Exception as e:
+        logger.error(f"LLM 요청 오류: {str(e)}")
+        # LLM 실패 시 룰 기반 결과 반환
+        original_step = session.recipe_data['instructions'][step_index]
+        return f"{original_step} (사용자 요구사항이 반영되었습니다: {', '.join([c.type for c in session.constraints])})"
+
+def prefetch_step(session: SessionState, step_index: int) -> None:
+    """해당 단계를 백그라운드에서 미리 생성 (같은 세션의 이전 미리 생성은 취소)"""
+    steps = (session.recipe_data or {}).get('instructions', [])
+    if step_index >= len(steps):
+        modified_step_cache.cancel_prefetch(session.user_id)
+        return
+    modified_step_cache.prefetch(
+        session.user_id,
+        _step_key(session, step_index),
+        _step_builder(session, step_index)
+    )
+
+async def build_modified_step(
+    recipe_title: str,
+    step_index: int,
+    original_step: str,
+    constraints: List[Constraint]
+) -> str:
+    """룰 엔진으로 단계를 고쳐 쓰고, 남은 요구가 있을 때만 룰 적용 결과를 LLM으로 보정"""
+    result = rule_modifier.apply_modifications(original_step, constraints)
+    if not result["unresolved"]:
+        return result["modified_text"]
+    return await generate_modified_step_with_llm(
+        recipe_title,
+        step_index,
+        result["modified_text"],
+        result["unresolved"]
+    )
+
 async def generate_modified_step_with_llm(
     recipe_title: str,
     step_index: int,
     original_step: str,
     constraints: List[Constraint]
 ) -> str:
-    """LLM을 사용하여 수정된 단계 생성 (Hugging Face 모델 사용)"""
-    try:
-        from .llm_service import get_llm_service
-        
-        # 제약사항을 텍스트로 변환
-        constraints_text = ", ".join([
-            f"{c.type}: {c.action}" + (f" ({c.degree})" if c.degree else "")
-            for c in constraints
-        ])
-        
-        prompt = f"""너는 한국 요리 도우미 셰프야. 사용자의 즉석 요구를 반영해 현재 단계만 안전하게 수정하되, 재료/비율/불 세기/타이밍을 구체적으로 제시해.
+    """
+    LLM을 사용하여 수정된 단계 생성 (Hugging Face 모델 사용)
+    모델 로딩/생성은 전용 추론 스레드에서 실행 (실패/대기열 초과 시 예외 → get_modified_step에서 폴백)
+    """
+    from .llm_service import aget_llm_service
+    
+    # 제약사항을 텍스트로 변환
+    constraints_text = ", ".join([
+        f"{c.type}: {c.action}" + (f" ({c.degree})" if c.degree else "")
+        for c in constraints
+    ])
+    
+    # 시스템 부분(지시 + 레시피 + 요구)은 같은 레시피/요구의 모든 단계에서 같으므로
+    # 로컬 모델이 KV 캐시를 재사용하고 단계별 부분만 새로 처리
+    prompt = f"""[시스템]
+너는 한국 요리 도우미 셰프야. 사용자의 즉석 요구를 반영해 현재 단계만 안전하게 수정하되, 재료/비율/불 세기/타이밍을 구체적으로 제시해.
 
 레시피 제목: {recipe_title}
-현재 단계 번호: {step_index}
-원문 단계: {original_step}
-
 사용자 요구(누적): {constraints_text}
 
-주어진 요구를 반영하여, "수정된 단계"만 2~3문장으로 출력하고, 가능하면 대체재 1가지와 주의사항 1가지를 덧붙여줘."""
-        
-        # LLM 서비스 호출
-        llm_service = get_llm_service()
-        modified_step = llm_service.generate(
-            prompt=prompt,
-            max_length=256,
-            temperature=0.7
-        )
-        
-        return modified_step if modified_step else original_step
-                
-    except Exception as e:
-        logger.error(f"LLM 요청 오류: {str(e)}")
-        # LLM 실패 시 룰 기반 결과 반환
-        return f"{original_step} (사용자 요구사항이 반영되었습니다: {', '.join([c.type for c in constraints])})"
+주어진 요구를 반영하여, "수정된 단계"만 2~3문장으로 출력하고, 가능하면 대체재 1가지와 주의사항 1가지를 덧붙여줘.
+
+[사용자]
+현재 단계 번호: {step_index}
+원문 단계: {original_step}"""
+    
+    # LLM 서비스 호출
+    llm_service = await aget_llm_service()
+    modified_step = await llm_service.agenerate(
+        prompt=prompt,
+        max_length=256,
+        temperature=0.7
+    )
+    
+    return modified_step if modified_step else original_step
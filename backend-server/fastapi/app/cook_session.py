@@ -3,11 +3,14 @@
 사용자별 세션 상태와 제약사항을 관리하는 모듈
 """
 
-from typing import Dict, List, Optional
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from pydantic import BaseModel
 import re
 import logging
 
+from .session_backend import SessionBackend, create_session_backend, decode_session, encode_session
+
 logger = logging.getLogger(__name__)
 
 class Constraint(BaseModel):
@@ -26,47 +29,102 @@ class SessionState(BaseModel):
     recipe_data: Optional[Dict] = None
 
 class CookSessionManager:
-    """요리 세션 관리자"""
+    """
+    요리 세션 관리자
+    세션은 SessionBackend(memory/redis)에 직렬화해 저장하므로 여러 워커가 같은 세션을 볼 수 있다.
+    한 요청(턴)에서 여러 번 바꾸는 경우 turn()으로 읽기 1회 + 쓰기 1회로 묶는다.
+    """
     
-    def __init__(self):
-        self.sessions: Dict[str, SessionState] = {}
+    def __init__(self, backend: Optional[SessionBackend] = None):
+        # memory 백엔드는 비정상 종료로 남은 세션을 TTL/LRU로 정리 (lifespan에서 스위퍼 시작)
+        self.backend = backend or create_session_backend()
+    
+    async def startup(self):
+        await self.backend.startup()
+    
+    async def shutdown(self):
+        await self.backend.close()
     
-    def create_session(self, user_id: str, recipe_id: int) -> SessionState:
+    @staticmethod
+    def _dump(session: SessionState) -> bytes:
+        data = session.model_dump() if hasattr(session, "model_dump") else session.dict()
+        return encode_session(data)
+    
+    @staticmethod
+    def _load(raw: bytes) -> SessionState:
+        data = decode_session(raw)
+        if hasattr(SessionState, "model_validate"):
+            return SessionState.model_validate(data)
+        return SessionState.parse_obj(data)
+    
+    async def create_session(self, user_id: str, recipe_id: int, recipe_data: Optional[Dict] = None) -> SessionState:
         """새 세션 생성"""
         session = SessionState(
             user_id=user_id,
             recipe_id=recipe_id,
             current_step=0,
-            constraints=[]
+            constraints=[],
+            recipe_data=recipe_data
         )
-        self.sessions[user_id] = session
+        await self.save_session(session)
         logger.info(f"세션 생성: {user_id}, 레시피: {recipe_id}")
         return session
     
-    def get_session(self, user_id: str) -> Optional[SessionState]:
+    async def get_session(self, user_id: str) -> Optional[SessionState]:
         """세션 조회"""
-        return self.sessions.get(user_id)
+        raw = await self.backend.get(user_id)
+        if raw is None:
+            return None
+        try:
+            return self._load(raw)
+        except Exception as e:
+            logger.error(f"세션 복원 실패: {user_id}, {e}")
+            return None
     
-    def add_constraint(self, user_id: str, constraint: Constraint) -> bool:
-        """제약사항 추가"""
-        session = self.get_session(user_id)
-        if not session:
-            return False
-        
-        # 중복 제약사항 제거 (같은 타입의 기존 제약사항)
+    async def save_session(self, session: SessionState) -> None:
+        """세션 저장"""
+        await self.backend.set(session.user_id, self._dump(session))
+    
+    @asynccontextmanager
+    async def turn(self, user_id: str) -> AsyncIterator[Optional[SessionState]]:
+        """
+        한 턴 동안 세션을 한 번 읽고, 블록 안에서 바꾼 내용을 끝에 한 번만 저장
+        (세션이 없으면 None, 예외가 나거나 바뀐 내용이 없으면 저장하지 않음)
+        """
+        raw = await self.backend.get(user_id)
+        session = None
+        if raw is not None:
+            try:
+                session = self._load(raw)
+            except Exception as e:
+                logger.error(f"세션 복원 실패: {user_id}, {e}")
+        yield session
+        if session is not None:
+            updated = self._dump(session)
+            if updated != raw:
+                await self.backend.set(user_id, updated)
+    
+    @staticmethod
+    def merge_constraint(session: SessionState, constraint: Constraint) -> None:
+        """제약사항 추가 (같은 타입의 기존 제약사항은 교체)"""
         session.constraints = [
             c for c in session.constraints 
             if c.type != constraint.type
         ]
-        
         session.constraints.append(constraint)
+    
+    async def add_constraint(self, user_id: str, constraint: Constraint) -> bool:
+        """제약사항 추가"""
+        async with self.turn(user_id) as session:
+            if not session:
+                return False
+            self.merge_constraint(session, constraint)
         logger.info(f"제약사항 추가: {user_id}, {constraint}")
         return True
     
-    def clear_session(self, user_id: str) -> bool:
+    async def clear_session(self, user_id: str) -> bool:
         """세션 삭제"""
-        if user_id in self.sessions:
-            del self.sessions[user_id]
+        if await self.backend.delete(user_id):
             logger.info(f"세션 삭제: {user_id}")
             return True
         return False
@@ -248,38 +306,222 @@ class ConstraintParser:
             "간편한": {"type": "simple_cooking", "action": "enforce", "degree": "medium"},
             "쉬운": {"type": "simple_cooking", "action": "enforce", "degree": "medium"},
         }
+        self.compile()
+    
+    def compile(self):
+        """
+        키워드 표를 하나의 정규식으로 컴파일 (keyword_mapping을 바꾼 뒤에는 다시 호출)
+        긴 키워드를 앞에 두어 같은 위치에서는 가장 긴 키워드가 이기고("더 매운" > "매운"),
+        겹치는 짧은 키워드는 따로 잡히지 않는다.
+        """
+        keywords = sorted(self.keyword_mapping, key=len, reverse=True)
+        self._pattern = re.compile("|".join(re.escape(k) for k in keywords))
+        # 키워드별 Constraint는 한 번만 생성해 재사용 (공유 객체이므로 수정하지 말 것)
+        self._constraints = {
+            keyword: Constraint(**data) for keyword, data in self.keyword_mapping.items()
+        }
     
     def parse_message(self, message: str) -> List[Constraint]:
-        """자연어 메시지를 제약사항으로 파싱"""
+        """자연어 메시지를 제약사항으로 파싱 (메시지를 한 번만 훑음, 메시지에 나온 순서)"""
         constraints = []
-        message_lower = message.lower()
+        seen = set()
         
-        for keyword, constraint_data in self.keyword_mapping.items():
-            if keyword in message_lower:
-                constraint = Constraint(**constraint_data)
-                constraints.append(constraint)
+        for match in self._pattern.finditer(message.lower()):
+            keyword = match.group()
+            if keyword not in seen:
+                seen.add(keyword)
+                constraints.append(self._constraints[keyword])
         
         return constraints
 
+# ========== 분량/조사 처리 (RuleBasedModifier용) ==========
+
+# 단위 (긴 것부터 매칭)
+_UNITS = sorted([
+    "큰술", "작은술", "숟가락", "스푼", "티스푼", "컵", "종이컵", "국자", "꼬집", "줌", "개", "쪽", "장",
+    "kg", "g", "ml", "mL", "L", "리터", "cc", "tbsp", "tsp", "Ts", "ts", "T", "t",
+], key=len, reverse=True)
+# 개수 단위는 0.5 단위로 반올림
+_COUNT_UNITS = {"개", "쪽", "장", "줌", "꼬집"}
+_WORD_NUMBERS = {"반": 0.5, "한": 1, "두": 2, "세": 3, "네": 4, "다섯": 5}
+_QUANTITY = r"\d+(?:\.\d+)?(?:/\d+)?|" + "|".join(sorted(_WORD_NUMBERS, key=len, reverse=True))
+# 재료 이름과 분량 사이의 조사/공백 ("고추장 1큰술", "고추장을 1 큰술", "고추장도 한 큰술")
+_MIDDLE = r"\s*(?:을|를|은|는|이|가|도)?\s*"
+_VAGUE_AMOUNTS = r"약간|조금|적당량|적당히"
+# 치환 뒤에 붙은 조사 (다음 글자가 한글이면 조사가 아니라 단어의 일부로 봄)
+_PARTICLE = re.compile(r"^(으로|로|을|를|이|가|은|는|과|와)(?![가-힣])")
+# 재료 이름이 한 단어로 쓰였는지: 앞은 한글이 아니고, 뒤는 (조사 +) 한글이 아닌 글자/문장 끝
+# ("새우젓", "멸치액젓", "계란말이", "청양고추"의 "고추"처럼 다른 단어의 일부면 제외)
+_WORD_START = r"(?<![가-힣])"
+_WORD_END = r"(?=(?:으로|로|을|를|이|가|은|는|과|와|도|만|의|에)?(?![가-힣]))"
+_PARTICLE_PAIRS = {
+    "을": ("을", "를"), "를": ("을", "를"),
+    "이": ("이", "가"), "가": ("이", "가"),
+    "은": ("은", "는"), "는": ("은", "는"),
+    "과": ("과", "와"), "와": ("과", "와"),
+}
+
+
+def _has_batchim(word: str) -> bool:
+    """마지막 글자에 받침이 있는지 (한글이 아니면 없음으로 처리)"""
+    if not word or not "가" <= word[-1] <= "힣":
+        return False
+    return (ord(word[-1]) - 0xAC00) % 28 != 0
+
+
+def _with_particle(word: str, particle: str) -> str:
+    """단어에 맞는 조사 붙이기 (_with_particle("두부", "을") → "두부를")"""
+    if particle in ("으로", "로"):
+        # ㄹ 받침 뒤에는 "로"
+        final = (ord(word[-1]) - 0xAC00) % 28 if _has_batchim(word) else 0
+        return word + ("으로" if final not in (0, 8) else "로")
+    with_batchim, without_batchim = _PARTICLE_PAIRS[particle]
+    return word + (with_batchim if _has_batchim(word) else without_batchim)
+
+
+def _parse_quantity(text: str) -> float:
+    if text in _WORD_NUMBERS:
+        return float(_WORD_NUMBERS[text])
+    if "/" in text:
+        numerator, denominator = text.split("/")
+        return float(numerator) / float(denominator)
+    return float(text)
+
+
+def _format_quantity(value: float, unit: str) -> str:
+    step = 0.5 if unit in _COUNT_UNITS else 0.1
+    value = max(step, round(value / step) * step)
+    return f"{value:.1f}".rstrip("0").rstrip(".")
+
+
+class _CompiledRule:
+    """(type, action, degree) 하나의 규칙을 미리 컴파일한 변환"""
+
+    def __init__(self, rules: Dict):
+        self.rules = rules
+        # 배율 적용 재료 (언급 / 분량 있음 / 약간·조금) - 대체 재료와 같이 한 단어로 쓰인 이름만
+        # ("참기름", "들기름"의 "기름", "초고추장"의 "고추장"은 바꾸지 않음)
+        self.scales = []
+        for name, factor in rules.items():
+            if isinstance(factor, (int, float)):
+                escaped = re.escape(name)
+                self.scales.append((
+                    name,
+                    float(factor),
+                    re.compile(_WORD_START + escaped + _WORD_END),
+                    re.compile(
+                        rf"{_WORD_START}(?P<head>{escaped}{_MIDDLE})(?P<qty>{_QUANTITY})(?P<sp>\s*)(?P<unit>{'|'.join(map(re.escape, _UNITS))})"
+                    ),
+                    re.compile(rf"{_WORD_START}(?P<head>{escaped}{_MIDDLE})(?P<amount>{_VAGUE_AMOUNTS})"),
+                ))
+        # 대체 재료 (한 단어로 쓰인 재료 이름만 - 합성어는 LLM 보정 대상으로 남김)
+        self.substitutes = {
+            name: value for name, value in rules.items()
+            if isinstance(value, str) and value != "추가"
+        }
+        self.substitute_pattern = None
+        if self.substitutes:
+            names = sorted(self.substitutes, key=len, reverse=True)
+            self.substitute_pattern = re.compile(
+                _WORD_START + "(" + "|".join(map(re.escape, names)) + ")" + _WORD_END
+            )
+        # 배율 재료가 있는 단계에만 덧붙이는 재료
+        self.additions = [name for name, value in rules.items() if value == "추가"]
+
+    def apply(self, text: str) -> Tuple[str, List[str], List[str]]:
+        """규칙 적용 → (수정된 텍스트, 바뀐 내용, 덧붙일 안내)"""
+        changes: List[str] = []
+        tips: List[str] = []
+
+        if self.substitute_pattern is not None:
+            text = self._substitute(text, changes)
+
+        touched = False
+        for name, factor, mention_pattern, quantity_pattern, vague_pattern in self.scales:
+            if not mention_pattern.search(text):
+                continue
+            touched = True
+
+            def scale(match: re.Match) -> str:
+                before = match.group(0)
+                quantity = _format_quantity(_parse_quantity(match.group("qty")) * factor, match.group("unit"))
+                after = f"{match.group('head')}{quantity}{match.group('sp')}{match.group('unit')}"
+                changes.append(f"{before} → {after}")
+                return after
+
+            def scale_vague(match: re.Match) -> str:
+                amount = "넉넉히" if factor > 1 else "아주 조금"
+                after = f"{match.group('head')}{amount}"
+                changes.append(f"{match.group(0)} → {after}")
+                return after
+
+            text, count = quantity_pattern.subn(scale, text)
+            if not count:
+                text, count = vague_pattern.subn(scale_vague, text)
+            if not count:
+                # 분량 없이 재료만 언급된 경우 비율로 안내
+                percent = round(abs(factor - 1) * 100)
+                direction = "더" if factor > 1 else "덜"
+                tips.append(f"{_with_particle(name, '은')} 평소보다 {percent}% {direction} 넣으세요.")
+
+        if touched:
+            for name in self.additions:
+                if name not in text:
+                    tips.append(f"{_with_particle(name, '을')} 약간 추가하세요.")
+        return text, changes, tips
+
+    def in_compound(self, text: str) -> bool:
+        """배율 재료 이름이 다른 단어의 일부로 나오는지 ("참기름 1작은술" - 룰로 바꾸지 못하므로 LLM 보정)"""
+        for name, _, mention_pattern, _, _ in self.scales:
+            if name in text and len(mention_pattern.findall(text)) < text.count(name):
+                return True
+        return False
+
+    def _substitute(self, text: str, changes: List[str]) -> str:
+        result = []
+        position = 0
+        for match in self.substitute_pattern.finditer(text):
+            name = match.group(1)
+            replacement = self.substitutes[name]
+            result.append(text[position:match.start()])
+            position = match.end()
+            particle = _PARTICLE.match(text[position:])
+            if particle:
+                result.append(_with_particle(replacement, particle.group(1)))
+                position += particle.end()
+            else:
+                result.append(replacement)
+            changes.append(f"{name} → {replacement}")
+        result.append(text[position:])
+        return "".join(result)
+
+
 class RuleBasedModifier:
-    """룰 기반 레시피 수정 클래스"""
+    """
+    룰 기반 레시피 수정 클래스
+    단계 문장의 분량("고추장 1큰술")을 배율에 맞게 고쳐 쓰고, 대체 재료로 바꾼다.
+    룰로 표현할 수 없는 요구만 unresolved로 돌려주어 LLM 보정에 넘긴다.
+    """
     
     def __init__(self):
-        # 변형 규칙 테이블
+        # 변형 규칙 테이블 (숫자: 분량 배율, 문자열: 대체 재료, "추가": 안내 문장으로 덧붙임)
         self.modification_rules = {
             "spice_level": {
                 "increase": {
+                    "light": {"고추장": 1.1, "고춧가루": 1.1},
                     "medium": {"고추장": 1.15, "고춧가루": 1.15},
                     "strong": {"고추장": 1.30, "고춧가루": 1.30, "청양고추": "추가"}
                 },
                 "decrease": {
-                    "light": {"고추장": 0.7, "고춧가루": 0.7}
+                    "light": {"고추장": 0.7, "고춧가루": 0.7},
+                    "medium": {"고추장": 0.5, "고춧가루": 0.5, "청양고추": 0.5},
+                    "strong": {"고추장": 0.3, "고춧가루": 0.3, "청양고추": "피망"}
                 }
             },
             "oil": {
                 "decrease": {
-                    "medium": {"식용유": 0.7, "물": "추가"},
-                    "strong": {"식용유": 0.5, "물": "추가"}
+                    "medium": {"식용유": 0.7, "기름": 0.7, "물": "추가"},
+                    "strong": {"식용유": 0.5, "기름": 0.5, "물": "추가"}
                 }
             },
             "low_salt": {
@@ -292,37 +534,115 @@ class RuleBasedModifier:
                 "enforce": {
                     "strong": {
                         "돼지고기": "두부", "소고기": "두부", "닭고기": "두부",
-                        "멸치": "다시마", "새우": "버섯", "계란": "두부"
+                        "멸치": "다시마", "새우": "버섯", "계란": "두부", "달걀": "두부"
                     }
                 }
             }
         }
+        # 재료 제거(알레르기/재료 빼기) 시 대체 재료: 값 → {단계에 나오는 이름: 대체 재료}
+        self.removal_substitutes = {
+            "우유": {"우유": "두유"},
+            "달걀": {"달걀": "두부", "계란": "두부"},
+            "밀": {"밀가루": "쌀가루"},
+            "글루텐": {"밀가루": "쌀가루"},
+            "돼지고기": {"돼지고기": "버섯"},
+            "소고기": {"소고기": "버섯"},
+            "닭고기": {"닭고기": "버섯"},
+            "멸치": {"멸치": "다시마"},
+            "새우": {"새우": "버섯"},
+            "고추": {"청양고추": "피망", "고추": "피망"},
+            "고춧가루": {"고춧가루": "파프리카 가루"},
+        }
+        # 비건 제약이 남아 있는지 확인할 동물성 재료 (일부라도 남으면 LLM 보정)
+        self.animal_ingredients = (
+            "고기", "돼지", "소고기", "닭", "오리고기", "베이컨", "햄", "소시지", "스팸", "육수", "사골",
+            "멸치", "새우", "참치", "연어", "고등어", "생선", "어묵", "오징어", "문어", "낙지", "조개",
+            "바지락", "홍합", "생굴", "굴소스", "꽃게", "게살", "젓갈", "액젓", "계란", "달걀", "우유",
+            "버터", "치즈", "생크림", "요거트", "마요네즈", "꿀", "피시소스",
+        )
+        self.compile()
+    
+    def compile(self):
+        """규칙 표를 미리 컴파일 (표를 바꾼 뒤에는 다시 호출)"""
+        self._compiled = {
+            (rule_type, action, degree): _CompiledRule(rules)
+            for rule_type, actions in self.modification_rules.items()
+            for action, degrees in actions.items()
+            for degree, rules in degrees.items()
+        }
+        self._compiled_removals = {
+            value: _CompiledRule(rules) for value, rules in self.removal_substitutes.items()
+        }
+    
+    def _removal_rule(self, constraint: Constraint) -> Tuple[Optional[_CompiledRule], List[str]]:
+        """재료 제거 제약 → (대체 규칙, 단계에서 찾을 재료 이름)"""
+        rule = self._compiled_removals.get(constraint.value)
+        names = list(rule.substitutes) if rule else [constraint.value]
+        return rule, names
     
     def apply_modifications(self, original_text: str, constraints: List[Constraint]) -> Dict:
-        """제약사항을 적용하여 수정된 텍스트 생성"""
+        """
+        제약사항을 적용하여 수정된 텍스트 생성
+        
+        Returns:
+            modified_text: 룰을 적용한 단계 문장
+            applied_rules: 적용된 규칙과 바뀐 내용
+            unresolved: 이 단계에 해당하지만 룰로 표현할 수 없는 제약 (LLM 보정 대상)
+        """
         modified_text = original_text
         applied_rules = []
+        unresolved = []
+        tips = []
         
         for constraint in constraints:
             rule_type = constraint.type
             action = constraint.action
             degree = constraint.degree or "medium"
             
-            if rule_type in self.modification_rules:
-                if action in self.modification_rules[rule_type]:
-                    if degree in self.modification_rules[rule_type][action]:
-                        rules = self.modification_rules[rule_type][action][degree]
-                        applied_rules.append({
-                            "type": rule_type,
-                            "action": action,
-                            "degree": degree,
-                            "rules": rules
-                        })
+            if action == "remove" and constraint.value and rule_type in ("allergy", "ingredient_remove"):
+                rule, names = self._removal_rule(constraint)
+                if not any(name in modified_text for name in names):
+                    continue  # 이 단계에는 해당 재료가 없음
+                if rule is None:
+                    unresolved.append(constraint)
+                    continue
+            else:
+                rule = self._compiled.get((rule_type, action, degree))
+                if rule is None:
+                    unresolved.append(constraint)
+                    continue
+            
+            modified_text, changes, rule_tips = rule.apply(modified_text)
+            tips.extend(tip for tip in rule_tips if tip not in tips)
+            # 식단/알레르기 제약은 룰이 실제로 바꾸고 해당 재료가 더 남지 않았을 때만 해결로 봄
+            # (합성어 "새우젓", 표에 없는 재료 "베이컨" 등은 LLM 보정으로 넘김)
+            if action == "remove" and constraint.value and rule_type in ("allergy", "ingredient_remove"):
+                if any(name in modified_text for name in names):
+                    unresolved.append(constraint)
+            elif rule_type == "vegan":
+                if not changes or any(name in modified_text for name in self.animal_ingredients):
+                    unresolved.append(constraint)
+            elif rule.in_compound(modified_text):
+                unresolved.append(constraint)
+            applied_rules.append({
+                "type": rule_type,
+                "action": action,
+                "degree": degree,
+                "rules": rule.rules,
+                "changes": changes
+            })
+        
+        if tips:
+            modified_text = modified_text.rstrip()
+            if not modified_text.endswith((".", "!", "?")):
+                modified_text += "."
+            modified_text = f"{modified_text} {' '.join(tips)}"
         
         return {
             "original_text": original_text,
             "modified_text": modified_text,
             "applied_rules": applied_rules,
+            "unresolved": unresolved,
             "constraints": constraints
         }
 
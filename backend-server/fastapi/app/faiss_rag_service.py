@@ -3,21 +3,256 @@ FAISS + RAG 통합 서비스
 FAISS로 레시피 검색 후, LLM으로 추천 문구 생성
 """
 
+import asyncio
 import logging
-from typing import List, Dict, Optional
-import httpx
+import re
+import time
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 import os
 
+from .llm_client import gather_until_deadline, llm_client
+from .rag_text_cache import rag_text_cache, recipe_cache_key
+
 logger = logging.getLogger(__name__)
 
-# AI 서버 URL (환경변수에서 가져오거나 기본값 사용)
-AI_SERVER_URL = os.getenv("AI_SERVER_URL", "http://203.252.240.65:8001")
+# RAG 요청 전체 마감 시간(초): 이 시간 안에 끝난 문구만 사용하고 나머지는 빈 문구
+RAG_DEADLINE_SECONDS = float(os.getenv("RAG_DEADLINE_SECONDS", "25"))
+
+# 배치 RAG: 한 프롬프트에 묶을 레시피 수 (1 이하이면 레시피별 개별 호출)
+RAG_BATCH_SIZE = int(os.getenv("RAG_BATCH_SIZE", "1"))
+# 배치 호출 시 레시피당 생성 토큰 상한 (배치 크기만큼 곱해서 전달)
+RAG_TOKENS_PER_RECIPE = int(os.getenv("RAG_TOKENS_PER_RECIPE", "120"))
+
+# "1. ", "1) ", "[1]", "1번.", "**1.**" 형태의 번호 항목 시작
+_NUMBERED_ITEM_PATTERN = re.compile(
+    r"^[ \t]*(?:\*\*)?(?:\[(\d{1,2})\]|(\d{1,2})[ \t]*(?:번)?[ \t]*[.)\]:：])(?:\*\*)?[ \t]*",
+    re.MULTILINE
+)
+# 항목 앞의 "[레시피명]:" / "레시피명 -" 접두어
+_TITLE_PREFIX_PATTERN = re.compile(r"^\[[^\]\n]{1,60}\][ \t]*[:：\-–]?[ \t]*")
+
+
+def build_recommendation_prompt(recipe: Dict, user_ingredients: List[str]) -> str:
+    """단일 레시피 추천 문구 생성용 프롬프트"""
+    title = recipe.get("title", "")
+    ingredients = recipe.get("ingredients", "")
+    matched_ingredients = recipe.get("matched_ingredients", [])
+    
+    return f"""사용자가 보유한 재료: {', '.join(user_ingredients)}
+
+레시피 정보:
+- 제목: {title}
+- 재료: {ingredients}
+- 매칭된 재료: {', '.join(matched_ingredients) if matched_ingredients else '없음'}
+
+위 레시피를 사용자의 보유 재료를 고려하여 2-3문장으로 추천 문구를 작성해주세요.
+예시: "이 레시피는 보유하신 [재료명]을 활용하여 만들 수 있습니다. [특징 설명]"
+간결하고 친근한 톤으로 작성해주세요."""
+
+
+async def generate_recommendation_text(
+    recipe: Dict,
+    user_ingredients: List[str]
+) -> Dict:
+    """
+    레시피 하나에 LLM 추천 문구 추가 (실패 시 빈 문구, enhanced=False)
+    
+    같은 (레시피, 매칭 재료) 조합의 문구가 캐시에 있으면 LLM을 호출하지 않는다.
+    """
+    cache_key = recipe_cache_key(recipe)
+    cached_text = rag_text_cache.get(cache_key)
+    if cached_text is not None:
+        recipe["recommendation_text"] = cached_text
+        recipe["enhanced"] = True
+        return recipe
+    
+    try:
+        prompt = build_recommendation_prompt(recipe, user_ingredients)
+        
+        # LLM 호출 (프로세스 전체 동시성 제한)
+        llm_response = await llm_client.generate({"prompt": prompt})
+        
+        # 레시피에 LLM 설명 추가
+        recipe["recommendation_text"] = llm_response.get("response", "")
+        recipe["enhanced"] = True
+        rag_text_cache.put(cache_key, recipe["recommendation_text"])
+        
+    except Exception as e:
+        logger.warning(f"레시피 '{recipe.get('title', 'Unknown')}' LLM 처리 실패: {e}")
+        recipe["recommendation_text"] = ""
+        recipe["enhanced"] = False
+
+    return recipe
+
+
+def _normalize_title(title: str) -> str:
+    return re.sub(r"[\s\[\]\"'*]", "", title or "")
+
+
+def parse_numbered_response(text: str, titles: List[str]) -> Dict[int, str]:
+    """
+    배치 프롬프트의 번호 매긴 응답을 {레시피 번호(1부터): 추천 문구} 로 분리
+
+    "1. 제목: 문구", "1) 문구", "[1] 문구", "**1.** [제목] - 문구" 등을 허용하고,
+    범위를 벗어난 번호, 중복 번호, 빈 문구는 버린다 (호출자가 개별 호출로 보충).
+    """
+    parsed: Dict[int, str] = {}
+    if not text:
+        return parsed
+
+    matches = list(_NUMBERED_ITEM_PATTERN.finditer(text))
+    for idx, match in enumerate(matches):
+        number = int(match.group(1) or match.group(2))
+        if not 1 <= number <= len(titles) or number in parsed:
+            continue
+        end = matches[idx + 1].start() if idx + 1 < len(matches) else len(text)
+        body = text[match.end():end].strip()
+
+        # 제목 접두어 제거: "[제목]: ..." 또는 "제목: ..." (해당 레시피 제목과 일치할 때만)
+        body = _TITLE_PREFIX_PATTERN.sub("", body, count=1)
+        head, sep, rest = body.partition(":")
+        if not sep:
+            head, sep, rest = body.partition(" - ")
+        if sep and head and _normalize_title(head) == _normalize_title(titles[number - 1]):
+            body = rest
+
+        body = " ".join(body.split()).strip(" \"'")
+        if body:
+            parsed[number] = body
+    return parsed
+
+
+async def generate_batch_recommendation_texts(
+    recipes: List[Dict],
+    user_ingredients: List[str]
+) -> List[Dict]:
+    """
+    레시피 여러 개의 추천 문구를 한 번의 LLM 호출로 생성
+
+    캐시에 있는 레시피는 프롬프트에서 빼고, 응답에서 번호를 찾지 못한
+    레시피는 generate_recommendation_text로 개별 호출해 보충한다.
+    """
+    pending = []
+    for recipe in recipes:
+        cached_text = rag_text_cache.get(recipe_cache_key(recipe))
+        if cached_text is not None:
+            recipe["recommendation_text"] = cached_text
+            recipe["enhanced"] = True
+        else:
+            pending.append(recipe)
+    if not pending:
+        return recipes
+    if len(pending) == 1:
+        await generate_recommendation_text(pending[0], user_ingredients)
+        return recipes
+
+    parsed: Dict[int, str] = {}
+    try:
+        prompt = create_rag_prompt_for_recipes(pending, user_ingredients, max_recipes=None)
+        llm_response = await llm_client.generate(
+            {"prompt": prompt, "max_new_tokens": RAG_TOKENS_PER_RECIPE * len(pending)},
+            timeout=llm_client.timeout + 10.0 * len(pending)  # 생성 길이에 비례해 여유
+        )
+        parsed = parse_numbered_response(
+            llm_response.get("response", ""),
+            [r.get("title", "") for r in pending]
+        )
+    except Exception as e:
+        logger.warning(f"배치 LLM 처리 실패 ({len(pending)}개), 개별 호출로 대체: {e}")
+
+    fallback = []
+    for number, recipe in enumerate(pending, 1):
+        text = parsed.get(number)
+        if text:
+            recipe["recommendation_text"] = text
+            recipe["enhanced"] = True
+            rag_text_cache.put(recipe_cache_key(recipe), text)
+        else:
+            fallback.append(recipe)
+
+    if fallback:
+        if parsed:
+            logger.info(f"배치 응답에서 {len(fallback)}/{len(pending)}개 문구 누락, 개별 호출로 보충")
+        await asyncio.gather(*[
+            generate_recommendation_text(recipe, user_ingredients)
+            for recipe in fallback
+        ])
+    return recipes
+
+
+def _split_batches(items: List, batch_size: Optional[int]) -> List[List]:
+    """batch_size(None이면 RAG_BATCH_SIZE) 단위로 분할, 1 이하이면 항목별 분할"""
+    size = RAG_BATCH_SIZE if batch_size is None else batch_size
+    size = max(size, 1)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+async def _enhance_batch(batch: List[Dict], user_ingredients: List[str]) -> List[Dict]:
+    if len(batch) == 1:
+        return [await generate_recommendation_text(batch[0], user_ingredients)]
+    return await generate_batch_recommendation_texts(batch, user_ingredients)
+
+
+def _mark_not_enhanced(recipes: List[Dict]) -> None:
+    """마감 시간 안에 문구가 만들어지지 않은 레시피 표시"""
+    for recipe in recipes:
+        if "recommendation_text" not in recipe:
+            recipe["recommendation_text"] = ""
+            recipe["enhanced"] = False
+
+
+async def iter_enhanced_recipes(
+    recipes: List[Dict],
+    user_ingredients: List[str],
+    top_n: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    deadline: Optional[float] = RAG_DEADLINE_SECONDS
+) -> AsyncIterator[Tuple[int, Dict]]:
+    """
+    상위 레시피의 LLM 추천 문구를 병렬 생성하고, 완료되는 순서대로
+    (원래 순위 인덱스, 레시피) 를 내보낸다 (스트리밍 응답용)
+
+    배치 모드(batch_size > 1)에서는 배치 하나가 끝날 때마다 그 배치의 레시피를 내보낸다.
+    deadline(초)이 지나면 남은 호출을 취소하고 나머지 레시피를 빈 문구로 내보낸다.
+    """
+    recipes_to_enhance = recipes if top_n is None else recipes[:top_n]
+    if not recipes_to_enhance:
+        return
+    
+    async def process(batch: List[Tuple[int, Dict]]) -> List[Tuple[int, Dict]]:
+        await _enhance_batch([r for _, r in batch], user_ingredients)
+        return batch
+    
+    batches = _split_batches(list(enumerate(recipes_to_enhance)), batch_size)
+    tasks = [asyncio.ensure_future(process(batch)) for batch in batches]
+    expires_at = None if deadline is None else time.monotonic() + deadline
+    emitted = set()
+    try:
+        for next_done in asyncio.as_completed(
+            tasks, timeout=None if expires_at is None else max(expires_at - time.monotonic(), 0.0)
+        ):
+            for i, recipe in await next_done:
+                emitted.add(i)
+                yield i, recipe
+    except asyncio.TimeoutError:
+        logger.warning(f"RAG 마감 시간({deadline}s) 초과: {len(recipes_to_enhance) - len(emitted)}개 문구 생략")
+        for i, recipe in enumerate(recipes_to_enhance):
+            if i not in emitted:
+                _mark_not_enhanced([recipe])
+                yield i, recipe
+    finally:
+        # 클라이언트가 중간에 끊거나 마감 시간이 지나면 남은 LLM 호출 취소
+        for task in tasks:
+            if not task.done():
+                task.cancel()
 
 
 async def enhance_recipes_with_llm(
     recipes: List[Dict],
     user_ingredients: List[str],
-    top_n: Optional[int] = None
+    top_n: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    deadline: Optional[float] = RAG_DEADLINE_SECONDS
 ) -> List[Dict]:
     """
     FAISS로 검색된 레시피에 LLM 기반 추천 문구 추가 (RAG)
@@ -26,9 +261,11 @@ async def enhance_recipes_with_llm(
         recipes: FAISS로 검색된 레시피 목록
         user_ingredients: 사용자 보유 재료
         top_n: LLM으로 설명을 생성할 상위 레시피 개수 (None이면 전체 처리)
+        batch_size: 한 번의 LLM 호출에 묶을 레시피 수 (None이면 RAG_BATCH_SIZE, 1이면 개별 호출)
+        deadline: 전체 마감 시간(초). 시간 안에 끝난 문구만 사용 (None이면 무제한)
     
     Returns:
-        LLM 설명이 추가된 레시피 목록
+        LLM 설명이 추가된 레시피 목록 (순위 순서 유지)
     """
     if not recipes:
         return recipes
@@ -39,98 +276,47 @@ async def enhance_recipes_with_llm(
     else:
         recipes_to_enhance = recipes[:top_n]
     
-    enhanced_recipes = []
-    
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # 병렬 처리를 위한 태스크 리스트
-            tasks = []
-            
-            # 각 레시피에 대한 비동기 처리 함수
-            async def process_recipe(r: Dict) -> Dict:
-                try:
-                    # 레시피 정보 추출
-                    title = r.get("title", "")
-                    ingredients = r.get("ingredients", "")
-                    matched_ingredients = r.get("matched_ingredients", [])
-                    
-                    # LLM 프롬프트 생성
-                    prompt = f"""사용자가 보유한 재료: {', '.join(user_ingredients)}
-
-레시피 정보:
-- 제목: {title}
-- 재료: {ingredients}
-- 매칭된 재료: {', '.join(matched_ingredients) if matched_ingredients else '없음'}
-
-위 레시피를 사용자의 보유 재료를 고려하여 2-3문장으로 추천 문구를 작성해주세요.
-예시: "이 레시피는 보유하신 [재료명]을 활용하여 만들 수 있습니다. [특징 설명]"
-간결하고 친근한 톤으로 작성해주세요."""
-
-                    # LLM 호출
-                    response = await client.post(
-                        f"{AI_SERVER_URL}/llm-generate",
-                        json={"prompt": prompt}
-                    )
-                    response.raise_for_status()
-                    llm_response = response.json()
-                    recommendation_text = llm_response.get("response", "")
-                    
-                    # 레시피에 LLM 설명 추가
-                    r["recommendation_text"] = recommendation_text
-                    r["enhanced"] = True
-                    
-                except Exception as e:
-                    logger.warning(f"레시피 '{r.get('title', 'Unknown')}' LLM 처리 실패: {e}")
-                    r["recommendation_text"] = ""
-                    r["enhanced"] = False
-                
-                return r
-            
-            # 모든 레시피에 대해 태스크 생성 (클로저 문제 방지를 위해 recipe를 직접 전달)
-            for recipe in recipes_to_enhance:
-                tasks.append(process_recipe(recipe))
-            
-            # 모든 레시피를 병렬로 처리 (예외 발생 시에도 계속 처리)
-            import asyncio
-            enhanced_recipes = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # 예외가 발생한 경우 처리
-            valid_recipes = []
-            for result in enhanced_recipes:
-                if isinstance(result, Exception):
-                    logger.warning(f"레시피 처리 중 예외 발생: {result}")
-                    continue
-                valid_recipes.append(result)
-            enhanced_recipes = valid_recipes
-            
-            # top_n이 지정된 경우 나머지 레시피 추가
-            if top_n is not None and top_n < len(recipes):
-                for recipe in recipes[top_n:]:
-                    recipe["recommendation_text"] = ""
-                    recipe["enhanced"] = False
-                    enhanced_recipes.append(recipe)
+        # 배치(또는 레시피) 단위로 병렬 처리, 마감 시간이 지나면 남은 호출 취소
+        batches = _split_batches(recipes_to_enhance, batch_size)
+        batch_results, timed_out = await gather_until_deadline(
+            [_enhance_batch(batch, user_ingredients) for batch in batches],
+            deadline
+        )
+        
+        for batch, result in zip(batches, batch_results):
+            if isinstance(result, Exception):
+                logger.warning(f"레시피 처리 중 예외 발생: {result}")
+            if result is None or isinstance(result, Exception):
+                _mark_not_enhanced(batch)
+        if timed_out:
+            logger.warning(f"RAG 마감 시간({deadline}s) 초과: {timed_out}개 호출 취소, 완료된 문구만 반환")
+        
+        # top_n이 지정된 경우 나머지 레시피는 문구 없이 유지
+        for recipe in recipes[len(recipes_to_enhance):]:
+            recipe["recommendation_text"] = ""
+            recipe["enhanced"] = False
     
     except Exception as e:
         logger.error(f"LLM 처리 중 오류: {e}")
         # LLM 실패 시 원본 레시피 반환 (recommendation_text는 빈 문자열)
-        for recipe in recipes:
-            if "recommendation_text" not in recipe:
-                recipe["recommendation_text"] = ""
-                recipe["enhanced"] = False
-        return recipes
+        _mark_not_enhanced(recipes)
     
-    return list(enhanced_recipes)
+    return recipes
 
 
 def create_rag_prompt_for_recipes(
     recipes: List[Dict],
-    user_ingredients: List[str]
+    user_ingredients: List[str],
+    max_recipes: Optional[int] = 5
 ) -> str:
     """
-    여러 레시피를 한 번에 LLM에 전달하는 프롬프트 생성
+    여러 레시피를 한 번에 LLM에 전달하는 프롬프트 생성 (max_recipes=None이면 전체)
     """
+    if max_recipes is not None:
+        recipes = recipes[:max_recipes]
     recipes_text = ""
-    for i, recipe in enumerate(recipes[:5], 1):  # 상위 5개만
+    for i, recipe in enumerate(recipes, 1):
         title = recipe.get("title", "")
         ingredients = recipe.get("ingredients", "")
         matched = recipe.get("matched_ingredients", [])
@@ -148,7 +334,7 @@ def create_rag_prompt_for_recipes(
 {recipes_text}
 
 각 레시피에 대해 사용자의 보유 재료를 고려한 2-3문장 추천 문구를 작성해주세요.
-각 레시피마다 번호와 함께 작성해주세요.
+각 레시피마다 목록과 같은 번호로 시작하는 한 줄로 작성하고, 번호를 빠뜨리지 마세요.
 예시:
 1. [레시피명]: 이 레시피는 보유하신 [재료명]을 활용하여...
 2. [레시피명]: [추천 문구]...
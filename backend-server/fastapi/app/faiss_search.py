@@ -1,7 +1,8 @@
 import faiss, pickle, numpy as np, math
 from sentence_transformers import SentenceTransformer
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
 from app.db import SessionLocal
+from app.topk_selector import TopKHeap, iter_batches
 import re
 
 INDEX_SAVE_PATH = "faiss_store/index.faiss"
@@ -13,6 +14,14 @@ index = faiss.read_index(INDEX_SAVE_PATH)
 with open(META_SAVE_PATH, "rb") as f:
     metadata = pickle.load(f)
 
+# 제목 중복 제거용 경량 조회 / 최종 페이지용 상세 조회
+_TITLE_QUERY = text(
+    "SELECT id, title FROM recipe WHERE id IN :ids"
+).bindparams(bindparam("ids", expanding=True))
+_DETAIL_QUERY = text(
+    "SELECT id, title, ingredients, content FROM recipe WHERE id IN :ids"
+).bindparams(bindparam("ids", expanding=True))
+
 # 동의어/유의어 사전
 SYNONYM_MAP = {
     # 계란 관련
@@ -113,7 +122,13 @@ def extract_name(ingredient):
     # 동의어 통일
     return SYNONYM_MAP.get(cleaned, cleaned) if cleaned else ingredient
 
-def recommend_recipes(user_ingredients: list, top_k: int = 500):
+def recommend_recipes(user_ingredients: list, top_k: int = 500, limit: int = None):
+    """
+    재료 매칭 기반 레시피 추천
+
+    limit을 지정하면 상위 limit개만 힙으로 유지하고, k번째 결과가 이미
+    만점(전체 재료 매칭)이면 남은 후보의 점수 계산을 건너뛴다.
+    """
     print(f"\n=== 검색 시작: {user_ingredients} ===")
     
     query = f"이 요리의 재료는 {', '.join(user_ingredients)}입니다."
@@ -133,49 +148,88 @@ def recommend_recipes(user_ingredients: list, top_k: int = 500):
 
         print(f"\n중복 제거 후 레시피 수: {len(best)}")
 
-        results = []
+        heap = TopKHeap(limit)
         seen = set()
+        logged = 0
+        stopped_early = False
         user_clean = [extract_name(i) for i in user_ingredients]
         print(f"\n정제된 사용자 재료: {user_clean}")
-
-        for idx, dist in sorted(best.values(), key=lambda x: x[1]):
-            doc = metadata[idx]
-            raw = doc.get("ingredients", "").replace(" ", "")
-            recipe_clean = [extract_name(i) for i in filter(None, raw.split(","))]
-            
-            if len(results) < 5:  # 처음 5개만 로그 출력
-                print(f"\n레시피: {doc.get('title')}")
-                print(f"원본 재료: {raw}")
-                print(f"정제된 재료: {recipe_clean}")
-
-            # 부분 포함 매칭: 입력 재료가 레시피 재료의 부분 문자열로 포함되어 있으면 매칭 인정
-            matched = []
-            for u in user_clean:
-                for r in recipe_clean:
-                    if u and r and (u in r or r in u):
-                        matched.append(u)
-                        break
-
-            if not matched:
+        # 정렬 키 (매칭 재료 수, 매칭 비율) 의 최대값 — 거리와 무관
+        upper_bound = (len(user_clean), 1.0)
+
+        candidates = sorted(best.values(), key=lambda x: x[1])
+        for batch in iter_batches(candidates):
+            matched_batch = []
+            for idx, dist in batch:
+                doc = metadata[idx]
+                raw = doc.get("ingredients", "").replace(" ", "")
+                recipe_clean = [extract_name(i) for i in filter(None, raw.split(","))]
+                
+                if logged < 5:  # 처음 5개만 로그 출력
+                    logged += 1
+                    print(f"\n레시피: {doc.get('title')}")
+                    print(f"원본 재료: {raw}")
+                    print(f"정제된 재료: {recipe_clean}")
+
+                # 부분 포함 매칭: 입력 재료가 레시피 재료의 부분 문자열로 포함되어 있으면 매칭 인정
+                matched = []
+                for u in user_clean:
+                    for r in recipe_clean:
+                        if u and r and (u in r or r in u):
+                            matched.append(u)
+                            break
+
+                if not matched:
+                    continue
+
+                # 매칭 점수 계산 방식 변경
+                match_score = len(matched) / len(user_clean)  # 사용자 재료 중 매칭된 비율
+
+                if match_score < 0.1:  # 임계값을 0.1로 낮춤 (10% 이상 매칭)
+                    continue
+
+                matched_batch.append((doc.get("id"), matched, match_score))
+
+            if not matched_batch:
                 continue
 
-            # 매칭 점수 계산 방식 변경
-            match_score = len(matched) / len(user_clean)  # 사용자 재료 중 매칭된 비율
-            dist_score = 1 / (1 + dist)
-            final_score = 0.3 * dist_score + 0.7 * match_score  # 매칭 점수 비중 증가
+            # 제목 중복 제거용 경량 조회 (content는 최종 페이지에서만 조회)
+            titles = {
+                row.id: row.title
+                for row in session.execute(
+                    _TITLE_QUERY, {"ids": [rid for rid, _, _ in matched_batch]}
+                ).fetchall()
+            }
+
+            for rid, matched, match_score in matched_batch:
+                if not heap.can_beat(upper_bound):
+                    stopped_early = True
+                    break
+                title = titles.get(rid)
+                if title is None or title in seen:
+                    continue
+                seen.add(title)
+                # 매칭된 재료 수를 우선적으로 고려하여 정렬
+                heap.push((len(matched), match_score), (rid, matched, match_score))
+
+            if stopped_early:
+                break
+
+        page = heap.sorted_items()
+        rows = {}
+        if page:
+            rows = {
+                row.id: row
+                for row in session.execute(
+                    _DETAIL_QUERY, {"ids": [rid for rid, _, _ in page]}
+                ).fetchall()
+            }
 
-            if match_score < 0.1:  # 임계값을 0.1로 낮춤 (10% 이상 매칭)
-                continue
-
-            rid = doc.get("id")
-            row = session.execute(
-                text("SELECT id, title, ingredients, content FROM recipe WHERE id=:id"),
-                {"id": rid}
-            ).fetchone()
-            if not row or row.title in seen:
+        results = []
+        for rid, matched, match_score in page:
+            row = rows.get(rid)
+            if not row:
                 continue
-            seen.add(row.title)
-
             content = row.content if isinstance(row.content, str) else str(row.content)
             results.append({
                 "title": row.title,
@@ -184,9 +238,6 @@ def recommend_recipes(user_ingredients: list, top_k: int = 500):
                 "match_score": match_score,
                 "matched_ingredients": matched
             })
-
-        # 매칭된 재료 수를 우선적으로 고려하여 정렬
-        results.sort(key=lambda x: (len(x["matched_ingredients"]), x["match_score"]), reverse=True)
         
-        print(f"\n최종 추천 결과: {len(results)}개")
+        print(f"\n최종 추천 결과: {len(results)}개 (조기 종료: {stopped_early})")
         return results
\ No newline at end of file
@@ -4,11 +4,13 @@ recipe_new 테이블용 주재료/부재료 가중치 기반 추천 시스템
 
 import faiss, pickle, numpy as np
 from sentence_transformers import SentenceTransformer
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
 from app.db import SessionLocal
+from app.recipe_steps import get_steps
+from app.topk_selector import TopKHeap, iter_batches
 import os
 import re
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 
 # 경로 설정: 컨테이너 내부 또는 로컬 실행 모두 지원
 def get_faiss_path(filename: str) -> str:
@@ -45,6 +47,19 @@ except Exception as e:
     index = None
     metadata = []
 
+# 인덱스 구축 시 미리 분리해 둔 조리 단계 (예전 metadata에는 없으므로 없으면 조회 시 분리)
+PRECOMPUTED_STEPS = {m["id"]: m["steps"] for m in metadata if m.get("steps")}
+
+# 점수 계산용 경량 조회 / 최종 페이지용 content 조회
+_SCORING_QUERY = text("""
+    SELECT id, title, ingredients, main_ingredients, sub_ingredients
+    FROM recipe_new
+    WHERE id IN :ids
+""").bindparams(bindparam("ids", expanding=True))
+_CONTENT_QUERY = text(
+    "SELECT id, content FROM recipe_new WHERE id IN :ids"
+).bindparams(bindparam("ids", expanding=True))
+
 # 동의어 사전
 SYNONYM_MAP = {
     "계란": "달걀", "달걀": "달걀", "진간장": "간장", "간장": "간장",
@@ -131,10 +146,17 @@ def recommend_recipes_new_table(
     user_main_ingredients: List[str] = None,
     user_sub_ingredients: List[str] = None,
     top_k: int = 500,
-    main_weight: float = 2.0
+    main_weight: float = 2.0,
+    limit: Optional[int] = None
 ) -> List[Dict]:
     """
     recipe_new 테이블 기반 주재료/부재료 가중치 추천
+
+    Args:
+        top_k: FAISS 검색 후보 수
+        limit: 반환할 결과 수 (None이면 조건을 만족하는 전체 반환)
+            지정하면 상위 limit개만 힙으로 유지하고, 남은 후보가 k번째 점수를
+            넘을 수 없으면 점수 계산을 조기 종료한다.
     """
     if index is None:
         raise Exception("FAISS 인덱스가 로드되지 않았습니다. build_faiss_new_table.py를 실행하세요.")
@@ -185,69 +207,82 @@ def recommend_recipes_new_table(
         
         print(f"중복 제거 후 레시피 수: {len(best)}")
         
-        results = []
+        candidates = sorted(best.values(), key=lambda x: x[1])
+        heap = TopKHeap(limit)
         seen = set()
+        scored = 0
+        stopped_early = False
         
-        for idx, dist in sorted(best.values(), key=lambda x: x[1]):
-            doc = metadata[idx]
-            rid = doc.get("id")
-            
-            # recipe_new 테이블에서 데이터 조회
-            row = session.execute(
-                text("""
-                    SELECT id, title, ingredients, content, 
-                           main_ingredients, sub_ingredients 
-                    FROM recipe_new
-                    WHERE id=:id
-                """),
-                {"id": rid}
-            ).fetchone()
+        # 1단계: 가벼운 컬럼만 배치 조회하여 점수 계산 (content 제외)
+        for batch in iter_batches(candidates):
+            ids = [metadata[idx].get("id") for idx, _ in batch]
+            rows = {
+                row.id: row for row in session.execute(_SCORING_QUERY, {"ids": ids}).fetchall()
+            }
             
-            if not row or row.title in seen:
-                continue
-            seen.add(row.title)
-            
-            # 주재료/부재료 파싱
-            recipe_main = []
-            recipe_sub = []
-            
-            if row.main_ingredients:
-                recipe_main = [extract_name(ing.strip()) 
-                             for ing in str(row.main_ingredients).split(",") if ing.strip()]
-            if row.sub_ingredients:
-                recipe_sub = [extract_name(ing.strip()) 
-                             for ing in str(row.sub_ingredients).split(",") if ing.strip()]
-            
-            # 주재료/부재료 정보가 없으면 전체 재료에서 추론
-            if not recipe_main and not recipe_sub and row.ingredients:
-                all_ingredients = [extract_name(ing.strip()) 
-                                 for ing in str(row.ingredients).split(",") if ing.strip()]
-                sub_keywords = ['소금', '설탕', '간장', '식용유', '물', '후추', '마늘', '파']
-                for ing in all_ingredients:
-                    if any(kw in ing for kw in sub_keywords):
-                        recipe_sub.append(ing)
-                    else:
-                        recipe_main.append(ing)
-            
-            # 가중치 적용 점수 계산
-            final_score, match_score, matched_main, matched_sub = calculate_weighted_score(
-                user_main_ingredients,
-                user_sub_ingredients,
-                recipe_main,
-                recipe_sub,
-                dist,
-                main_weight
-            )
-            
-            # 최소 매칭 기준
-            if not matched_main and len(user_main_ingredients) > 0:
-                if match_score < 0.2:
+            for idx, dist in batch:
+                # 남은 후보는 거리가 더 멀기 때문에 점수 상한도 단조 감소
+                if main_weight > 0 and not heap.can_beat(
+                    (len(user_main_ingredients), 0.2 * (1 / (1 + dist)) + 0.8)
+                ):
+                    stopped_early = True
+                    break
+                
+                rid = metadata[idx].get("id")
+                row = rows.get(rid)
+                if not row or row.title in seen:
                     continue
+                seen.add(row.title)
+                scored += 1
+                
+                recipe_main, recipe_sub = _split_recipe_ingredients(row)
+                
+                # 가중치 적용 점수 계산
+                final_score, match_score, matched_main, matched_sub = calculate_weighted_score(
+                    user_main_ingredients,
+                    user_sub_ingredients,
+                    recipe_main,
+                    recipe_sub,
+                    dist,
+                    main_weight
+                )
+                
+                # 최소 매칭 기준
+                if not matched_main and len(user_main_ingredients) > 0:
+                    if match_score < 0.2:
+                        continue
+                
+                if match_score < 0.1:
+                    continue
+                
+                # 정렬: 주재료 매칭 수 > 최종 점수
+                heap.push(
+                    (len(matched_main), final_score),
+                    (rid, row, recipe_main, recipe_sub, final_score, match_score,
+                     matched_main, matched_sub, dist)
+                )
             
-            if match_score < 0.1:
-                continue
-            
-            content = row.content if isinstance(row.content, str) else str(row.content)
+            if stopped_early:
+                break
+        
+        print(f"점수 계산 후보: {scored}개 (조기 종료: {stopped_early})")
+        
+        # 2단계: 최종 페이지에 대해서만 content 조회 및 결과 생성
+        page = heap.sorted_items()
+        contents = {}
+        if page:
+            contents = {
+                row.id: row.content
+                for row in session.execute(
+                    _CONTENT_QUERY, {"ids": [entry[0] for entry in page]}
+                ).fetchall()
+            }
+        
+        results = []
+        for (rid, row, recipe_main, recipe_sub, final_score, match_score,
+             matched_main, matched_sub, dist) in page:
+            content = contents.get(rid)
+            content = content if isinstance(content, str) else str(content)
             results.append({
                 "id": rid,
                 "title": row.title,
@@ -255,6 +290,7 @@ def recommend_recipes_new_table(
                 "main_ingredients": ",".join(recipe_main) if recipe_main else "",
                 "sub_ingredients": ",".join(recipe_sub) if recipe_sub else "",
                 "content": content.replace("\n", " "),
+                "steps": PRECOMPUTED_STEPS.get(rid) or list(get_steps(content)),
                 "score": final_score,
                 "match_score": match_score,
                 "matched_main_ingredients": matched_main,
@@ -263,20 +299,36 @@ def recommend_recipes_new_table(
                 "distance": float(dist)
             })
         
-        # 정렬: 주재료 매칭 수 > 최종 점수
-        results.sort(
-            key=lambda x: (
-                len(x["matched_main_ingredients"]),
-                x["score"]
-            ),
-            reverse=True
-        )
-        
         print(f"최종 추천 결과: {len(results)}개")
         return results
     finally:
         session.close()
 
+def _split_recipe_ingredients(row) -> Tuple[List[str], List[str]]:
+    """DB 행에서 주재료/부재료 목록 파싱 (정보가 없으면 전체 재료에서 추론)"""
+    recipe_main = []
+    recipe_sub = []
+    
+    if row.main_ingredients:
+        recipe_main = [extract_name(ing.strip()) 
+                     for ing in str(row.main_ingredients).split(",") if ing.strip()]
+    if row.sub_ingredients:
+        recipe_sub = [extract_name(ing.strip()) 
+                     for ing in str(row.sub_ingredients).split(",") if ing.strip()]
+    
+    # 주재료/부재료 정보가 없으면 전체 재료에서 추론
+    if not recipe_main and not recipe_sub and row.ingredients:
+        all_ingredients = [extract_name(ing.strip()) 
+                         for ing in str(row.ingredients).split(",") if ing.strip()]
+        sub_keywords = ['소금', '설탕', '간장', '식용유', '물', '후추', '마늘', '파']
+        for ing in all_ingredients:
+            if any(kw in ing for kw in sub_keywords):
+                recipe_sub.append(ing)
+            else:
+                recipe_main.append(ing)
+    
+    return recipe_main, recipe_sub
+
 def classify_user_ingredients(ingredients: List[str]) -> Tuple[List[str], List[str]]:
     """사용자 입력 재료를 주재료/부재료로 자동 분류"""
     main = []
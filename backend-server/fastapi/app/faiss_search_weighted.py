@@ -5,10 +5,11 @@
 
 import faiss, pickle, numpy as np
 from sentence_transformers import SentenceTransformer
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
 from app.db import SessionLocal
+from app.topk_selector import TopKHeap, iter_batches
 import re
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 
 INDEX_SAVE_PATH = "faiss_store/index.faiss"
 META_SAVE_PATH  = "faiss_store/metadata.pkl"
@@ -19,6 +20,16 @@ index = faiss.read_index(INDEX_SAVE_PATH)
 with open(META_SAVE_PATH, "rb") as f:
     metadata = pickle.load(f)
 
+# 점수 계산용 경량 조회 / 최종 페이지용 content 조회
+_SCORING_QUERY = text("""
+    SELECT id, title, ingredients, main_ingredients, sub_ingredients
+    FROM recipe
+    WHERE id IN :ids
+""").bindparams(bindparam("ids", expanding=True))
+_CONTENT_QUERY = text(
+    "SELECT id, content FROM recipe WHERE id IN :ids"
+).bindparams(bindparam("ids", expanding=True))
+
 # 동의어 사전 (기존과 동일)
 SYNONYM_MAP = {
     "계란": "달걀", "달걀": "달걀", "진간장": "간장", "간장": "간장",
@@ -120,7 +131,8 @@ def recommend_recipes_weighted(
     user_main_ingredients: List[str] = None,
     user_sub_ingredients: List[str] = None,
     top_k: int = 500,
-    main_weight: float = 2.0
+    main_weight: float = 2.0,
+    limit: Optional[int] = None
 ) -> List[Dict]:
     """
     주재료/부재료 가중치를 적용한 레시피 추천
@@ -131,6 +143,8 @@ def recommend_recipes_weighted(
         user_sub_ingredients: 사용자 부재료 목록 (옵션)
         top_k: FAISS 검색 후보 수
         main_weight: 주재료 가중치
+        limit: 반환할 결과 수 (None이면 전체). 지정하면 상위 limit개만 힙으로
+            유지하고 남은 후보가 k번째 점수를 넘을 수 없으면 조기 종료
     
     Returns:
         추천 레시피 목록 (주재료 매칭 우선 정렬)
@@ -166,71 +180,79 @@ def recommend_recipes_weighted(
         
         print(f"중복 제거 후 레시피 수: {len(best)}")
         
-        results = []
+        candidates = sorted(best.values(), key=lambda x: x[1])
+        heap = TopKHeap(limit)
         seen = set()
+        stopped_early = False
         
-        for idx, dist in sorted(best.values(), key=lambda x: x[1]):
-            doc = metadata[idx]
-            rid = doc.get("id")
-            
-            # DB에서 주재료/부재료 정보 조회
-            row = session.execute(
-                text("""
-                    SELECT id, title, ingredients, content, 
-                           main_ingredients, sub_ingredients 
-                    FROM recipe 
-                    WHERE id=:id
-                """),
-                {"id": rid}
-            ).fetchone()
-            
-            if not row or row.title in seen:
-                continue
-            seen.add(row.title)
-            
-            # 주재료/부재료 파싱
-            recipe_main = []
-            recipe_sub = []
+        # 1단계: 가벼운 컬럼만 배치 조회하여 점수 계산 (content 제외)
+        for batch in iter_batches(candidates):
+            ids = [metadata[idx].get("id") for idx, _ in batch]
+            rows = {
+                row.id: row for row in session.execute(_SCORING_QUERY, {"ids": ids}).fetchall()
+            }
             
-            if row.main_ingredients:
-                recipe_main = [extract_name(ing.strip()) 
-                             for ing in str(row.main_ingredients).split(",") if ing.strip()]
-            if row.sub_ingredients:
-                recipe_sub = [extract_name(ing.strip()) 
-                             for ing in str(row.sub_ingredients).split(",") if ing.strip()]
-            
-            # 주재료/부재료 정보가 없으면 기존 ingredients에서 추론
-            if not recipe_main and not recipe_sub and row.ingredients:
-                all_ingredients = [extract_name(ing.strip()) 
-                                 for ing in str(row.ingredients).split(",") if ing.strip()]
-                # 간단한 분류: 일부 재료는 부재료로 간주
-                sub_keywords = ['소금', '설탕', '간장', '식용유', '물', '후추', '마늘', '파']
-                for ing in all_ingredients:
-                    if any(kw in ing for kw in sub_keywords):
-                        recipe_sub.append(ing)
-                    else:
-                        recipe_main.append(ing)
-            
-            # 가중치 적용 점수 계산
-            final_score, match_score, matched_main, matched_sub = calculate_weighted_score(
-                user_main_ingredients,
-                user_sub_ingredients,
-                recipe_main,
-                recipe_sub,
-                dist,
-                main_weight
-            )
-            
-            # 최소 매칭 기준 (주재료가 하나라도 매칭되어야 함)
-            if not matched_main and len(user_main_ingredients) > 0:
-                # 주재료가 있는데 매칭이 없으면 점수 낮춤
-                if match_score < 0.2:
+            for idx, dist in batch:
+                # 남은 후보는 거리가 더 멀기 때문에 점수 상한도 단조 감소
+                if main_weight > 0 and not heap.can_beat(
+                    (len(user_main_ingredients), 0.2 * (1 / (1 + dist)) + 0.8)
+                ):
+                    stopped_early = True
+                    break
+                
+                rid = metadata[idx].get("id")
+                row = rows.get(rid)
+                if not row or row.title in seen:
                     continue
+                seen.add(row.title)
+                
+                recipe_main, recipe_sub = _split_recipe_ingredients(row)
+                
+                # 가중치 적용 점수 계산
+                final_score, match_score, matched_main, matched_sub = calculate_weighted_score(
+                    user_main_ingredients,
+                    user_sub_ingredients,
+                    recipe_main,
+                    recipe_sub,
+                    dist,
+                    main_weight
+                )
+                
+                # 최소 매칭 기준 (주재료가 하나라도 매칭되어야 함)
+                if not matched_main and len(user_main_ingredients) > 0:
+                    # 주재료가 있는데 매칭이 없으면 점수 낮춤
+                    if match_score < 0.2:
+                        continue
+                
+                if match_score < 0.1:  # 최소 10% 매칭 필요
+                    continue
+                
+                # 정렬: 주재료 매칭 수 (우선) > 최종 점수
+                heap.push(
+                    (len(matched_main), final_score),
+                    (rid, row, recipe_main, recipe_sub, final_score, match_score,
+                     matched_main, matched_sub, dist)
+                )
             
-            if match_score < 0.1:  # 최소 10% 매칭 필요
-                continue
-            
-            content = row.content if isinstance(row.content, str) else str(row.content)
+            if stopped_early:
+                break
+        
+        # 2단계: 최종 페이지에 대해서만 content 조회 및 결과 생성
+        page = heap.sorted_items()
+        contents = {}
+        if page:
+            contents = {
+                row.id: row.content
+                for row in session.execute(
+                    _CONTENT_QUERY, {"ids": [entry[0] for entry in page]}
+                ).fetchall()
+            }
+        
+        results = []
+        for (rid, row, recipe_main, recipe_sub, final_score, match_score,
+             matched_main, matched_sub, dist) in page:
+            content = contents.get(rid)
+            content = content if isinstance(content, str) else str(content)
             results.append({
                 "id": rid,
                 "title": row.title,
@@ -246,22 +268,39 @@ def recommend_recipes_weighted(
                 "distance": float(dist)
             })
         
-        # 정렬: 주재료 매칭 수 > 최종 점수
-        results.sort(
-            key=lambda x: (
-                len(x["matched_main_ingredients"]),  # 주재료 매칭 수 (우선)
-                x["score"]  # 최종 점수
-            ),
-            reverse=True
-        )
-        
-        print(f"\n최종 추천 결과: {len(results)}개")
+        print(f"\n최종 추천 결과: {len(results)}개 (조기 종료: {stopped_early})")
         if results:
             print(f"최고 점수 레시피: {results[0]['title']}")
             print(f"  주재료 매칭: {results[0]['matched_main_ingredients']}")
         
         return results
 
+def _split_recipe_ingredients(row) -> Tuple[List[str], List[str]]:
+    """DB 행에서 주재료/부재료 목록 파싱 (정보가 없으면 기존 ingredients에서 추론)"""
+    recipe_main = []
+    recipe_sub = []
+    
+    if row.main_ingredients:
+        recipe_main = [extract_name(ing.strip()) 
+                     for ing in str(row.main_ingredients).split(",") if ing.strip()]
+    if row.sub_ingredients:
+        recipe_sub = [extract_name(ing.strip()) 
+                     for ing in str(row.sub_ingredients).split(",") if ing.strip()]
+    
+    # 주재료/부재료 정보가 없으면 기존 ingredients에서 추론
+    if not recipe_main and not recipe_sub and row.ingredients:
+        all_ingredients = [extract_name(ing.strip()) 
+                         for ing in str(row.ingredients).split(",") if ing.strip()]
+        # 간단한 분류: 일부 재료는 부재료로 간주
+        sub_keywords = ['소금', '설탕', '간장', '식용유', '물', '후추', '마늘', '파']
+        for ing in all_ingredients:
+            if any(kw in ing for kw in sub_keywords):
+                recipe_sub.append(ing)
+            else:
+                recipe_main.append(ing)
+    
+    return recipe_main, recipe_sub
+
 def classify_user_ingredients(ingredients: List[str]) -> Tuple[List[str], List[str]]:
     """
     사용자 입력 재료를 주재료/부재료로 자동 분류
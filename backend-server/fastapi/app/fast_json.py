@@ -0,0 +1,90 @@
+"""
+orjson 기반 빠른 JSON 응답
+추천/비전 엔드포인트의 큰 dict 목록을 pydantic 검증 없이 바로 직렬화
+FAST_JSON_RESPONSE=true 환경변수로 활성화 (기본 비활성)
+"""
+
+import json
+import os
+import logging
+from decimal import Decimal
+from typing import Any, Optional
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # orjson 미설치 시 표준 JSONResponse로 폴백
+    orjson = None
+
+FAST_JSON_ENABLED = os.getenv("FAST_JSON_RESPONSE", "false").lower() in ("1", "true", "yes")
+
+if FAST_JSON_ENABLED and orjson is None:
+    logger.warning("FAST_JSON_RESPONSE가 설정되었지만 orjson이 없어 기본 JSON 응답을 사용합니다.")
+
+
+def _default(obj: Any) -> Any:
+    """orjson이 기본 지원하지 않는 타입 변환 (numpy 스칼라, Decimal, set 등)"""
+    if hasattr(obj, "item") and callable(obj.item):
+        # numpy 스칼라 (OPT_SERIALIZE_NUMPY가 처리하지 않는 float16 등)
+        return obj.item()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode("utf-8", errors="replace")
+    raise TypeError(f"JSON으로 직렬화할 수 없는 타입: {type(obj).__name__}")
+
+
+class FastJSONResponse(JSONResponse):
+    """orjson으로 직렬화하는 JSONResponse (numpy 스칼라/배열 네이티브 변환)"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(jsonable_encoder(content))
+        return orjson.dumps(
+            content,
+            default=_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        )
+
+
+def fast_json_response(content: Any, response: Optional[Response] = None) -> Any:
+    """
+    빠른 응답 경로가 켜져 있으면 FastJSONResponse로 감싸서 반환
+
+    엔드포인트가 Response 객체를 반환하면 FastAPI는 response_model 검증과
+    jsonable_encoder 변환을 건너뛴다. 꺼져 있으면 content를 그대로 반환해
+    기존 경로(검증 + 기본 인코더)를 사용한다.
+
+    Args:
+        content: 응답 본문 (dict / list)
+        response: 엔드포인트에 주입된 Response (설정된 헤더를 옮겨 담음)
+    """
+    if not FAST_JSON_ENABLED:
+        return content
+    headers = None
+    if response is not None:
+        headers = {
+            k: v for k, v in response.headers.items()
+            if k.lower() != "content-length"
+        }
+    return FastJSONResponse(content, headers=headers)
+
+
+def dumps_json(content: Any) -> bytes:
+    """스트리밍 응답 등에서 쓰는 단일 JSON 문서 직렬화 (orjson 우선)"""
+    if orjson is not None:
+        return orjson.dumps(
+            content,
+            default=_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        )
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False).encode("utf-8")
@@ -0,0 +1,145 @@
+"""
+AI 서버 업스트림별 공유 HTTP 클라이언트
+- 업스트림(LLM / STT / TTS / 기타 AI 서버 API)마다 httpx.AsyncClient 하나를 프로세스 전체에서 재사용
+  → 웹소켓 턴마다 새 TCP 연결을 맺지 않고 keep-alive 연결 풀 사용
+- HTTP/2는 h2 패키지가 있고 https 업스트림일 때 ALPN으로 협상 (http:// 는 HTTP/1.1 유지)
+- 업스트림별 타임아웃 / 연결 수 제한, 풀 지표(요청 수, 사용 중, 연결 수)
+- 앱 lifespan에서 startup()/shutdown() 호출
+"""
+
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401  (httpx HTTP/2 지원에 필요)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+HTTP2_ENABLED = os.getenv("UPSTREAM_HTTP2", "true").lower() in ("1", "true", "yes") and HTTP2_AVAILABLE
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+# 업스트림별 설정: (전체 타임아웃, 최대 연결 수, keep-alive 연결 수)
+UPSTREAM_SETTINGS: Dict[str, Dict] = {
+    "llm": {"timeout": _env_float("UPSTREAM_TIMEOUT_LLM", 300.0), "max_connections": 8, "keepalive": 4},
+    "stt": {"timeout": _env_float("UPSTREAM_TIMEOUT_STT", 60.0), "max_connections": 8, "keepalive": 4},
+    "tts": {"timeout": _env_float("UPSTREAM_TIMEOUT_TTS", 300.0), "max_connections": 16, "keepalive": 8},
+    "ai": {"timeout": _env_float("UPSTREAM_TIMEOUT_AI", 90.0), "max_connections": 16, "keepalive": 8},
+}
+CONNECT_TIMEOUT = _env_float("UPSTREAM_CONNECT_TIMEOUT", 10.0)
+KEEPALIVE_EXPIRY = _env_float("UPSTREAM_KEEPALIVE_EXPIRY", 60.0)
+
+
+class UpstreamClients:
+    """업스트림 이름 → 공유 httpx.AsyncClient"""
+
+    def __init__(self, settings: Dict[str, Dict] = UPSTREAM_SETTINGS):
+        self.settings = settings
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._requests: Dict[str, int] = {name: 0 for name in settings}
+        self._errors: Dict[str, int] = {name: 0 for name in settings}
+        self._in_use: Dict[str, int] = {name: 0 for name in settings}
+        self._created_at: Optional[float] = None
+
+    def _create(self, name: str) -> httpx.AsyncClient:
+        config = self.settings[name]
+
+        async def count_request(request: httpx.Request) -> None:
+            self._requests[name] += 1
+
+        async def count_error(response: httpx.Response) -> None:
+            if response.status_code >= 500:
+                self._errors[name] += 1
+
+        return httpx.AsyncClient(
+            http2=HTTP2_ENABLED,
+            timeout=httpx.Timeout(config["timeout"], connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=config["max_connections"],
+                max_keepalive_connections=config["keepalive"],
+                keepalive_expiry=KEEPALIVE_EXPIRY
+            ),
+            event_hooks={"request": [count_request], "response": [count_error]}
+        )
+
+    async def startup(self) -> None:
+        for name in self.settings:
+            if name not in self._clients:
+                self._clients[name] = self._create(name)
+        self._created_at = time.time()
+        logger.info(f"업스트림 HTTP 클라이언트 준비 완료: {list(self._clients)} (HTTP/2: {HTTP2_ENABLED})")
+
+    async def shutdown(self) -> None:
+        clients, self._clients = self._clients, {}
+        for name, client in clients.items():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"업스트림 클라이언트 종료 실패 ({name}): {e}")
+        logger.info("업스트림 HTTP 클라이언트 종료")
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """공유 클라이언트 반환 (lifespan 밖에서 호출되면 지연 생성)"""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._create(name)
+            self._clients[name] = client
+        return client
+
+    @asynccontextmanager
+    async def borrow(self, name: str) -> AsyncIterator[httpx.AsyncClient]:
+        """
+        `async with httpx.AsyncClient() as client:` 자리에 쓰는 컨텍스트 매니저
+        블록이 끝나도 클라이언트를 닫지 않고, 사용 중 개수만 집계한다.
+        """
+        self._in_use[name] += 1
+        try:
+            yield self.get(name)
+        finally:
+            self._in_use[name] -= 1
+
+    @staticmethod
+    def _pool_stats(client: httpx.AsyncClient) -> Dict:
+        """httpcore 연결 풀 상태 (내부 API라 실패하면 빈 dict)"""
+        try:
+            connections = client._transport._pool.connections
+            return {
+                "connections": len(connections),
+                "idle": sum(1 for c in connections if c.is_idle()),
+                "http2": sum(1 for c in connections if "HTTP/2" in repr(c)),
+            }
+        except Exception:
+            return {}
+
+    def stats(self) -> Dict:
+        upstreams = {}
+        for name, config in self.settings.items():
+            client = self._clients.get(name)
+            upstreams[name] = {
+                "timeout": config["timeout"],
+                "max_connections": config["max_connections"],
+                "requests": self._requests[name],
+                "server_errors": self._errors[name],
+                "in_use": self._in_use[name],
+                "pool": self._pool_stats(client) if client is not None else {},
+            }
+        return {
+            "http2": HTTP2_ENABLED,
+            "started_at": self._created_at,
+            "upstreams": upstreams,
+        }
+
+
+# 전역 인스턴스
+http_clients = UpstreamClients()
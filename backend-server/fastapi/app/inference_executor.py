@@ -0,0 +1,329 @@
+"""
+인프로세스 모델 추론 전용 실행기
+- 모델 사본 하나를 전용 워커 스레드 하나가 독점 (요청 큐로 순서대로 처리)
+- 이벤트 루프/기본 스레드풀을 막지 않고 await로 결과를 받음
+- 백프레셔: 대기 중인 작업이 LLM_QUEUE_MAX를 넘으면 InferenceQueueFull (HTTP 503으로 변환)
+- 취소: 기다리던 쪽이 취소/타임아웃되면 시작 전 작업은 건너뛰고, 실행 중인 생성은
+  current_cancel_event()를 보는 StoppingCriteria로 다음 토큰에서 중단
+- 동적 배치: submit_batched()로 들어온 작업 중 batch_key가 같은 것들을 모아
+  batch_fn(items)을 한 번에 실행 (첫 작업 후 LLM_BATCH_WAIT_MS 동안 추가 요청을 기다림)
+"""
+
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional
+
+from .metrics import DEPTH_BUCKETS, Histogram
+
+logger = logging.getLogger(__name__)
+
+# 대기 중인 추론 작업 수 상한 (넘으면 즉시 거절)
+LLM_QUEUE_MAX = int(os.getenv("LLM_QUEUE_MAX", "16"))
+# 작업 하나의 기본 타임아웃(초, 대기 + 실행, 0이면 무제한)
+LLM_INFERENCE_TIMEOUT = float(os.getenv("LLM_INFERENCE_TIMEOUT", "120"))
+# 한 번에 묶을 최대 요청 수 / 첫 요청 후 추가 요청을 기다리는 시간(ms)
+LLM_MAX_BATCH = int(os.getenv("LLM_MAX_BATCH", "8"))
+LLM_BATCH_WAIT_MS = float(os.getenv("LLM_BATCH_WAIT_MS", "10"))
+
+# 배치 크기 히스토그램 버킷
+BATCH_SIZE_BUCKETS = (1, 2, 3, 4, 6, 8, 12, 16, 32)
+
+_local = threading.local()
+
+
+class InferenceQueueFull(Exception):
+    """추론 대기열이 가득 참 (잠시 후 다시 시도)"""
+
+
+def current_cancel_event() -> Optional[threading.Event]:
+    """워커 스레드에서 실행 중인 작업의 취소 이벤트 (실행기 밖에서 호출하면 None)"""
+    return getattr(_local, "cancel_event", None)
+
+
+def current_cancel_events() -> Optional[List[threading.Event]]:
+    """배치 실행 중이면 배치 항목 순서대로의 취소 이벤트 목록"""
+    return getattr(_local, "cancel_events", None)
+
+
+class _Job:
+    __slots__ = (
+        "fn", "args", "kwargs", "future", "loop", "cancel_event", "enqueued_at",
+        "batch_fn", "batch_key", "item",
+    )
+
+    def __init__(self, fn: Callable, args: tuple, kwargs: Dict, loop: asyncio.AbstractEventLoop):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.loop = loop
+        self.future = loop.create_future()
+        self.cancel_event = threading.Event()
+        self.enqueued_at = time.perf_counter()
+        self.batch_fn: Optional[Callable[[List[Any]], List[Any]]] = None
+        self.batch_key: Hashable = None
+        self.item: Any = None
+
+
+def _resolve(future: asyncio.Future, result: Any, error: Optional[BaseException]) -> None:
+    """(이벤트 루프 스레드에서) 작업 결과 전달 - 이미 취소/타임아웃된 future는 무시"""
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class InferenceExecutor:
+    """요청 큐 + 전용 워커 스레드 기반 추론 실행기"""
+
+    def __init__(
+        self,
+        name: str,
+        max_queue: int = LLM_QUEUE_MAX,
+        timeout: float = LLM_INFERENCE_TIMEOUT,
+        max_batch: int = LLM_MAX_BATCH,
+        batch_wait: float = LLM_BATCH_WAIT_MS / 1000
+    ):
+        self.name = name
+        self.max_queue = max(max_queue, 1)
+        self.timeout = timeout
+        self.max_batch = max(max_batch, 1)
+        self.batch_wait = batch_wait
+        self._queue: "queue.Queue[Optional[_Job]]" = queue.Queue()
+        # 배치를 모으다 꺼낸, 다른 종류의 작업 (다음 차례에 먼저 처리)
+        self._backlog: Deque[_Job] = deque()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+
+        self.running = False
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.rejected = 0
+        self.queue_depth_hist = Histogram(DEPTH_BUCKETS)
+        self.queue_wait_hist = Histogram()
+        self.run_time_hist = Histogram()
+        self.batch_size_hist = Histogram(BATCH_SIZE_BUCKETS)
+
+    # ---------------- 워커 ----------------
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._worker, name=f"inference-{self.name}", daemon=True
+                )
+                self._thread.start()
+
+    def _take(self, job: _Job) -> None:
+        """대기 → 처리로 넘어간 작업 (백프레셔 계산에서 제외)"""
+        with self._pending_lock:
+            self._pending -= 1
+
+    def _next_job(self) -> Optional[_Job]:
+        """backlog → 큐 순서로 다음 작업 (종료 신호면 None)"""
+        job = self._backlog.popleft() if self._backlog else self._queue.get()
+        if job is not None:
+            self._take(job)
+        return job
+
+    def _skip_cancelled(self, job: _Job) -> bool:
+        if job.cancel_event.is_set():
+            # 기다리던 쪽이 이미 포기한 작업은 모델을 쓰지 않고 건너뜀
+            self.cancelled += 1
+            return True
+        return False
+
+    def _same_batch(self, job: _Job, first: _Job) -> bool:
+        # 바운드 메서드는 접근할 때마다 새 객체이므로 == 로 비교
+        return job.batch_fn == first.batch_fn and job.batch_key == first.batch_key
+
+    def _collect_batch(self, first: _Job) -> List[_Job]:
+        """first와 batch_key가 같은 작업을 max_batch까지 모음 (다른 작업은 backlog로)"""
+        batch = [first]
+        # backlog에 이미 있는 같은 종류 작업 먼저
+        for job in list(self._backlog):
+            if len(batch) >= self.max_batch:
+                break
+            if self._same_batch(job, first):
+                self._backlog.remove(job)
+                self._take(job)
+                if not self._skip_cancelled(job):
+                    batch.append(job)
+        deadline = time.perf_counter() + self.batch_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                job = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                self._queue.put(None)  # 종료 신호는 배치를 처리한 뒤에
+                break
+            if self._same_batch(job, first):
+                self._take(job)
+                if not self._skip_cancelled(job):
+                    batch.append(job)
+            else:
+                self._backlog.append(job)
+        return batch
+
+    def _worker(self) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                break
+            if self._skip_cancelled(job):
+                continue
+            if job.batch_fn is not None:
+                self._run_batch(self._collect_batch(job))
+            else:
+                self._run(job)
+
+    def _run(self, job: _Job) -> None:
+        self.queue_wait_hist.observe(time.perf_counter() - job.enqueued_at)
+        started = time.perf_counter()
+        _local.cancel_event = job.cancel_event
+        self.running = True
+        result, error = None, None
+        try:
+            result = job.fn(*job.args, **job.kwargs)
+            self.completed += 1
+        except BaseException as e:  # 워커 스레드가 죽지 않도록 모두 전달
+            error = e
+            self.failed += 1
+        finally:
+            self.running = False
+            _local.cancel_event = None
+            self.run_time_hist.observe(time.perf_counter() - started)
+        if job.cancel_event.is_set() and error is None:
+            self.cancelled += 1
+        try:
+            job.loop.call_soon_threadsafe(_resolve, job.future, result, error)
+        except RuntimeError:
+            pass  # 이벤트 루프가 이미 닫힘 (종료 중)
+
+    def _run_batch(self, jobs: List[_Job]) -> None:
+        now = time.perf_counter()
+        for job in jobs:
+            self.queue_wait_hist.observe(now - job.enqueued_at)
+        self.batch_size_hist.observe(len(jobs))
+        _local.cancel_events = [job.cancel_event for job in jobs]
+        self.running = True
+        results: List[Any] = []
+        error: Optional[BaseException] = None
+        try:
+            results = jobs[0].batch_fn([job.item for job in jobs])
+            if len(results) != len(jobs):
+                raise RuntimeError(f"배치 결과 수 불일치: {len(results)} != {len(jobs)}")
+        except BaseException as e:
+            error = e
+        finally:
+            self.running = False
+            _local.cancel_events = None
+            self.run_time_hist.observe(time.perf_counter() - now)
+        for index, job in enumerate(jobs):
+            # batch_fn은 항목별 실패를 예외 객체로 돌려줄 수 있음
+            result = None if error is not None else results[index]
+            item_error = error if error is not None else (result if isinstance(result, BaseException) else None)
+            if item_error is not None:
+                self.failed += 1
+                result = None
+            else:
+                self.completed += 1
+            if job.cancel_event.is_set() and item_error is None:
+                self.cancelled += 1
+            try:
+                job.loop.call_soon_threadsafe(_resolve, job.future, result, item_error)
+            except RuntimeError:
+                pass
+
+    # ---------------- 제출 ----------------
+
+    async def submit(self, fn: Callable, *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """
+        fn(*args, **kwargs)를 워커 스레드에서 실행하고 결과를 await로 반환
+
+        Raises:
+            InferenceQueueFull: 대기 작업이 max_queue 이상
+            asyncio.TimeoutError: timeout(기본 LLM_INFERENCE_TIMEOUT) 초과 - 작업도 취소됨
+        """
+        job = _Job(fn, args, kwargs, asyncio.get_running_loop())
+        return await self._enqueue(job, timeout)
+
+    async def submit_batched(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        item: Any,
+        batch_key: Hashable = None,
+        timeout: Optional[float] = None
+    ) -> Any:
+        """
+        item을 같은 batch_fn/batch_key 요청들과 묶어 batch_fn(items)으로 실행하고 자기 결과를 반환
+        batch_fn은 items와 같은 길이의 결과 목록을 돌려줘야 함 (항목별 실패는 예외 객체)
+        """
+        job = _Job(None, (), {}, asyncio.get_running_loop())
+        job.batch_fn = batch_fn
+        job.batch_key = batch_key
+        job.item = item
+        return await self._enqueue(job, timeout)
+
+    async def _enqueue(self, job: _Job, timeout: Optional[float]) -> Any:
+        with self._pending_lock:
+            if self._pending >= self.max_queue:
+                self.rejected += 1
+                raise InferenceQueueFull(f"{self.name} 추론 대기열이 가득 찼습니다 ({self._pending}개 대기)")
+            self._pending += 1
+            depth = self._pending
+        self.queue_depth_hist.observe(depth)
+        self.submitted += 1
+
+        self._ensure_started()
+        self._queue.put(job)
+
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            # wait_for가 타임아웃 시 future를 취소하므로 워커 쪽 결과 전달은 무시됨
+            return await asyncio.wait_for(job.future, timeout or None)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            job.cancel_event.set()
+            raise
+
+    def shutdown(self) -> None:
+        """워커 종료 요청 (실행 중인 작업이 끝나면 종료)"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+        self._thread = None
+
+    def stats(self) -> Dict:
+        return {
+            "max_queue": self.max_queue,
+            "max_batch": self.max_batch,
+            "batch_wait_ms": round(self.batch_wait * 1000, 1),
+            "pending": self._pending,
+            "running": self.running,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "rejected": self.rejected,
+            "queue_depth_hist": self.queue_depth_hist.snapshot(),
+            "queue_wait_seconds": self.queue_wait_hist.snapshot(),
+            "run_seconds": self.run_time_hist.snapshot(),
+            "batch_size": self.batch_size_hist.snapshot(),
+        }
+
+
+# 전역 인스턴스 (로컬 Hugging Face LLM 전용)
+llm_executor = InferenceExecutor("llm")
@@ -0,0 +1,182 @@
+"""
+AI 서버 /llm-generate 호출 클라이언트
+- 프로세스 전체 동시 요청 수 제한 (세마포어) → GPU LLM 서버 폭주 방지
+- 선택적 헤지 요청: 응답이 늦으면 여유 슬롯이 있을 때만 같은 요청을 한 번 더 보냄
+- 대기열 길이 / 대기 시간 / 응답 지연 히스토그램
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
+
+from .http_clients import http_clients
+from .metrics import DEPTH_BUCKETS, Histogram
+
+logger = logging.getLogger(__name__)
+
+AI_SERVER_URL = os.getenv("AI_SERVER_URL", "http://203.252.240.65:8001")
+
+# 동시에 LLM 서버로 나가는 요청 수 상한
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+# 요청 하나의 기본 타임아웃(초)
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "30"))
+# 이 시간(초) 안에 응답이 없으면 헤지 요청 (0이면 사용 안 함)
+LLM_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER", "0"))
+
+
+class OutboundLLMClient:
+    """동시성 제한 + 헤지 + 지표를 갖춘 /llm-generate 클라이언트"""
+
+    def __init__(
+        self,
+        base_url: str = AI_SERVER_URL,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        timeout: float = LLM_REQUEST_TIMEOUT,
+        hedge_after: float = LLM_HEDGE_AFTER
+    ):
+        self.base_url = base_url
+        self.max_concurrency = max(max_concurrency, 1)
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.queue_depth_hist = Histogram(DEPTH_BUCKETS)
+        self.queue_wait_hist = Histogram()
+        self.latency_hist = Histogram()
+
+    def _bind_loop(self) -> None:
+        """세마포어는 이벤트 루프에 묶이므로 루프가 바뀌면 새로 만든다"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def _attempt(self, payload: Dict, timeout: Optional[float]) -> Dict:
+        self._bind_loop()
+        semaphore = self._semaphore
+        enqueued = time.perf_counter()
+        self.queue_depth += 1
+        self.queue_depth_hist.observe(self.queue_depth)
+        try:
+            await semaphore.acquire()
+        finally:
+            self.queue_depth -= 1
+        self.queue_wait_hist.observe(time.perf_counter() - enqueued)
+
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            # 연결은 업스트림 공유 클라이언트(LLM 풀)를 재사용
+            response = await http_clients.get("llm").post(
+                f"{self.base_url}/llm-generate",
+                json=payload,
+                timeout=timeout or self.timeout
+            )
+            response.raise_for_status()
+            result = response.json()
+            self.latency_hist.observe(time.perf_counter() - started)
+            return result
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            semaphore.release()
+
+    async def generate(self, payload: Dict, timeout: Optional[float] = None) -> Dict:
+        """
+        /llm-generate 호출 후 JSON 응답 반환 (실패 시 예외)
+
+        hedge_after가 설정되어 있고 그 시간 안에 응답이 없으면, 빈 슬롯이 있을 때에 한해
+        같은 요청을 한 번 더 보내고 먼저 성공한 응답을 사용한다.
+        """
+        self.requests += 1
+        primary = asyncio.ensure_future(self._attempt(payload, timeout))
+        hedge: Optional[asyncio.Future] = None
+        try:
+            if self.hedge_after <= 0:
+                return await primary
+            done, _ = await asyncio.wait({primary}, timeout=self.hedge_after)
+            if done or self._semaphore.locked():
+                # 이미 끝났거나 여유 슬롯이 없으면 헤지하지 않음 (서버 부하만 늘어남)
+                return await primary
+
+            self.hedges += 1
+            hedge = asyncio.ensure_future(self._attempt(payload, timeout))
+            pending = {primary, hedge}
+            last_error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "requests": self.requests,
+            "errors": self.errors,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "queue_depth_hist": self.queue_depth_hist.snapshot(),
+            "queue_wait_seconds": self.queue_wait_hist.snapshot(),
+            "latency_seconds": self.latency_hist.snapshot(),
+        }
+
+
+async def gather_until_deadline(
+    aws: List[Awaitable[Any]],
+    deadline: Optional[float]
+) -> Tuple[List[Any], int]:
+    """
+    awaitable 목록을 병렬 실행하고 deadline(초) 안에 끝난 결과만 반환
+
+    시간 안에 끝나지 않은 작업은 취소한다. 예외로 끝난 작업의 결과는 예외 객체.
+
+    Returns:
+        (입력 순서대로의 결과 목록 - 미완료는 None, 취소된 작업 수)
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    if not tasks:
+        return [], 0
+    try:
+        _, pending = await asyncio.wait(tasks, timeout=deadline)
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+    results = []
+    for task in tasks:
+        if task.cancelled() or not task.done():
+            results.append(None)
+        elif task.exception() is not None:
+            results.append(task.exception())
+        else:
+            results.append(task.result())
+    return results, len(pending)
+
+
+# 전역 인스턴스
+llm_client = OutboundLLMClient()
@@ -1,25 +1,123 @@
 """
 Hugging Face LLM 서비스
 Hugging Face에서 모델을 로드하여 텍스트 생성 제공
+async 코드에서는 agenerate/achat을 사용 (전용 추론 스레드 llm_executor에서 실행)
+동시에 들어온 요청은 생성 옵션이 같으면 왼쪽 패딩으로 묶어 model.generate 한 번으로 처리 (동적 배치)
+"[시스템] ... [사용자] ..." 프롬프트는 시스템 부분의 KV 캐시를 재사용 (같은 레시피/요구의 다음 턴은 사용자 부분만 prefill)
+astream/astream_chat: 생성되는 대로 텍스트 조각을 내보내는 async 제너레이터 (첫 토큰까지의 지연만 체감)
+로딩 방식은 LLM_PRECISION(auto/fp32/bf16/fp16/int8), LLM_TORCH_COMPILE 환경변수로 선택
+(정확도/속도 비교는 bench_llm_precision.py)
+LLM_DRAFT_MODEL을 지정하면 greedy 요청은 작은 초안 모델로 투기적 디코딩 (bench_llm_speculative.py)
 """
 
+import asyncio
+import copy
+import hashlib
 import os
 import logging
-from typing import Optional, List, Dict
+import threading
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Optional, List, Dict, Tuple, Union
 from transformers import (
     AutoTokenizer, 
     AutoModelForCausalLM,
+    StoppingCriteria,
+    StoppingCriteriaList,
+    TextStreamer,
     pipeline
 )
 import torch
 
+from .inference_executor import current_cancel_event, current_cancel_events, llm_executor
+
 logger = logging.getLogger(__name__)
 
+# 비동기 요청 동적 배치 사용 여부
+LLM_BATCHING = os.getenv("LLM_BATCHING", "true").lower() in ("1", "true", "yes")
+# 파이프라인 기본값과 같은 반복 억제
+REPETITION_PENALTY = 1.1
+# 시스템 프롬프트 KV 캐시 (캐시에 보관할 프리픽스 토큰 총량 - 1B 모델 fp32 기준 토큰당 약 64KB)
+LLM_PREFIX_CACHE = os.getenv("LLM_PREFIX_CACHE", "true").lower() in ("1", "true", "yes")
+LLM_PREFIX_CACHE_TOKENS = int(os.getenv("LLM_PREFIX_CACHE_TOKENS", "8192"))
+# 이보다 짧은 프리픽스는 캐시하지 않음 (복사 비용이 prefill보다 큼)
+MIN_PREFIX_TOKENS = 32
+# 모델 로딩 방식
+# - auto: CUDA는 fp16, 그 외(CPU/MPS)는 fp32 (기존 동작)
+# - bf16: CPU가 bf16을 하드웨어로 지원할 때만 (AVX512-BF16/AMX), 아니면 fp32
+# - int8: CPU 전용 동적 양자화 (Linear 가중치 int8, 활성값은 실행 중 양자화)
+LLM_PRECISION = os.getenv("LLM_PRECISION", "auto").lower()
+LLM_TORCH_COMPILE = os.getenv("LLM_TORCH_COMPILE", "false").lower() in ("1", "true", "yes")
+PRECISIONS = ("auto", "fp32", "bf16", "fp16", "int8")
+# 투기적 디코딩: 같은 토크나이저를 쓰는 작은 초안 모델 (비우면 사용 안 함)
+LLM_DRAFT_MODEL = os.getenv("LLM_DRAFT_MODEL", "")
+# 한 번에 초안 모델이 제안하는 토큰 수
+LLM_DRAFT_TOKENS = int(os.getenv("LLM_DRAFT_TOKENS", "4"))
+
+
+def _cpu_supports_bf16() -> bool:
+    """CPU가 bf16 행렬 연산을 하드웨어로 지원하는지 (지원하지 않으면 bf16이 fp32보다 느림)"""
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+class CancelCriteria(StoppingCriteria):
+    """요청이 취소되면 다음 토큰에서 생성 중단 (배치면 해당 행만 중단)"""
+    
+    def __init__(self, cancel_events: List[threading.Event]):
+        self.cancel_events = cancel_events
+    
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        flags = [event.is_set() for event in self.cancel_events]
+        if len(flags) != input_ids.shape[0]:
+            flags = [any(flags)] * input_ids.shape[0]
+        return torch.tensor(flags, dtype=torch.bool, device=input_ids.device)
+
+
+def _cancel_events() -> List[threading.Event]:
+    """현재 추론 작업의 취소 이벤트 (배치면 항목별, 단독 작업이면 하나, 실행기 밖이면 없음)"""
+    events = current_cancel_events()
+    if events:
+        return events
+    event = current_cancel_event()
+    return [event] if event is not None else []
+
+
+class AsyncTextStreamer(TextStreamer):
+    """
+    TextIteratorStreamer와 같은 방식의 스트리머, 다만 큐가 asyncio.Queue
+    추론 스레드의 model.generate가 put()으로 토큰을 넘기면 완성된 텍스트 조각을
+    이벤트 루프의 큐로 전달 (끝나면 None) - 이벤트 루프 쪽은 블로킹 없이 await
+    """
+    
+    def __init__(self, tokenizer, loop: asyncio.AbstractEventLoop, **decode_kwargs):
+        super().__init__(tokenizer, skip_prompt=True, **decode_kwargs)
+        self.loop = loop
+        self.queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+    
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        if text:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, text)
+        if stream_end:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, None)
+
+
 class HuggingFaceLLMService:
     """Hugging Face 모델을 사용한 LLM 서비스"""
     
-    def __init__(self):
-        self.model_name = os.getenv(
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        precision: str = LLM_PRECISION,
+        compile_model: bool = LLM_TORCH_COMPILE,
+        draft_model_name: Optional[str] = LLM_DRAFT_MODEL,
+        draft_tokens: int = LLM_DRAFT_TOKENS
+    ):
+        self.model_name = model_name or os.getenv(
             "HF_MODEL_NAME", 
             "00PJH/Llama-3.2-Korean-GGACHI-1B-Instruct-v1-koToEn"  # 기본값: Instruct 모델
         )
@@ -32,8 +130,47 @@ class HuggingFaceLLMService:
             self.device = "cpu"
         self.tokenizer = None
         self.model = None
-        self.pipeline = None
+        # 파이프라인은 generate()에 추가 옵션이 있을 때만 필요하므로 처음 쓸 때 생성
+        self._pipeline = None
+        self._pipeline_lock = threading.Lock()
+        if precision not in PRECISIONS:
+            logger.warning(f"알 수 없는 LLM_PRECISION='{precision}', auto 사용")
+            precision = "auto"
+        self.requested_precision = precision
+        self.precision = precision
+        self.compile_model = compile_model
+        self.compiled = False
+        self.load_seconds = 0.0
+        # 투기적 디코딩용 초안 모델 (로드 실패/토크나이저 불일치면 None)
+        self.draft_model_name = draft_model_name or None
+        self.draft_model = None
+        self.draft_tokens = max(draft_tokens, 1)
         self.is_instruct_model = "instruct" in self.model_name.lower() or "llama-3.2" in self.model_name.lower()
+        
+        # 생성 지표 (동적 배치 경로)
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.sequences = 0
+        self.generated_tokens = 0
+        self.prompt_tokens = 0
+        self.generation_seconds = 0.0
+        self.last_tokens_per_second = 0.0
+        
+        # 시스템 프롬프트 KV 캐시: 프리픽스 토큰 해시 → (토큰 수, past_key_values)
+        self._prefix_cache: "OrderedDict[str, Tuple[int, object]]" = OrderedDict()
+        self._prefix_cache_tokens = 0
+        self.prefix_hits = 0
+        self.prefix_misses = 0
+        self.prefix_reused_tokens = 0
+        
+        # 투기적 디코딩 지표
+        self.spec_requests = 0
+        self.spec_rounds = 0
+        self.spec_drafted = 0
+        self.spec_accepted = 0
+        self.spec_tokens = 0
+        self.spec_seconds = 0.0
+        
         self._load_model()
     
     def _load_model(self):
@@ -47,14 +184,20 @@ class HuggingFaceLLMService:
                 self.model_name,
                 trust_remote_code=True
             )
+            # 배치 생성은 왼쪽 패딩 (마지막 토큰 위치를 맞춤), 패딩 토큰이 없으면 EOS 사용
+            if self.tokenizer.pad_token_id is None:
+                self.tokenizer.pad_token = self.tokenizer.eos_token
+            self.tokenizer.padding_side = "left"
+            
+            started = time.perf_counter()
+            self.precision = self._resolve_precision(self.requested_precision)
+            dtype = {"fp16": torch.float16, "bf16": torch.bfloat16}.get(self.precision, torch.float32)
             
             # 모델 로드
-            # MPS는 float16을 지원하지 않으므로 float32 사용
-            use_fp16 = self.device == "cuda"
             self.model = AutoModelForCausalLM.from_pretrained(
                 self.model_name,
                 trust_remote_code=True,
-                torch_dtype=torch.float16 if use_fp16 else torch.float32,
+                torch_dtype=dtype,
                 device_map="auto" if self.device == "cuda" else None,
                 low_cpu_mem_usage=True
             )
@@ -62,21 +205,22 @@ class HuggingFaceLLMService:
             # CPU 또는 MPS로 모델 이동
             if self.device != "cuda":
                 self.model = self.model.to(self.device)
+            self.model.eval()
             
-            # Pipeline 생성
-            # device 파라미터: cuda=0, mps=0, cpu=-1
-            device_id = 0 if self.device in ["cuda", "mps"] else -1
-            self.pipeline = pipeline(
-                "text-generation",
-                model=self.model,
-                tokenizer=self.tokenizer,
-                device=device_id,
-                max_length=512,
-                do_sample=True,
-                temperature=0.7,
-                top_p=0.9,
-                repetition_penalty=1.1
-            )
+            if self.precision == "int8":
+                # Linear 가중치만 int8로 (임베딩/정규화는 fp32 유지)
+                self.model = torch.ao.quantization.quantize_dynamic(
+                    self.model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+            
+            if self.compile_model:
+                self._compile()
+            
+            if self.draft_model_name:
+                self._load_draft_model(dtype)
+            
+            self.load_seconds = time.perf_counter() - started
+            logger.info(f"⚙️ 로딩 방식: {self.precision}, torch.compile: {self.compiled} ({self.load_seconds:.1f}초)")
             
             # Instruct 모델용 특수 토큰 확인
             if self.is_instruct_model:
@@ -88,6 +232,105 @@ class HuggingFaceLLMService:
             logger.error(f"❌ 모델 로딩 실패: {str(e)}")
             raise
     
+    def _resolve_precision(self, precision: str) -> str:
+        """요청한 로딩 방식을 장치에서 쓸 수 있는 방식으로 결정"""
+        if precision == "auto":
+            # MPS는 float16을 지원하지 않으므로 float32 사용
+            return "fp16" if self.device == "cuda" else "fp32"
+        if precision == "int8" and self.device != "cpu":
+            logger.warning(f"int8 동적 양자화는 CPU 전용입니다 ({self.device}), 기본 방식 사용")
+            return self._resolve_precision("auto")
+        if precision == "fp16" and self.device != "cuda":
+            logger.warning(f"fp16은 CUDA에서만 사용합니다 ({self.device}), fp32 사용")
+            return "fp32"
+        if precision == "bf16" and self.device == "cpu" and not _cpu_supports_bf16():
+            logger.warning("CPU가 bf16을 지원하지 않습니다 (avx512_bf16/amx_bf16 없음), fp32 사용")
+            return "fp32"
+        if precision == "bf16" and self.device == "mps":
+            logger.warning("MPS에서는 bf16을 사용하지 않습니다, fp32 사용")
+            return "fp32"
+        return precision
+    
+    def _compile(self) -> None:
+        """forward를 torch.compile로 감쌈 (generate는 그대로, 길이가 바뀌어도 재컴파일하지 않도록 dynamic)"""
+        if not hasattr(torch, "compile"):
+            logger.warning("torch.compile을 지원하지 않는 torch 버전입니다")
+            return
+        try:
+            self.model.forward = torch.compile(self.model.forward, dynamic=True)
+            self.compiled = True
+        except Exception as e:
+            logger.warning(f"torch.compile 실패, 컴파일 없이 사용: {str(e)}")
+    
+    def _load_draft_model(self, dtype) -> None:
+        """초안 모델 로드 (본 모델과 같은 정밀도, 실패하면 투기적 디코딩 없이 동작)"""
+        try:
+            from transformers import DynamicCache
+            if not hasattr(DynamicCache, "crop"):
+                logger.warning("이 transformers 버전은 KV 캐시 자르기(DynamicCache.crop)를 지원하지 않습니다, 투기적 디코딩 사용 안 함")
+                return
+            draft_tokenizer = AutoTokenizer.from_pretrained(self.draft_model_name, trust_remote_code=True)
+            # 초안 토큰을 그대로 본 모델로 검증하므로 어휘가 같아야 함
+            if draft_tokenizer.get_vocab() != self.tokenizer.get_vocab():
+                logger.warning(f"초안 모델 토크나이저가 다릅니다 ({self.draft_model_name}), 투기적 디코딩 사용 안 함")
+                return
+            draft_model = AutoModelForCausalLM.from_pretrained(
+                self.draft_model_name,
+                trust_remote_code=True,
+                torch_dtype=dtype,
+                low_cpu_mem_usage=True
+            ).to(self.model.device)
+            draft_model.eval()
+            if self.precision == "int8":
+                draft_model = torch.ao.quantization.quantize_dynamic(
+                    draft_model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+            self.draft_model = draft_model
+            logger.info(f"🪶 초안 모델 로딩 완료: {self.draft_model_name} (제안 토큰 {self.draft_tokens}개)")
+        except Exception as e:
+            logger.warning(f"초안 모델 로딩 실패, 투기적 디코딩 사용 안 함: {str(e)}")
+    
+    def _get_pipeline(self):
+        """text-generation 파이프라인 (처음 쓸 때 생성, 모델/토크나이저는 공유)"""
+        if self._pipeline is None:
+            with self._pipeline_lock:
+                if self._pipeline is None:
+                    # device 파라미터: cuda=0, mps=0, cpu=-1
+                    # device_map으로 올린 모델은 이미 장치에 있으므로 device를 넘기지 않음
+                    device_id = 0 if self.device == "mps" else (-1 if self.device == "cpu" else None)
+                    pipeline_kwargs = {} if device_id is None else {"device": device_id}
+                    self._pipeline = pipeline(
+                        "text-generation",
+                        model=self.model,
+                        tokenizer=self.tokenizer,
+                        max_length=512,
+                        do_sample=True,
+                        temperature=0.7,
+                        top_p=0.9,
+                        repetition_penalty=REPETITION_PENALTY,
+                        **pipeline_kwargs
+                    )
+        return self._pipeline
+    
+    def load_info(self) -> Dict:
+        """로딩 방식과 모델 메모리 (양자화된 Linear의 패킹 가중치 포함)"""
+        param_bytes = sum(p.numel() * p.element_size() for p in self.model.parameters()) if self.model else 0
+        quantized_bytes = 0
+        if self.model is not None and self.precision == "int8":
+            for module in self.model.modules():
+                weight = getattr(module, "weight", None)
+                if callable(weight) and hasattr(module, "_packed_params"):
+                    quantized_bytes += weight().numel()
+        return {
+            "precision": self.precision,
+            "requested_precision": self.requested_precision,
+            "torch_compile": self.compiled,
+            "load_seconds": round(self.load_seconds, 2),
+            "weights_mb": round((param_bytes + quantized_bytes) / (1024 * 1024), 1),
+            "pipeline_built": self._pipeline is not None,
+            "draft_model": self.draft_model_name if self.draft_model is not None else None,
+        }
+    
     def generate(
         self, 
         prompt: str, 
@@ -98,7 +341,7 @@ class HuggingFaceLLMService:
     ) -> str:
         """텍스트 생성"""
         try:
-            if not self.pipeline:
+            if not self.model:
                 raise RuntimeError("모델이 로드되지 않았습니다.")
             
             # Instruct 모델용 프롬프트 템플릿
@@ -108,8 +351,13 @@ class HuggingFaceLLMService:
             else:
                 full_prompt = prompt
             
+            # 추론 실행기에서 실행 중이면 요청 취소 시 생성 중단
+            cancel_event = current_cancel_event()
+            if cancel_event is not None and "stopping_criteria" not in kwargs:
+                kwargs["stopping_criteria"] = StoppingCriteriaList([CancelCriteria([cancel_event])])
+            
             # 생성 실행
-            result = self.pipeline(
+            result = self._get_pipeline()(
                 full_prompt,
                 max_length=max_length,
                 temperature=temperature,
@@ -133,8 +381,274 @@ class HuggingFaceLLMService:
             logger.error(f"텍스트 생성 오류: {str(e)}")
             raise
     
-    def _format_instruct_prompt(self, prompt: str) -> str:
-        """Instruct 모델용 프롬프트 형식 변환 (토크나이저의 채팅 템플릿 사용)"""
+    def _eos_token_ids(self) -> set:
+        eos = self.model.generation_config.eos_token_id
+        if eos is None:
+            eos = self.tokenizer.eos_token_id
+        ids = set(eos) if isinstance(eos, (list, tuple)) else {eos}
+        ids.add(self.tokenizer.pad_token_id)
+        return {i for i in ids if i is not None}
+    
+    def _generate_kwargs(
+        self,
+        max_new_tokens: int,
+        temperature: float,
+        top_p: float,
+        cancel_events: List[threading.Event]
+    ) -> Dict:
+        """model.generate 공통 옵션 (파이프라인과 같은 반복 억제, 취소 시 중단)"""
+        generate_kwargs = {
+            "max_new_tokens": max_new_tokens,
+            "repetition_penalty": REPETITION_PENALTY,
+            "pad_token_id": self.tokenizer.pad_token_id,
+        }
+        if temperature and temperature > 0:
+            generate_kwargs.update(do_sample=True, temperature=temperature, top_p=top_p)
+        else:
+            generate_kwargs.update(do_sample=False)
+        if cancel_events:
+            generate_kwargs["stopping_criteria"] = StoppingCriteriaList([CancelCriteria(cancel_events)])
+        return generate_kwargs
+    
+    def generate_batch(
+        self,
+        items: List[Tuple[str, int, float, float]],
+        streamer: Optional[TextStreamer] = None
+    ) -> List[Union[str, Exception]]:
+        """
+        여러 프롬프트를 왼쪽 패딩으로 묶어 model.generate 한 번으로 생성 (CPU/GPU 공통)
+        
+        Args:
+            items: [(prompt, max_length, temperature, top_p)] - 한 배치의 생성 옵션은 모두 같음
+                   max_length는 파이프라인과 같이 프롬프트를 포함한 길이 (행마다 따로 적용)
+            streamer: 생성 중 토큰을 받을 스트리머 (항목이 하나일 때만)
+        Returns:
+            items 순서대로 생성 결과
+        """
+        if not self.model:
+            raise RuntimeError("모델이 로드되지 않았습니다.")
+        _, max_length, temperature, top_p = items[0]
+        prompts = [
+            self._format_instruct_prompt(prompt) if self.is_instruct_model else prompt
+            for prompt, *_ in items
+        ]
+        # 채팅 템플릿이 이미 BOS를 넣은 경우 중복 방지
+        bos = self.tokenizer.bos_token
+        add_special_tokens = not (bos and all(p.startswith(bos) for p in prompts))
+        
+        started = time.perf_counter()
+        inputs = self.tokenizer(
+            prompts,
+            return_tensors="pt",
+            padding=True,
+            add_special_tokens=add_special_tokens
+        ).to(self.model.device)
+        prompt_lengths = inputs["attention_mask"].sum(dim=1).tolist()
+        budgets = [max(max_length - length, 1) for length in prompt_lengths]
+        
+        generate_kwargs = self._generate_kwargs(max(budgets), temperature, top_p, _cancel_events())
+        
+        with torch.inference_mode():
+            output = self.model.generate(**inputs, streamer=streamer, **generate_kwargs)
+        
+        # 프롬프트(패딩 포함) 뒤의 새 토큰만, 행별 길이 제한과 EOS까지 잘라서 디코딩
+        new_tokens = output[:, inputs["input_ids"].shape[1]:].tolist()
+        eos_ids = self._eos_token_ids()
+        results: List[Union[str, Exception]] = []
+        generated = 0
+        for row, budget in zip(new_tokens, budgets):
+            row = row[:budget]
+            for index, token in enumerate(row):
+                if token in eos_ids:
+                    row = row[:index]
+                    break
+            generated += len(row)
+            text = self.tokenizer.decode(row, skip_special_tokens=True).strip()
+            if self.is_instruct_model:
+                text = self._clean_instruct_response(text)
+            results.append(text)
+        
+        self._record_batch(len(items), sum(prompt_lengths), generated, time.perf_counter() - started)
+        return results
+    
+    def _record_batch(self, size: int, prompt_tokens: int, generated: int, seconds: float) -> None:
+        with self._stats_lock:
+            self.batches += 1
+            self.sequences += size
+            self.prompt_tokens += prompt_tokens
+            self.generated_tokens += generated
+            self.generation_seconds += seconds
+            self.last_tokens_per_second = generated / seconds if seconds > 0 else 0.0
+        logger.info(f"배치 생성 완료 (배치 {size}개, 토큰 {generated}개, {seconds:.2f}초)")
+    
+    def generation_stats(self) -> Dict:
+        """동적 배치 생성 지표 (배치 크기 분포는 llm_executor 지표의 batch_size)"""
+        with self._stats_lock:
+            return {
+                "batching": LLM_BATCHING,
+                "batches": self.batches,
+                "sequences": self.sequences,
+                "avg_batch_size": round(self.sequences / self.batches, 2) if self.batches else 0.0,
+                "prompt_tokens": self.prompt_tokens,
+                "generated_tokens": self.generated_tokens,
+                "tokens_per_second": round(self.generated_tokens / self.generation_seconds, 2) if self.generation_seconds else 0.0,
+                "last_tokens_per_second": round(self.last_tokens_per_second, 2),
+            }
+    
+    # ---------------- 시스템 프롬프트 KV 캐시 ----------------
+    
+    def _prefix_parts(self, prompt: str) -> Optional[Tuple[str, str]]:
+        """채팅 템플릿을 적용한 프롬프트를 (시스템 메시지까지, 나머지)로 분리 (분리할 수 없으면 None)"""
+        if not self.is_instruct_model or "[시스템]" not in prompt:
+            return None
+        system_part, _ = self._split_instruct_prompt(prompt)
+        full_prompt = self._format_instruct_prompt(prompt)
+        start = full_prompt.find(system_part)
+        if not system_part or start < 0:
+            return None
+        cut = start + len(system_part)
+        return full_prompt[:cut], full_prompt[cut:]
+    
+    def _get_prefix_cache(self, prefix_ids: List[int]):
+        """프리픽스 KV 캐시 조회, 없으면 prefill 후 저장 (추론 스레드에서만 호출)"""
+        key = hashlib.sha1(",".join(map(str, prefix_ids)).encode("ascii")).hexdigest()
+        entry = self._prefix_cache.get(key)
+        if entry is not None:
+            self._prefix_cache.move_to_end(key)
+            self.prefix_hits += 1
+            self.prefix_reused_tokens += entry[0]
+            return entry[1]
+        
+        self.prefix_misses += 1
+        input_ids = torch.tensor([prefix_ids], device=self.model.device)
+        with torch.inference_mode():
+            past_key_values = self.model(input_ids=input_ids, use_cache=True).past_key_values
+        self._prefix_cache[key] = (len(prefix_ids), past_key_values)
+        self._prefix_cache_tokens += len(prefix_ids)
+        # 총 토큰 수 기준 LRU 정리 (방금 넣은 항목은 유지)
+        while self._prefix_cache_tokens > LLM_PREFIX_CACHE_TOKENS and len(self._prefix_cache) > 1:
+            _, (tokens, _) = self._prefix_cache.popitem(last=False)
+            self._prefix_cache_tokens -= tokens
+        return past_key_values
+    
+    def _generate_single(
+        self,
+        prompt: str,
+        max_length: int,
+        temperature: float,
+        top_p: float,
+        streamer: Optional[TextStreamer] = None
+    ) -> str:
+        result = self.generate_batch([(prompt, max_length, temperature, top_p)], streamer=streamer)[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+    
+    def generate_with_prefix_cache(
+        self,
+        prompt: str,
+        max_length: int = 256,
+        temperature: float = 0.7,
+        top_p: float = 0.9,
+        streamer: Optional[TextStreamer] = None
+    ) -> str:
+        """
+        시스템 메시지 부분의 KV 캐시를 재사용해 생성 (사용자 메시지 부분만 prefill)
+        분리할 수 없거나 프리픽스가 짧으면 일반 배치 경로와 같은 방식으로 생성
+        """
+        if not self.model:
+            raise RuntimeError("모델이 로드되지 않았습니다.")
+        parts = self._prefix_parts(prompt)
+        if parts is None:
+            return self._generate_single(prompt, max_length, temperature, top_p, streamer)
+        prefix, suffix = parts
+        bos = self.tokenizer.bos_token
+        prefix_ids = self.tokenizer(prefix, add_special_tokens=not (bos and prefix.startswith(bos)))["input_ids"]
+        suffix_ids = self.tokenizer(suffix, add_special_tokens=False)["input_ids"]
+        if len(prefix_ids) < MIN_PREFIX_TOKENS or not suffix_ids:
+            return self._generate_single(prompt, max_length, temperature, top_p, streamer)
+        
+        started = time.perf_counter()
+        # generate가 캐시를 이어서 채우므로 보관본은 복사해서 사용
+        past_key_values = copy.deepcopy(self._get_prefix_cache(prefix_ids))
+        input_ids = torch.tensor([prefix_ids + suffix_ids], device=self.model.device)
+        prompt_length = input_ids.shape[1]
+        
+        generate_kwargs = self._generate_kwargs(
+            max(max_length - prompt_length, 1), temperature, top_p, _cancel_events()
+        )
+        
+        with torch.inference_mode():
+            output = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                past_key_values=past_key_values,
+                streamer=streamer,
+                **generate_kwargs
+            )
+        
+        row = output[0, prompt_length:].tolist()
+        eos_ids = self._eos_token_ids()
+        for index, token in enumerate(row):
+            if token in eos_ids:
+                row = row[:index]
+                break
+        text = self.tokenizer.decode(row, skip_special_tokens=True).strip()
+        text = self._clean_instruct_response(text)
+        self._record_batch(1, prompt_length, len(row), time.perf_counter() - started)
+        return text
+    
+    def prefix_cache_stats(self) -> Dict:
+        lookups = self.prefix_hits + self.prefix_misses
+        return {
+            "enabled": LLM_PREFIX_CACHE,
+            "entries": len(self._prefix_cache),
+            "tokens": self._prefix_cache_tokens,
+            "max_tokens": LLM_PREFIX_CACHE_TOKENS,
+            "hits": self.prefix_hits,
+            "misses": self.prefix_misses,
+            "hit_rate": round(self.prefix_hits / lookups, 3) if lookups else 0.0,
+            "reused_tokens": self.prefix_reused_tokens,
+        }
+    
+    async def agenerate(
+        self,
+        prompt: str,
+        max_length: int = 256,
+        temperature: float = 0.7,
+        top_p: float = 0.9,
+        timeout: Optional[float] = None,
+        **kwargs
+    ) -> str:
+        """
+        전용 추론 스레드에서 생성 (대기열이 가득 차면 InferenceQueueFull)
+        - greedy(temperature <= 0) 요청: 초안 모델이 있으면 투기적 디코딩
+        - "[시스템] ... [사용자] ..." 프롬프트: 시스템 부분 KV 캐시 재사용
+        - 그 밖에 추가 생성 옵션(kwargs)이 없으면 같은 옵션의 동시 요청과 묶어 배치로 생성
+        """
+        if kwargs or not LLM_BATCHING:
+            return await llm_executor.submit(
+                self.generate, prompt,
+                max_length=max_length, temperature=temperature, top_p=top_p,
+                timeout=timeout, **kwargs
+            )
+        if self._use_speculative(temperature):
+            return await llm_executor.submit(
+                self.generate_speculative, prompt, max_length=max_length, timeout=timeout
+            )
+        if LLM_PREFIX_CACHE and self.is_instruct_model and "[시스템]" in prompt:
+            return await llm_executor.submit(
+                self.generate_with_prefix_cache, prompt,
+                max_length=max_length, temperature=temperature, top_p=top_p,
+                timeout=timeout
+            )
+        options = (max_length, temperature, top_p)
+        return await llm_executor.submit_batched(
+            self.generate_batch, (prompt, *options), batch_key=options, timeout=timeout
+        )
+    
+    def _split_instruct_prompt(self, prompt: str) -> Tuple[str, str]:
+        """"[시스템] ... [사용자] ..." 프롬프트 → (시스템 메시지, 사용자 메시지)"""
         system_message = "너는 친절하고 유용한 AI 어시스턴트입니다. 사용자의 질문에 정확하고 도움이 되는 답변을 제공합니다."
         
         # 프롬프트에서 시스템/사용자 메시지 분리
@@ -149,6 +663,11 @@ class HuggingFaceLLMService:
         else:
             user_message = prompt.strip()
             system_part = system_message
+        return system_part, user_message
+    
+    def _format_instruct_prompt(self, prompt: str) -> str:
+        """Instruct 모델용 프롬프트 형식 변환 (토크나이저의 채팅 템플릿 사용)"""
+        system_part, user_message = self._split_instruct_prompt(prompt)
         
         # 토크나이저의 apply_chat_template 사용 (가능한 경우)
         if hasattr(self.tokenizer, 'apply_chat_template') and self.tokenizer.chat_template is not None:
@@ -206,6 +725,231 @@ class HuggingFaceLLMService:
             logger.error(f"채팅 오류: {str(e)}")
             raise
     
+    async def achat(self, messages: List[Dict[str, str]], timeout: Optional[float] = None, **kwargs) -> str:
+        """chat의 비동기 버전 (agenerate와 같은 배치 경로)"""
+        return await self.agenerate(self._format_messages(messages), timeout=timeout, **kwargs)
+    
+    # ---------------- 투기적 디코딩 ----------------
+    
+    def _use_speculative(self, temperature: float) -> bool:
+        return self.draft_model is not None and not (temperature and temperature > 0)
+    
+    @staticmethod
+    def _penalize(logits: torch.Tensor, context: torch.Tensor) -> torch.Tensor:
+        """RepetitionPenaltyLogitsProcessor와 같은 반복 억제 (logits: [vocab], context: 지금까지의 토큰)"""
+        score = logits.gather(0, context)
+        score = torch.where(score < 0, score * REPETITION_PENALTY, score / REPETITION_PENALTY)
+        return logits.scatter(0, context, score)
+    
+    def _greedy_next(self, logits: torch.Tensor, context: torch.Tensor) -> int:
+        return int(self._penalize(logits.float(), context).argmax())
+    
+    def generate_speculative(
+        self,
+        prompt: str,
+        max_length: int = 256,
+        streamer: Optional[TextStreamer] = None
+    ) -> str:
+        """
+        초안 모델로 투기적 디코딩 (greedy 전용, 배치 1개)
+        초안 모델이 draft_tokens개를 제안하면 본 모델이 forward 한 번으로 모두 검증해
+        본 모델의 greedy 선택과 같은 앞부분만 받아들이고, 처음 다른 위치는 본 모델의 토큰으로 바꿈
+        → 결과는 같은 반복 억제를 쓴 일반 greedy 생성과 같음 (forward 한 번에 토큰 여러 개)
+        """
+        from transformers import DynamicCache
+        
+        if self.draft_model is None:
+            raise RuntimeError("초안 모델이 로드되지 않았습니다.")
+        full_prompt = self._format_instruct_prompt(prompt) if self.is_instruct_model else prompt
+        # generate_batch와 같은 토큰화 (채팅 템플릿이 이미 BOS를 넣은 경우 중복 방지)
+        bos = self.tokenizer.bos_token
+        add_special_tokens = not (bos and full_prompt.startswith(bos))
+        prompt_ids = self.tokenizer(full_prompt, add_special_tokens=add_special_tokens)["input_ids"]
+        prompt_length = len(prompt_ids)
+        budget = max(max_length - prompt_length, 1)
+        eos_ids = self._eos_token_ids()
+        cancel_events = _cancel_events()
+        device = self.model.device
+        
+        started = time.perf_counter()
+        # 본 모델 캐시: 마지막 토큰을 뺀 전부 / 초안 모델 캐시: draft_length까지
+        tokens = torch.tensor(prompt_ids, device=device)
+        main_cache = DynamicCache()
+        draft_cache = DynamicCache()
+        draft_length = 0
+        generated: List[int] = []
+        rounds = drafted = accepted = 0
+        if streamer is not None:
+            streamer.put(tokens.unsqueeze(0).cpu())
+        
+        with torch.inference_mode():
+            logits = self.model(input_ids=tokens.unsqueeze(0), past_key_values=main_cache, use_cache=True).logits
+            new_tokens = [self._greedy_next(logits[0, -1], tokens)]
+            
+            while True:
+                # 새로 확정된 토큰 반영 (EOS/길이 제한이면 종료)
+                done = False
+                for token in new_tokens:
+                    if token in eos_ids or len(generated) >= budget:
+                        done = True
+                        break
+                    generated.append(token)
+                    tokens = torch.cat([tokens, torch.tensor([token], device=device)])
+                    if streamer is not None:
+                        streamer.put(torch.tensor([token]))
+                if done or len(generated) >= budget or any(event.is_set() for event in cancel_events):
+                    break
+                
+                # 1) 초안: 아직 초안 캐시에 없는 토큰부터 이어서 k개 greedy 제안
+                k = min(self.draft_tokens, budget - len(generated))
+                proposal: List[int] = []
+                draft_input = tokens[draft_length:]
+                context = tokens
+                for _ in range(k):
+                    draft_logits = self.draft_model(
+                        input_ids=draft_input.unsqueeze(0), past_key_values=draft_cache, use_cache=True
+                    ).logits
+                    token = self._greedy_next(draft_logits[0, -1], context)
+                    proposal.append(token)
+                    draft_input = torch.tensor([token], device=device)
+                    context = torch.cat([context, draft_input])
+                    if token in eos_ids:
+                        break
+                draft_length = tokens.shape[0] + len(proposal) - 1
+                
+                # 2) 검증: 마지막 확정 토큰 + 제안 토큰을 본 모델 forward 한 번으로
+                verify_input = torch.cat([tokens[-1:], torch.tensor(proposal, device=device)])
+                verify_logits = self.model(
+                    input_ids=verify_input.unsqueeze(0), past_key_values=main_cache, use_cache=True
+                ).logits[0]
+                new_tokens = []
+                for index in range(len(proposal) + 1):
+                    target = self._greedy_next(verify_logits[index], context[:tokens.shape[0] + index])
+                    new_tokens.append(target)
+                    if index == len(proposal) or target != proposal[index]:
+                        break
+                matched = len(new_tokens) - 1
+                
+                # 3) 받아들이지 않은 제안 토큰의 캐시 제거
+                main_cache.crop(tokens.shape[0] + matched)
+                draft_length = min(draft_length, tokens.shape[0] + matched)
+                draft_cache.crop(draft_length)
+                
+                rounds += 1
+                drafted += len(proposal)
+                accepted += matched
+        
+        if streamer is not None:
+            streamer.end()
+        seconds = time.perf_counter() - started
+        text = self.tokenizer.decode(generated, skip_special_tokens=True).strip()
+        if self.is_instruct_model:
+            text = self._clean_instruct_response(text)
+        
+        self._record_batch(1, prompt_length, len(generated), seconds)
+        with self._stats_lock:
+            self.spec_requests += 1
+            self.spec_rounds += rounds
+            self.spec_drafted += drafted
+            self.spec_accepted += accepted
+            self.spec_tokens += len(generated)
+            self.spec_seconds += seconds
+        return text
+    
+    def speculative_stats(self) -> Dict:
+        """
+        투기적 디코딩 지표
+        - acceptance_rate: 초안 토큰 중 본 모델이 받아들인 비율
+        - tokens_per_forward: 본 모델 forward(검증) 한 번에 확정되는 평균 토큰 수 (일반 greedy는 1)
+        - speedup: 같은 서비스의 일반 생성 tokens/sec 대비 (일반 생성 기록이 없으면 0)
+        """
+        with self._stats_lock:
+            normal_tokens = self.generated_tokens - self.spec_tokens
+            normal_seconds = self.generation_seconds - self.spec_seconds
+            spec_tps = self.spec_tokens / self.spec_seconds if self.spec_seconds else 0.0
+            normal_tps = normal_tokens / normal_seconds if normal_seconds > 0 and normal_tokens > 0 else 0.0
+            return {
+                "enabled": self.draft_model is not None,
+                "draft_model": self.draft_model_name,
+                "draft_tokens": self.draft_tokens,
+                "requests": self.spec_requests,
+                "acceptance_rate": round(self.spec_accepted / self.spec_drafted, 3) if self.spec_drafted else 0.0,
+                "tokens_per_forward": round(self.spec_tokens / (self.spec_rounds + self.spec_requests), 2) if self.spec_requests else 0.0,
+                "tokens_per_second": round(spec_tps, 2),
+                "speedup": round(spec_tps / normal_tps, 2) if normal_tps else 0.0,
+            }
+    
+    # ---------------- 스트리밍 ----------------
+    
+    def generate_stream(
+        self,
+        prompt: str,
+        streamer: TextStreamer,
+        max_length: int = 256,
+        temperature: float = 0.7,
+        top_p: float = 0.9
+    ) -> str:
+        """streamer로 토큰을 흘려보내며 생성 (추론 스레드에서 실행), 정리된 전체 응답 반환"""
+        if self._use_speculative(temperature):
+            return self.generate_speculative(prompt, max_length, streamer=streamer)
+        if LLM_PREFIX_CACHE and self.is_instruct_model and "[시스템]" in prompt:
+            return self.generate_with_prefix_cache(prompt, max_length, temperature, top_p, streamer=streamer)
+        return self._generate_single(prompt, max_length, temperature, top_p, streamer)
+    
+    async def astream(
+        self,
+        prompt: str,
+        max_length: int = 256,
+        temperature: float = 0.7,
+        top_p: float = 0.9,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """
+        생성되는 대로 텍스트 조각을 내보내는 async 제너레이터 (동적 배치 없이 단독 생성)
+        소비하는 쪽이 중간에 멈추면(클라이언트 연결 끊김 등) 추론 작업도 취소되어 다음 토큰에서 중단
+        
+        Raises:
+            InferenceQueueFull: 추론 대기열이 가득 참 (첫 조각 전에 발생)
+        """
+        streamer = AsyncTextStreamer(self.tokenizer, asyncio.get_running_loop(), skip_special_tokens=True)
+        job = asyncio.ensure_future(llm_executor.submit(
+            self.generate_stream, prompt, streamer,
+            max_length=max_length, temperature=temperature, top_p=top_p,
+            timeout=timeout
+        ))
+        try:
+            while True:
+                getter = asyncio.ensure_future(streamer.queue.get())
+                await asyncio.wait({getter, job}, return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    text = getter.result()
+                else:
+                    # 생성이 끝났거나 실패 - 실패면 예외 전달, 아니면 큐에 남은 조각을 마저 내보냄
+                    getter.cancel()
+                    job.result()
+                    text = None if streamer.queue.empty() else streamer.queue.get_nowait()
+                if text is None:
+                    break
+                yield text
+            await job
+        finally:
+            if not job.done():
+                job.cancel()
+    
+    def astream_chat(
+        self,
+        messages: List[Dict[str, str]],
+        max_length: int = 256,
+        temperature: float = 0.7,
+        top_p: float = 0.9,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """chat의 스트리밍 버전"""
+        return self.astream(
+            self._format_messages(messages),
+            max_length=max_length, temperature=temperature, top_p=top_p, timeout=timeout
+        )
+    
     def _format_messages(self, messages: List[Dict[str, str]]) -> str:
         """메시지 리스트를 프롬프트로 변환"""
         if self.is_instruct_model:
@@ -276,11 +1020,21 @@ class HuggingFaceLLMService:
 
 # 전역 인스턴스 (싱글톤 패턴)
 _llm_service: Optional[HuggingFaceLLMService] = None
+# 여러 스레드(요청 + 단계 미리 생성)가 동시에 처음 호출해도 모델은 한 번만 로드
+_llm_service_lock = threading.Lock()
 
 def get_llm_service() -> HuggingFaceLLMService:
     """LLM 서비스 인스턴스 가져오기 (싱글톤)"""
     global _llm_service
     if _llm_service is None:
-        _llm_service = HuggingFaceLLMService()
+        with _llm_service_lock:
+            if _llm_service is None:
+                _llm_service = HuggingFaceLLMService()
     return _llm_service
 
+async def aget_llm_service() -> HuggingFaceLLMService:
+    """async 코드용: 처음 호출 시 모델 로딩도 추론 스레드에서 (이벤트 루프를 막지 않음)"""
+    if _llm_service is not None:
+        return _llm_service
+    return await llm_executor.submit(get_llm_service, timeout=0)
+
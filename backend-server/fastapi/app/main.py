@@ -60,6 +60,8 @@ for path in (
 
 # --- [수정된 부분 끝] ---
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from app.api import router as api_router   # api.py의 router를 api_router라는 이름으로 임포트
 from app.cook_api import router as cook_router  # cook_api.py의 router 추가
@@ -69,11 +71,33 @@ from app.a_vision_pipeline import get_pipeline
 
 from app.a_rag_api import router as rag_router # a_rag_api.py의 router 임포트
 from app.a_ws_api_result import router as ws_test_router # a_ws_api_result.py의 router 임포트
+from app.http_clients import http_clients
+from app.cook_session import session_manager
+from app.step_cache import modified_step_cache
+from app.inference_executor import llm_executor
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # AI 서버 업스트림(LLM/STT/TTS) 공유 HTTP 클라이언트 생성/종료
+    await http_clients.startup()
+    # 요리 세션 백엔드 연결 (memory: 만료 세션 주기적 정리 / redis: 연결 확인)
+    await session_manager.startup()
+    try:
+        yield
+    finally:
+        await modified_step_cache.shutdown()
+        llm_executor.shutdown()
+        await session_manager.shutdown()
+        await http_clients.shutdown()
+
+
 # 1) 앱 생성
 app = FastAPI(
     title="레시피 추천 API",
     description="사용자 재료 기반 레시피 추천 서비스",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 2) 라우터 포함 — 반드시 app 선언 이후에!
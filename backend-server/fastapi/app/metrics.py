@@ -0,0 +1,65 @@
+"""
+간단한 인프로세스 지표 (히스토그램)
+외부 모니터링 의존성 없이 /system/status 등에서 dict로 노출
+"""
+
+import bisect
+import threading
+from typing import Dict, Sequence
+
+# 지연 시간(초) 기본 버킷
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+# 대기열 길이 기본 버킷
+DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64)
+
+
+class Histogram:
+    """고정 버킷 히스토그램 (Prometheus처럼 le 기준 누적 개수로 출력)"""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # 마지막 칸은 +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+            self._count += 1
+            if value > self._max:
+                self._max = value
+
+    def quantile(self, q: float) -> float:
+        """버킷 상한 기준 근사 분위수 (+Inf 구간이면 관측 최댓값)"""
+        with self._lock:
+            if not self._count:
+                return 0.0
+            rank = q * self._count
+            seen = 0
+            for bound, count in zip(self.buckets, self._counts):
+                seen += count
+                if seen >= rank:
+                    return bound
+            return self._max
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            cumulative = {}
+            seen = 0
+            for bound, count in zip(self.buckets, self._counts):
+                seen += count
+                cumulative[str(bound)] = seen
+            cumulative["+Inf"] = self._count
+            count, total, maximum = self._count, self._sum, self._max
+        return {
+            "count": count,
+            "sum": round(total, 4),
+            "avg": round(total / count, 4) if count else 0.0,
+            "max": round(maximum, 4),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": cumulative,
+        }
@@ -0,0 +1,130 @@
+"""
+RAG 추천 문구 캐시
+(레시피 ID, 매칭된 재료 집합) 별로 LLM이 생성한 recommendation_text를 보관
+메모리 LRU + TTL, RAG_TEXT_CACHE_PATH 지정 시 SQLite 파일에 영속화
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+RAG_TEXT_CACHE_SIZE = int(os.getenv("RAG_TEXT_CACHE_SIZE", "5000"))
+RAG_TEXT_CACHE_TTL = float(os.getenv("RAG_TEXT_CACHE_TTL", str(7 * 24 * 3600)))  # 기본 7일
+RAG_TEXT_CACHE_PATH = os.getenv("RAG_TEXT_CACHE_PATH", "")  # 비어 있으면 메모리 전용
+
+
+def make_cache_key(recipe_id, matched_ingredients: Iterable[str]) -> str:
+    """레시피 ID + 정렬된 매칭 재료 집합으로 캐시 키 생성"""
+    matched = ",".join(sorted({m for m in matched_ingredients if m}))
+    return f"{recipe_id}|{matched}"
+
+
+def recipe_cache_key(recipe: Dict) -> str:
+    """추천 결과 dict에서 캐시 키 생성 (id가 없는 레거시 결과는 제목 사용)"""
+    recipe_id = recipe.get("id")
+    if recipe_id is None:
+        recipe_id = recipe.get("title", "")
+    return make_cache_key(recipe_id, recipe.get("matched_ingredients") or [])
+
+
+class RecommendationTextCache:
+    """recommendation_text용 LRU + TTL 캐시 (선택적 SQLite 영속화)"""
+
+    def __init__(
+        self,
+        max_entries: int = RAG_TEXT_CACHE_SIZE,
+        ttl: float = RAG_TEXT_CACHE_TTL,
+        path: str = RAG_TEXT_CACHE_PATH
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._open_db(path)
+
+    def _open_db(self, path: str) -> None:
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS rag_text ("
+                " key TEXT PRIMARY KEY, text TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            # 만료된 항목 정리
+            self._db.execute("DELETE FROM rag_text WHERE created_at < ?", (time.time() - self.ttl,))
+            self._db.commit()
+            logger.info(f"RAG 문구 캐시 SQLite 사용: {path}")
+        except Exception as e:
+            logger.warning(f"RAG 문구 캐시 SQLite 열기 실패, 메모리 캐시만 사용: {e}")
+            self._db = None
+
+    def get(self, key: str) -> Optional[str]:
+        """캐시된 문구 조회 (없거나 TTL이 지났으면 None → 다시 생성)"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT created_at, text FROM rag_text WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    entry = (row[0], row[1])
+                    self._store(key, entry)
+            if entry is None or now - entry[0] > self.ttl:
+                if entry is not None:
+                    self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, text: str) -> None:
+        if not text:
+            return
+        entry = (time.time(), text)
+        with self._lock:
+            self._store(key, entry)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO rag_text (key, text, created_at) VALUES (?, ?, ?)",
+                        (key, text, entry[0])
+                    )
+                    self._db.commit()
+                except Exception as e:
+                    logger.warning(f"RAG 문구 캐시 저장 실패: {e}")
+
+    def _store(self, key: str, entry: Tuple[float, str]) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "persistent": self._db is not None,
+            }
+
+
+# 전역 인스턴스
+rag_text_cache = RecommendationTextCache()
@@ -0,0 +1,110 @@
+"""
+추천 랭킹 단기 캐시
+/recommend 페이지 요청 시 같은 질의의 랭킹을 재계산하지 않도록
+질의 토큰별로 계산된 랭킹을 짧은 시간 동안 보관
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 랭킹 보관 시간(초) / 최대 보관 질의 수
+RANKING_TTL_SECONDS = 300
+RANKING_CACHE_SIZE = 256
+# 캐시 미스 시 한 번에 계산해 두는 최소 랭킹 길이 (이후 페이지 요청 대비)
+RANKING_WINDOW = 100
+
+
+def make_query_token(endpoint: str, payload: Dict) -> str:
+    """요청 본문과 엔드포인트로부터 결정적인 질의 토큰 생성"""
+    raw = json.dumps({"endpoint": endpoint, **payload}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(token: str, offset: int) -> str:
+    """(질의 토큰, 오프셋) 을 불투명한 커서 문자열로 인코딩"""
+    raw = f"{token}:{offset}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """커서 문자열을 (질의 토큰, 오프셋) 으로 디코딩 (형식 오류 시 ValueError)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        token, offset = base64.urlsafe_b64decode(padded.encode("ascii")).decode("ascii").split(":")
+        offset = int(offset)
+    except Exception as e:
+        raise ValueError(f"잘못된 커서입니다: {cursor}") from e
+    if offset < 0:
+        raise ValueError(f"잘못된 커서입니다: {cursor}")
+    return token, offset
+
+
+class RankingCache:
+    """질의 토큰 → (만료 시각, 랭킹, 전체 여부) 를 보관하는 TTL + LRU 캐시"""
+
+    def __init__(self, ttl: float = RANKING_TTL_SECONDS, max_entries: int = RANKING_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, List[Dict], bool]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str, needed: int) -> Optional[Tuple[List[Dict], bool]]:
+        """
+        needed개 이상의 결과를 보장할 수 있는 랭킹 조회
+
+        캐시된 랭킹이 부분 랭킹(window)이고 needed보다 짧으면 None을 반환해
+        호출자가 더 긴 랭킹을 다시 계산하도록 한다.
+
+        Returns:
+            (랭킹, 전체 랭킹 여부) 또는 None
+        """
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            expires_at, ranking, complete = entry
+            if expires_at < time.monotonic():
+                del self._entries[token]
+                return None
+            if not complete and len(ranking) < needed:
+                return None
+            self._entries.move_to_end(token)
+            return ranking, complete
+
+    def put(self, token: str, ranking: List[Dict], complete: bool) -> None:
+        with self._lock:
+            self._entries[token] = (time.monotonic() + self.ttl, ranking, complete)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def project_fields(results: List[Dict], fields: Optional[List[str]]) -> List[Dict]:
+    """fields에 지정된 키만 남긴 사본 목록 (None이면 얕은 사본)"""
+    if not fields:
+        return [dict(r) for r in results]
+    return [{k: r[k] for k in fields if k in r} for r in results]
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """'title,score,id' 형식의 쿼리 문자열을 키 목록으로 변환"""
+    if not fields:
+        return None
+    parsed = [f.strip() for f in fields.split(",") if f.strip()]
+    return parsed or None
+
+
+# 전역 인스턴스
+ranking_cache = RankingCache()
@@ -0,0 +1,344 @@
+"""
+요리 세션 저장 백엔드 (교체 가능)
+- memory: 프로세스 메모리 (BoundedSessionStore) - 워커 1개일 때 기본값
+- redis: Redis 호환 서버 (RESP 프로토콜) - 여러 워커/노드가 같은 세션을 공유
+SESSION_BACKEND 환경변수로 선택 (기본 memory)
+
+세션은 JSON(orjson 우선)으로 직렬화하고, 큰 세션(레시피 데이터 포함)은 zlib으로 압축한다.
+한 턴의 변경은 CookSessionManager.turn()에서 모아 턴 끝에 한 번만 쓴다.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import unquote, urlparse
+
+from .session_store import BoundedSessionStore, SESSION_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # orjson 미설치 시 표준 json 사용
+    orjson = None
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory").lower()
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0")
+SESSION_REDIS_PREFIX = os.getenv("SESSION_REDIS_PREFIX", "cookduck:session:")
+SESSION_REDIS_TIMEOUT = float(os.getenv("SESSION_REDIS_TIMEOUT", "2"))
+
+# 직렬화 결과가 이보다 크면 압축
+COMPRESS_MIN_BYTES = 1024
+
+_PLAIN = b"j"
+_COMPRESSED = b"z"
+
+
+# ---------------- 직렬화 ----------------
+
+def encode_session(data: Dict) -> bytes:
+    """세션 dict → 바이트 (1바이트 헤더 + JSON 또는 zlib 압축 JSON)"""
+    if orjson is not None:
+        body = orjson.dumps(data)
+    else:
+        body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(body) > COMPRESS_MIN_BYTES:
+        return _COMPRESSED + zlib.compress(body, 6)
+    return _PLAIN + body
+
+
+def decode_session(raw: bytes) -> Dict:
+    """encode_session의 역변환"""
+    header, body = raw[:1], raw[1:]
+    if header == _COMPRESSED:
+        body = zlib.decompress(body)
+    elif header != _PLAIN:
+        raise ValueError(f"알 수 없는 세션 형식: {header!r}")
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+# ---------------- 백엔드 인터페이스 ----------------
+
+class SessionBackend(ABC):
+    """세션 바이트 저장소 인터페이스 (키 → 직렬화된 세션)"""
+
+    name = "base"
+
+    async def startup(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        """세션 조회 (조회하면 만료 시각 연장)"""
+
+    @abstractmethod
+    async def set_many(self, items: Dict[str, bytes]) -> None:
+        """여러 세션을 한 번에 저장 (TTL 갱신 포함)"""
+
+    async def set(self, key: str, value: bytes) -> None:
+        await self.set_many({key: value})
+
+    @abstractmethod
+    async def delete(self, key: str) -> bool:
+        """세션 삭제 (있었으면 True)"""
+
+    def stats(self) -> Dict:
+        return {"backend": self.name}
+
+
+class InMemorySessionBackend(SessionBackend):
+    """프로세스 메모리 백엔드 (TTL/LRU/메모리 상한은 BoundedSessionStore가 담당)"""
+
+    name = "memory"
+
+    def __init__(self, store: Optional[BoundedSessionStore] = None):
+        self.store = store or BoundedSessionStore("cook")
+
+    async def startup(self) -> None:
+        self.store.start_sweeper()
+
+    async def close(self) -> None:
+        await self.store.stop_sweeper()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self.store.get(key)
+
+    async def set_many(self, items: Dict[str, bytes]) -> None:
+        for key, value in items.items():
+            self.store[key] = value
+
+    async def delete(self, key: str) -> bool:
+        return self.store.pop(key) is not None
+
+    def stats(self) -> Dict:
+        return {"backend": self.name, **self.store.stats()}
+
+
+# ---------------- RESP 클라이언트 ----------------
+
+class RespError(Exception):
+    """서버가 돌려준 오류 응답 (-ERR ...)"""
+
+
+class RespClient:
+    """
+    의존성 없는 최소 RESP2 클라이언트 (Redis, KeyDB, Valkey, 테스트용 가짜 서버 등)
+    - 연결 하나를 공유하고 여러 명령을 파이프라인으로 한 번에 전송
+    - 연결이 끊기면 한 번 재연결 후 재시도
+    """
+
+    def __init__(self, url: str = SESSION_REDIS_URL, timeout: float = SESSION_REDIS_TIMEOUT):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.password = unquote(parsed.password) if parsed.password else None
+        path = (parsed.path or "").lstrip("/")
+        self.db = int(path) if path.isdigit() else 0
+        self.timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    @staticmethod
+    def _pack(args: Sequence[Any]) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if isinstance(arg, bytes):
+                data = arg
+            elif isinstance(arg, str):
+                data = arg.encode("utf-8")
+            else:
+                data = str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    async def _read_reply(self) -> Any:
+        line = await self._reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("RESP 연결이 끊어졌습니다")
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b"+":
+            return payload.decode("utf-8")
+        if prefix == b"-":
+            return RespError(payload.decode("utf-8"))
+        if prefix == b":":
+            return int(payload)
+        if prefix == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = await self._reader.readexactly(length + 2)
+            return data[:-2]
+        if prefix == b"*":
+            count = int(payload)
+            if count < 0:
+                return None
+            return [await self._read_reply() for _ in range(count)]
+        raise ConnectionError(f"알 수 없는 RESP 응답: {line[:20]!r}")
+
+    async def _connect(self) -> None:
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout
+        )
+        setup: List[Tuple] = []
+        if self.password is not None:
+            setup.append(("AUTH", self.username, self.password) if self.username else ("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            for reply in await self._roundtrip(setup):
+                if isinstance(reply, RespError):
+                    await self._disconnect()
+                    raise reply
+
+    async def _disconnect(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except Exception:
+                pass
+        self._reader = self._writer = None
+
+    async def _roundtrip(self, commands: Sequence[Sequence[Any]]) -> List[Any]:
+        self._writer.write(b"".join(self._pack(cmd) for cmd in commands))
+        await self._writer.drain()
+        # 오류 응답이 있어도 나머지 응답을 모두 읽어야 다음 요청과 섞이지 않음
+        return await asyncio.wait_for(self._read_all(len(commands)), self.timeout)
+
+    async def _read_all(self, count: int) -> List[Any]:
+        return [await self._read_reply() for _ in range(count)]
+
+    async def execute_many(self, commands: Sequence[Sequence[Any]]) -> List[Any]:
+        """명령 여러 개를 파이프라인으로 실행 → 응답 목록 (첫 오류 응답은 예외로 발생)"""
+        if not commands:
+            return []
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._writer is None:
+                        await self._connect()
+                    replies = await self._roundtrip(commands)
+                    break
+                except (ConnectionError, OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+                    await self._disconnect()
+                    if attempt:
+                        raise ConnectionError(f"세션 서버 연결 실패 ({self.host}:{self.port}): {e}") from e
+                    logger.warning(f"세션 서버 재연결: {e}")
+                except BaseException:
+                    # 응답을 읽는 도중 취소되면 스트림 위치를 알 수 없으므로 연결을 버림
+                    await self._disconnect()
+                    raise
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    async def execute(self, *args: Any) -> Any:
+        return (await self.execute_many([args]))[0]
+
+    async def close(self) -> None:
+        if self._lock is None:
+            await self._disconnect()
+            return
+        async with self._lock:
+            await self._disconnect()
+
+
+class RedisSessionBackend(SessionBackend):
+    """Redis 호환 서버 백엔드 (만료는 서버의 PX TTL, 조회 시 PEXPIRE로 연장)"""
+
+    name = "redis"
+
+    def __init__(
+        self,
+        url: str = SESSION_REDIS_URL,
+        prefix: str = SESSION_REDIS_PREFIX,
+        ttl: float = SESSION_TTL_SECONDS,
+        client: Optional[RespClient] = None
+    ):
+        self.url = url
+        self.prefix = prefix
+        self.ttl_ms = int(ttl * 1000)
+        self.client = client or RespClient(url)
+
+        self.reads = 0
+        self.writes = 0
+        self.round_trips = 0
+        self.errors = 0
+        self.total_latency_ms = 0.0
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    async def _execute(self, commands: Sequence[Sequence[Any]]) -> List[Any]:
+        start = time.perf_counter()
+        try:
+            return await self.client.execute_many(commands)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.round_trips += 1
+            self.total_latency_ms += (time.perf_counter() - start) * 1000
+
+    async def startup(self) -> None:
+        try:
+            await self._execute([("PING",)])
+            logger.info(f"세션 백엔드: redis ({self.client.host}:{self.client.port}/{self.client.db})")
+        except Exception as e:
+            # 서버가 늦게 뜨는 경우도 있으므로 첫 요청에서 다시 연결
+            logger.error(f"세션 서버 연결 확인 실패: {e}")
+
+    async def close(self) -> None:
+        await self.client.close()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        name = self._key(key)
+        value, _ = await self._execute([("GET", name), ("PEXPIRE", name, self.ttl_ms)])
+        self.reads += 1
+        return value
+
+    async def set_many(self, items: Dict[str, bytes]) -> None:
+        if not items:
+            return
+        await self._execute([("SET", self._key(k), v, "PX", self.ttl_ms) for k, v in items.items()])
+        self.writes += len(items)
+
+    async def delete(self, key: str) -> bool:
+        (deleted,) = await self._execute([("DEL", self._key(key))])
+        return bool(deleted)
+
+    def stats(self) -> Dict:
+        return {
+            "backend": self.name,
+            "host": f"{self.client.host}:{self.client.port}/{self.client.db}",
+            "ttl_seconds": self.ttl_ms / 1000,
+            "reads": self.reads,
+            "writes": self.writes,
+            "round_trips": self.round_trips,
+            "errors": self.errors,
+            "avg_latency_ms": round(self.total_latency_ms / self.round_trips, 2) if self.round_trips else 0.0,
+        }
+
+
+def create_session_backend(kind: str = SESSION_BACKEND) -> SessionBackend:
+    """SESSION_BACKEND 설정에 맞는 백엔드 생성"""
+    if kind == "redis":
+        return RedisSessionBackend()
+    if kind != "memory":
+        logger.warning(f"알 수 없는 SESSION_BACKEND='{kind}', memory 사용")
+    return InMemorySessionBackend()
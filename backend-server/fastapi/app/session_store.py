@@ -0,0 +1,199 @@
+"""
+요리 세션 저장소 (크기 제한 + 만료)
+- 마지막 접근 후 SESSION_TTL_SECONDS가 지나면 만료 (연결이 비정상 종료된 세션 정리)
+- 최대 개수 / 추정 메모리(SESSION_MAX_MB)를 넘으면 가장 오래 쓰지 않은 세션부터 삭제 (LRU)
+- 백그라운드 스위퍼가 주기적으로 만료 세션을 정리하고 메모리 사용량을 다시 계산
+- dict처럼 사용 (store[key] = value, store.get(key), del store[key], key in store)
+(fastapi_gateapi/session_store.py 와 동일한 내용 유지)
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", str(2 * 3600)))  # 기본 2시간
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_MB", "64")) * 1024 * 1024
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+
+_MISSING = object()
+
+
+def estimate_size(obj: Any, _seen: Optional[set] = None) -> int:
+    """객체가 참조하는 dict/list/문자열/모델 필드까지 포함한 대략적인 메모리 크기(바이트)"""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, _seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        # pydantic 모델 등 일반 객체는 필드 값 기준
+        size += estimate_size(vars(obj), _seen)
+    return size
+
+
+class BoundedSessionStore:
+    """TTL + LRU + 메모리 상한을 갖는 세션 저장소"""
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float = SESSION_TTL_SECONDS,
+        max_entries: int = SESSION_MAX_ENTRIES,
+        max_bytes: int = SESSION_MAX_BYTES,
+        sweep_interval: float = SESSION_SWEEP_INTERVAL
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        # 키 → (마지막 접근 시각, 값, 추정 크기), 앞쪽이 가장 오래 쓰지 않은 세션
+        self._entries: "OrderedDict[str, Tuple[float, Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._sweeper: Optional[asyncio.Task] = None
+
+        self.expired = 0
+        self.evicted = 0
+
+    # ---------------- dict 인터페이스 ----------------
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        size = estimate_size(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (time.monotonic(), value, size)
+            self._bytes += size
+            self._enforce_limits()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """세션 조회 (조회하면 만료 시각이 연장됨)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if now - entry[0] > self.ttl:
+                self._remove(key)
+                self.expired += 1
+                return default
+            self._entries[key] = (now, entry[1], entry[2])
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: object) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and time.monotonic() - entry[0] <= self.ttl
+
+    def __delitem__(self, key: str) -> None:
+        with self._lock:
+            if key not in self._entries:
+                raise KeyError(key)
+            self._remove(key)
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            self._remove(key)
+            return entry[1]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._entries))
+
+    # ---------------- 정리 ----------------
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry[2]
+
+    def _enforce_limits(self) -> None:
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key, _ = next(iter(self._entries.items()))
+            self._remove(key)
+            self.evicted += 1
+            logger.info(f"세션 저장소({self.name}): 한도 초과로 오래된 세션 삭제 {key}")
+
+    def sweep(self) -> int:
+        """만료 세션 삭제 + 남은 세션 메모리 재계산 (세션 객체가 제자리에서 바뀌므로) → 삭제 수"""
+        now = time.monotonic()
+        removed = 0
+        with self._lock:
+            for key in list(self._entries):
+                accessed, value, _ = self._entries[key]
+                if now - accessed > self.ttl:
+                    self._remove(key)
+                    removed += 1
+            self.expired += removed
+            self._bytes = 0
+            for key, (accessed, value, _) in list(self._entries.items()):
+                size = estimate_size(value)
+                self._entries[key] = (accessed, value, size)
+                self._bytes += size
+            self._enforce_limits()
+        if removed:
+            logger.info(f"세션 저장소({self.name}): 만료 세션 {removed}개 정리 (남은 세션 {len(self._entries)}개)")
+        return removed
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"세션 저장소({self.name}) 정리 실패: {e}")
+
+    def start_sweeper(self) -> None:
+        """앱 lifespan 시작 시 호출"""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.ensure_future(self._sweep_loop())
+
+    async def stop_sweeper(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
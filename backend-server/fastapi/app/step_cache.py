@@ -0,0 +1,194 @@
+"""
+수정된 요리 단계 캐시 (/cook/next, /cook/current)
+(레시피 ID, 단계 번호, 제약사항 집합 해시) 별로 룰/LLM으로 수정한 단계 문장을 보관한다.
+- 세션 간 공유: 같은 레시피를 같은 요구로 요리하는 사용자는 같은 결과를 재사용
+- 제약사항이 바뀌면 해시가 달라져 자동으로 새 항목을 사용 (이전 항목은 LRU로 정리)
+- 같은 키의 동시 생성은 하나로 합침 (미리 생성과 실제 요청이 겹치는 경우)
+- prefetch(): 사용자가 N단계를 요리하는 동안 N+1단계를 백그라운드에서 미리 생성
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+STEP_CACHE_SIZE = int(os.getenv("STEP_CACHE_SIZE", "2000"))
+STEP_CACHE_TTL = float(os.getenv("STEP_CACHE_TTL", str(24 * 3600)))  # 기본 1일
+STEP_PREFETCH_ENABLED = os.getenv("STEP_PREFETCH_ENABLED", "true").lower() in ("1", "true", "yes")
+# 미리 생성 동시 실행 수 (실제 요청이 모델을 먼저 쓰도록 작게)
+STEP_PREFETCH_CONCURRENCY = 1
+
+
+def constraints_hash(constraints: Iterable, step_text: str = "") -> str:
+    """
+    제약사항 집합(순서 무관) + 원문 단계 문장의 해시
+    (DB의 조리법이 바뀌거나 폴백 레시피를 쓰는 경우 같은 번호의 다른 문장을 구분)
+    """
+    items = sorted(
+        f"{c.type}:{c.action}:{c.degree or ''}:{c.value or ''}" for c in constraints
+    )
+    payload = "\n".join(items) + "\0" + step_text
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def make_step_key(recipe_id, step_index: int, constraints: Iterable, step_text: str = "") -> str:
+    return f"{recipe_id}|{step_index}|{constraints_hash(constraints, step_text)}"
+
+
+class ModifiedStepCache:
+    """수정된 단계 문장용 LRU + TTL 캐시 (생성 중복 제거, 미리 생성)"""
+
+    def __init__(
+        self,
+        max_entries: int = STEP_CACHE_SIZE,
+        ttl: float = STEP_CACHE_TTL,
+        prefetch_enabled: bool = STEP_PREFETCH_ENABLED
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.prefetch_enabled = prefetch_enabled
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # 세션(user_id)별 진행 중인 미리 생성 - 제약사항이 바뀌면 이전 작업 취소
+        self._prefetch_by_owner: Dict[str, asyncio.Task] = {}
+        self._prefetch_tasks: Set[asyncio.Task] = set()
+        self._prefetch_semaphore: Optional[asyncio.Semaphore] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+        self.prefetch_cancelled = 0
+        self.errors = 0
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if now - entry[0] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: str, text: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def get_or_build(self, key: str, build: Callable[[], Awaitable[str]]) -> str:
+        """캐시에서 찾고, 없으면 생성해서 저장 후 반환 (같은 키 동시 생성은 하나로)"""
+        text = self.get(key)
+        if text is not None:
+            self.hits += 1
+            return text
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            # 미리 생성 중이면 그 결과를 기다림 (기다리는 쪽이 취소돼도 생성은 계속)
+            await asyncio.wait({inflight})
+            if not inflight.cancelled() and inflight.exception() is None:
+                self.hits += 1
+                return inflight.result()
+            # 먼저 시작한 생성이 실패/취소되면 직접 생성
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            text = await build()
+            self.put(key, text)
+            future.set_result(text)
+            return text
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # 기다리는 쪽이 없어도 경고가 남지 않도록
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    # ---------------- 미리 생성 ----------------
+
+    async def _prefetch_one(self, key: str, build: Callable[[], Awaitable[str]]) -> None:
+        if self._prefetch_semaphore is None:
+            self._prefetch_semaphore = asyncio.Semaphore(STEP_PREFETCH_CONCURRENCY)
+        async with self._prefetch_semaphore:
+            if self.get(key) is not None or key in self._inflight:
+                return
+            try:
+                await self.get_or_build(key, build)
+                self.prefetched += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"단계 미리 생성 실패 ({key}): {e}")
+
+    def prefetch(self, owner: str, key: str, build: Callable[[], Awaitable[str]]) -> None:
+        """
+        다음 단계를 백그라운드에서 미리 생성 (결과를 기다리지 않음)
+        같은 owner(세션)의 이전 미리 생성은 더 이상 필요 없으므로 취소
+        """
+        if not self.prefetch_enabled:
+            return
+        self.cancel_prefetch(owner)
+        if self.get(key) is not None or key in self._inflight:
+            return
+        task = asyncio.ensure_future(self._prefetch_one(key, build))
+        self._prefetch_by_owner[owner] = task
+        self._prefetch_tasks.add(task)
+
+        def _done(done_task: asyncio.Task) -> None:
+            self._prefetch_tasks.discard(done_task)
+            if self._prefetch_by_owner.get(owner) is done_task:
+                del self._prefetch_by_owner[owner]
+
+        task.add_done_callback(_done)
+
+    def cancel_prefetch(self, owner: str) -> None:
+        """세션의 진행 중인 미리 생성 취소 (제약사항 변경/세션 삭제 시)"""
+        task = self._prefetch_by_owner.pop(owner, None)
+        if task is not None and not task.done():
+            task.cancel()
+            self.prefetch_cancelled += 1
+
+    async def shutdown(self) -> None:
+        for task in list(self._prefetch_tasks):
+            task.cancel()
+        self._prefetch_tasks.clear()
+        self._prefetch_by_owner.clear()
+        self._prefetch_semaphore = None
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries = len(self._entries)
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "prefetch_enabled": self.prefetch_enabled,
+            "prefetched": self.prefetched,
+            "prefetching": len(self._prefetch_tasks),
+            "prefetch_cancelled": self.prefetch_cancelled,
+            "errors": self.errors,
+        }
+
+
+# 전역 인스턴스
+modified_step_cache = ModifiedStepCache()
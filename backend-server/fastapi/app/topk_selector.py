@@ -0,0 +1,67 @@
+"""
+추천 결과 상위 k개 선택 유틸리티
+점수 계산 중 (정렬 키, 레시피) 쌍을 크기가 제한된 힙으로 유지하고,
+남은 후보가 k번째 점수를 넘을 수 없으면 조기 종료 여부를 알려준다.
+"""
+
+import heapq
+import itertools
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+# 점수 계산 시 DB에서 한 번에 조회할 후보 수
+SCORING_BATCH_SIZE = 64
+
+
+class TopKHeap:
+    """정렬 키 기준 상위 k개만 유지하는 최소 힙 (k=None이면 전체 유지)"""
+
+    def __init__(self, k: Optional[int] = None):
+        self.k = None if k is None else max(int(k), 0)
+        self._heap: List[Tuple[Any, int, Any]] = []
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, key: Tuple, item: Any) -> bool:
+        """
+        후보 추가. 같은 키에서는 먼저 들어온 후보(FAISS 거리 순)가 우선한다.
+
+        Returns:
+            힙에 남았는지 여부
+        """
+        entry = (key, -next(self._counter), item)
+        if self.k is None or len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+            return True
+        if self.k and entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+            return True
+        return False
+
+    def is_full(self) -> bool:
+        return self.k is not None and len(self._heap) >= self.k
+
+    def can_beat(self, upper_bound_key: Tuple) -> bool:
+        """
+        남은 후보의 최대 가능 키가 현재 k번째 키를 넘을 수 있는지 확인
+
+        키가 같으면 먼저 들어온 후보가 이기므로, 상한이 k번째 키보다
+        엄격히 커야만 순위가 바뀔 수 있다.
+        """
+        if not self.is_full():
+            return True
+        if self.k == 0:
+            return False
+        return upper_bound_key > self._heap[0][0]
+
+    def sorted_items(self) -> List[Any]:
+        """키 내림차순 (동점이면 입력 순서) 으로 정렬된 항목 목록"""
+        ordered = sorted(self._heap, key=lambda e: e[:2], reverse=True)
+        return [item for _, _, item in ordered]
+
+
+def iter_batches(candidates: Sequence, size: int = SCORING_BATCH_SIZE) -> Iterator[Sequence]:
+    """후보 목록을 DB 조회 단위로 나눈다"""
+    for start in range(0, len(candidates), size):
+        yield candidates[start:start + size]
@@ -0,0 +1,134 @@
+"""
+/recommend 응답 직렬화 벤치마크
+기본 경로(response_model=List[dict] 검증 + jsonable_encoder)와
+빠른 경로(FastJSONResponse, orjson)의 직렬화 시간과 전체 지연 대비 비중 비교
+
+사용법:
+    python bench_json_serialization.py --recipes 300 --content-bytes 3000 --scoring-ms 150
+    (--scoring-ms: /recommend/performance의 execution_time으로 측정한 점수 계산 시간)
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import List
+
+os.environ["FAST_JSON_RESPONSE"] = "true"
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+
+from app.fast_json import FastJSONResponse, orjson
+
+
+def build_payload(recipes: int, content_bytes: int) -> List[dict]:
+    """추천 결과와 같은 형태의 합성 데이터"""
+    sentence = "양파를 채 썰어 팬에 볶다가 고추장 1큰술을 넣고 중불에서 3분간 더 볶습니다. "
+    content = (sentence * (content_bytes // len(sentence.encode("utf-8")) + 1))[: content_bytes // 3]
+    results = []
+    for i in range(recipes):
+        results.append({
+            "id": i,
+            "title": f"레시피 {i}",
+            "ingredients": "돼지고기,양파,고추장,간장,설탕,마늘,대파,식용유",
+            "main_ingredients": "돼지고기,양파",
+            "sub_ingredients": "고추장,간장,설탕,마늘,파,식용유",
+            "content": content,
+            "score": 0.8 - i * 0.001,
+            "match_score": 0.66,
+            "matched_main_ingredients": ["돼지고기", "양파"],
+            "matched_sub_ingredients": ["고추장"],
+            "matched_ingredients": ["돼지고기", "양파", "고추장"],
+            "distance": 12.5 + i * 0.01,
+        })
+    return results
+
+
+def build_app(payload: List[dict]) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/noop", response_model=List[dict])
+    def noop():
+        return []
+
+    @app.post("/recommend", response_model=List[dict])
+    def recommend_default():
+        return payload
+
+    @app.post("/recommend/fast", response_model=List[dict])
+    def recommend_fast():
+        return FastJSONResponse(payload)
+
+    return app
+
+
+def time_requests(client: TestClient, path: str, repeat: int) -> float:
+    """요청 지연 중앙값 (ms)"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.post(path)
+        response.raise_for_status()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def time_call(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipes", type=int, default=300)
+    parser.add_argument("--content-bytes", type=int, default=3000)
+    parser.add_argument("--scoring-ms", type=float, default=150.0)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    if orjson is None:
+        print("⚠️ orjson이 설치되어 있지 않아 빠른 경로도 기본 인코더를 사용합니다.")
+
+    payload = build_payload(args.recipes, args.content_bytes)
+    body_size = len(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+    print(f"레시피 {args.recipes}개, 응답 크기 {body_size / 1024:.1f} KB")
+
+    # 1) 직렬화 함수 단독 비교
+    default_encode = time_call(
+        lambda: json.dumps(jsonable_encoder(payload), ensure_ascii=False).encode("utf-8"), args.repeat
+    )
+    fast_encode = time_call(lambda: FastJSONResponse(payload).body, args.repeat)
+    print(f"\n[직렬화 단독] 기본: {default_encode:.2f} ms / orjson: {fast_encode:.2f} ms")
+
+    # 2) FastAPI 요청 경로 비교 (검증 + 직렬화 포함)
+    client = TestClient(build_app(payload))
+    for path in ("/noop", "/recommend", "/recommend/fast"):
+        client.post(path)  # 워밍업
+    baseline = time_requests(client, "/noop", args.repeat)
+    default_total = time_requests(client, "/recommend", args.repeat)
+    fast_total = time_requests(client, "/recommend/fast", args.repeat)
+    default_ser = max(default_total - baseline, 0.0)
+    fast_ser = max(fast_total - baseline, 0.0)
+
+    print(f"\n[요청 경로] 빈 응답: {baseline:.2f} ms")
+    for name, ser in (("기본", default_ser), ("빠른 경로", fast_ser)):
+        latency = args.scoring_ms + baseline + ser
+        print(
+            f"  {name:6s}: 직렬화 {ser:7.2f} ms, "
+            f"/recommend 지연 {latency:7.2f} ms 중 {ser / latency * 100:5.1f}%"
+        )
+    if fast_ser > 0:
+        print(f"\n직렬화 속도 향상: {default_ser / fast_ser:.1f}배")
+
+
+if __name__ == "__main__":
+    main()
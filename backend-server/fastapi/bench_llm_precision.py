@@ -0,0 +1,158 @@
+"""
+로컬 Llama 로딩 방식 벤치마크 (LLM_PRECISION / LLM_TORCH_COMPILE)
+fp32 기준과 비교해 각 방식의 메모리, 생성 속도(tokens/sec), 출력 일치도를 측정
+
+방식마다 별도 프로세스에서 모델을 로드하므로 RSS(프로세스 메모리)를 서로 섞이지 않게 잴 수 있다.
+출력 일치도는 같은 프롬프트를 greedy로 생성해 fp32 결과와 비교
+(exact: 완전히 같은 응답 비율, prefix: 처음 달라지기 전까지 같은 글자 비율 평균)
+
+사용법:
+    python bench_llm_precision.py --modes fp32,bf16,int8 --max-new-tokens 64
+    python bench_llm_precision.py --modes fp32,int8 --compile   (torch.compile 적용)
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+PROMPTS = [
+    "김치찌개를 맛있게 끓이는 방법을 알려줘.",
+    "[시스템]\n너는 한국 요리 도우미 셰프야.\n\n레시피 제목: 제육볶음\n사용자 요구(누적): 맵기: 줄이기\n\n[사용자]\n현재 단계 번호: 3\n원문 단계: 고추장 2큰술과 고춧가루 1큰술을 넣고 볶는다.",
+    "계란말이를 부드럽게 만드는 팁은?",
+    "된장찌개에 넣으면 좋은 채소를 추천해줘.",
+    "[시스템]\n너는 한국 요리 도우미 셰프야.\n\n레시피 제목: 잡채\n사용자 요구(누적): 재료: 시금치 빼기\n\n[사용자]\n현재 단계 번호: 2\n원문 단계: 시금치를 데쳐 물기를 짜고 소금, 참기름으로 무친다.",
+]
+
+
+def rss_mb() -> float:
+    """현재 프로세스 RSS (MB)"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        import resource
+        # macOS는 바이트, Linux는 KB 단위 (최대값)
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024
+
+
+def run_worker(mode: str, compile_model: bool, max_new_tokens: int, repeat: int) -> Dict:
+    """한 가지 방식으로 모델을 로드해 측정 (자식 프로세스에서 실행)"""
+    from app.llm_service import HuggingFaceLLMService
+
+    base_rss = rss_mb()
+    service = HuggingFaceLLMService(precision=mode, compile_model=compile_model)
+    loaded_rss = rss_mb()
+
+    # 첫 생성은 컴파일/메모리 할당이 섞이므로 제외
+    warmup_started = time.perf_counter()
+    service._generate_single(PROMPTS[0], 64, 0.0, 1.0)
+    warmup_seconds = time.perf_counter() - warmup_started
+
+    outputs: List[str] = []
+    tokens = 0
+    seconds = 0.0
+    for round_index in range(repeat):
+        for prompt in PROMPTS:
+            full_prompt = service._format_instruct_prompt(prompt) if service.is_instruct_model else prompt
+            prompt_tokens = len(service.tokenizer(full_prompt, add_special_tokens=False)["input_ids"])
+            before = service.generated_tokens
+            started = time.perf_counter()
+            text = service._generate_single(prompt, prompt_tokens + max_new_tokens, 0.0, 1.0)
+            seconds += time.perf_counter() - started
+            tokens += service.generated_tokens - before
+            if round_index == 0:
+                outputs.append(text)
+
+    return {
+        "mode": mode,
+        "load": service.load_info(),
+        "rss_mb": round(loaded_rss, 1),
+        "model_rss_mb": round(loaded_rss - base_rss, 1),
+        "peak_rss_mb": round(rss_mb(), 1),
+        "warmup_seconds": round(warmup_seconds, 2),
+        "tokens": tokens,
+        "tokens_per_second": round(tokens / seconds, 2) if seconds else 0.0,
+        "outputs": outputs,
+    }
+
+
+def agreement(reference: List[str], outputs: List[str]) -> Dict:
+    """fp32 응답 대비 일치도"""
+    exact = 0
+    prefix_ratios = []
+    for ref, out in zip(reference, outputs):
+        exact += ref == out
+        common = 0
+        for a, b in zip(ref, out):
+            if a != b:
+                break
+            common += 1
+        longest = max(len(ref), len(out))
+        prefix_ratios.append(common / longest if longest else 1.0)
+    return {
+        "exact": round(exact / len(reference), 3) if reference else 0.0,
+        "prefix": round(sum(prefix_ratios) / len(prefix_ratios), 3) if prefix_ratios else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 LLM 로딩 방식 벤치마크")
+    parser.add_argument("--modes", default="fp32,bf16,int8", help="비교할 방식 (fp32/bf16/fp16/int8, 쉼표 구분)")
+    parser.add_argument("--compile", action="store_true", help="torch.compile 적용 (fp32 기준은 컴파일 없이)")
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=2, help="프롬프트 세트 반복 횟수")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_worker(args.worker, args.compile, args.max_new_tokens, args.repeat)
+        print("RESULT " + json.dumps(result, ensure_ascii=False))
+        return
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    if "fp32" not in modes:
+        modes.insert(0, "fp32")
+
+    results: Dict[str, Dict] = {}
+    for mode in modes:
+        command = [
+            sys.executable, os.path.abspath(__file__), "--worker", mode,
+            "--max-new-tokens", str(args.max_new_tokens), "--repeat", str(args.repeat),
+        ]
+        if args.compile and mode != "fp32":
+            command.append("--compile")
+        print(f"⏳ {mode} 측정 중...")
+        completed = subprocess.run(command, capture_output=True, text=True)
+        lines = [line for line in completed.stdout.splitlines() if line.startswith("RESULT ")]
+        if completed.returncode != 0 or not lines:
+            print(f"❌ {mode} 실패:\n{completed.stderr[-2000:]}")
+            continue
+        results[mode] = json.loads(lines[-1][len("RESULT "):])
+
+    baseline = results.get("fp32")
+    if baseline is None:
+        sys.exit("fp32 기준 측정에 실패했습니다.")
+
+    print()
+    print(f"{'방식':<8}{'실제':<8}{'compile':<9}{'가중치MB':>10}{'RSS MB':>10}{'tok/s':>9}{'속도비':>8}{'exact':>8}{'prefix':>8}")
+    for mode, result in results.items():
+        match = agreement(baseline["outputs"], result["outputs"])
+        speedup = result["tokens_per_second"] / baseline["tokens_per_second"] if baseline["tokens_per_second"] else 0.0
+        load = result["load"]
+        print(
+            f"{mode:<8}{load['precision']:<8}{str(load['torch_compile']):<9}"
+            f"{load['weights_mb']:>10.1f}{result['model_rss_mb']:>10.1f}"
+            f"{result['tokens_per_second']:>9.2f}{speedup:>8.2f}{match['exact']:>8.3f}{match['prefix']:>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+투기적 디코딩 벤치마크 (LLM_DRAFT_MODEL)
+같은 프롬프트를 greedy로 일반 생성과 투기적 디코딩으로 각각 생성해
+출력이 같은지, 초안 토큰 수락률과 속도 향상(tokens/sec 비)을 측정
+
+사용법:
+    python bench_llm_speculative.py --draft-model <같은 토크나이저의 작은 모델> --draft-tokens 4
+    python bench_llm_speculative.py --draft-model ... --max-new-tokens 100 --precision int8
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Dict
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_llm_precision import PROMPTS
+
+
+def measure(service, prompt: str, max_length: int, speculative: bool) -> Dict:
+    before = service.generated_tokens
+    started = time.perf_counter()
+    if speculative:
+        text = service.generate_speculative(prompt, max_length)
+    else:
+        text = service._generate_single(prompt, max_length, 0.0, 1.0)
+    return {
+        "text": text,
+        "tokens": service.generated_tokens - before,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="투기적 디코딩 벤치마크")
+    parser.add_argument("--draft-model", required=True, help="초안 모델 이름 (본 모델과 같은 토크나이저)")
+    parser.add_argument("--draft-tokens", type=int, default=4, help="한 번에 제안하는 토큰 수")
+    parser.add_argument("--precision", default="auto", help="두 모델의 로딩 방식 (LLM_PRECISION과 같음)")
+    parser.add_argument("--max-new-tokens", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=2, help="프롬프트 세트 반복 횟수")
+    args = parser.parse_args()
+
+    from app.llm_service import HuggingFaceLLMService
+
+    service = HuggingFaceLLMService(
+        precision=args.precision,
+        draft_model_name=args.draft_model,
+        draft_tokens=args.draft_tokens
+    )
+    if service.draft_model is None:
+        sys.exit("초안 모델을 로드하지 못했습니다 (로그 확인).")
+
+    # 첫 생성은 메모리 할당이 섞이므로 제외
+    measure(service, PROMPTS[0], 64, speculative=False)
+    measure(service, PROMPTS[0], 64, speculative=True)
+
+    totals = {False: [0, 0.0], True: [0, 0.0]}
+    identical = 0
+    count = 0
+    for round_index in range(args.repeat):
+        for prompt in PROMPTS:
+            full_prompt = service._format_instruct_prompt(prompt) if service.is_instruct_model else prompt
+            max_length = len(service.tokenizer(full_prompt, add_special_tokens=False)["input_ids"]) + args.max_new_tokens
+            normal = measure(service, prompt, max_length, speculative=False)
+            speculative = measure(service, prompt, max_length, speculative=True)
+            for key, result in ((False, normal), (True, speculative)):
+                totals[key][0] += result["tokens"]
+                totals[key][1] += result["seconds"]
+            count += 1
+            if normal["text"] == speculative["text"]:
+                identical += 1
+            elif round_index == 0:
+                print(f"⚠️ 출력 불일치\n  일반: {normal['text'][:120]}\n  투기: {speculative['text'][:120]}")
+
+    normal_tps = totals[False][0] / totals[False][1] if totals[False][1] else 0.0
+    spec_tps = totals[True][0] / totals[True][1] if totals[True][1] else 0.0
+    stats = service.speculative_stats()
+    print()
+    print(f"초안 모델: {args.draft_model} (제안 {args.draft_tokens}개, {service.precision})")
+    print(f"출력 일치: {identical}/{count}")
+    print(f"수락률: {stats['acceptance_rate']:.3f}, forward당 토큰: {stats['tokens_per_forward']:.2f}")
+    print(f"일반 greedy: {normal_tps:.2f} tok/s, 투기적 디코딩: {spec_tps:.2f} tok/s")
+    print(f"속도 향상: {spec_tps / normal_tps:.2f}x" if normal_tps else "속도 향상: -")
+
+
+if __name__ == "__main__":
+    main()
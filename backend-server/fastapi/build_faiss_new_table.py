@@ -7,6 +7,7 @@ import logging
 import faiss
 import numpy as np
 from app.db import SessionLocal
+from app.recipe_steps import split_steps
 from sentence_transformers import SentenceTransformer
 import os
 import pickle
@@ -157,7 +158,9 @@ try:
                     "ingredients": row.ingredients,
                     "main_ingredients": row.main_ingredients,
                     "sub_ingredients": row.sub_ingredients,
-                    "content": row.content
+                    "content": row.content,
+                    # 조리 단계는 인덱스 구축 시 미리 분리해 저장 (챗봇/요리 세션에서 재파싱하지 않음)
+                    "steps": split_steps(row.content or "")
                 })
         
         if not filtered_texts:
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+세션 백엔드(redis) 검증 스크립트
+로컬에 최소 RESP 가짜 서버(GET/SET PX/PEXPIRE/DEL)를 띄우고 CookSessionManager를 통해
+세션 생성/조회/턴 저장/만료/삭제가 서버 명령으로 제대로 나가는지 확인
+
+사용법:
+    python check_session_backend.py                         (가짜 서버)
+    python check_session_backend.py --url redis://localhost:6379/0   (실제 Redis, 만료/명령 수 확인 생략)
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.cook_session import CookSessionManager, Constraint
+from app.session_backend import RedisSessionBackend
+
+
+class FakeRespServer:
+    """테스트용 최소 RESP2 서버 (키 만료는 조회 시점에 처리)"""
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.commands = []
+        self.server = None
+
+    def _alive(self, key):
+        if key in self.expires and self.expires[key] <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def _run(self, args):
+        name = args[0].upper()
+        self.commands.append(name)
+        if name == b"PING":
+            return b"+PONG\r\n"
+        if name == b"GET":
+            if not self._alive(args[1]):
+                return b"$-1\r\n"
+            value = self.data[args[1]]
+            return b"$%d\r\n%s\r\n" % (len(value), value)
+        if name == b"SET":
+            self.data[args[1]] = args[2]
+            self.expires.pop(args[1], None)
+            if len(args) >= 5 and args[3].upper() == b"PX":
+                self.expires[args[1]] = time.monotonic() + int(args[4]) / 1000
+            return b"+OK\r\n"
+        if name == b"PEXPIRE":
+            if not self._alive(args[1]):
+                return b":0\r\n"
+            self.expires[args[1]] = time.monotonic() + int(args[2]) / 1000
+            return b":1\r\n"
+        if name == b"DEL":
+            existed = self._alive(args[1])
+            self.data.pop(args[1], None)
+            self.expires.pop(args[1], None)
+            return b":%d\r\n" % existed
+        return b"-ERR unknown command\r\n"
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                args = []
+                for _ in range(int(line[1:-2])):
+                    length = int((await reader.readline())[1:-2])
+                    args.append((await reader.readexactly(length + 2))[:-2])
+                writer.write(self._run(args))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        return f"redis://127.0.0.1:{port}/0"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+async def run_checks(url: str, fake: FakeRespServer = None):
+    user_id = f"check-{os.getpid()}"
+    manager = CookSessionManager(backend=RedisSessionBackend(url=url, prefix="check:session:", ttl=0.5 if fake else 60))
+    await manager.startup()
+    try:
+        print("\n1️⃣ 세션 생성/조회...")
+        recipe_data = {"title": "김치찌개", "instructions": ["김치를 썬다."] * 200}
+        await manager.create_session(user_id, 1, recipe_data)
+        session = await manager.get_session(user_id)
+        assert session is not None and session.recipe_data == recipe_data
+        print("   ✅ SET PX → GET/PEXPIRE 복원 일치 (압축 세션 포함)")
+
+        print("\n2️⃣ 턴 저장...")
+        before = len(fake.commands) if fake else 0
+        assert await manager.add_constraint(user_id, Constraint(type="oil", action="decrease", degree="strong"))
+        async with manager.turn(user_id) as session:
+            pass
+        if fake:
+            assert fake.commands[before:] == [b"GET", b"PEXPIRE", b"SET", b"GET", b"PEXPIRE"], fake.commands[before:]
+        session = await manager.get_session(user_id)
+        assert [c.type for c in session.constraints] == ["oil"]
+        print("   ✅ 바뀐 턴만 SET (바뀌지 않은 턴은 읽기만)")
+
+        if fake:
+            print("\n3️⃣ 만료/연장...")
+            await asyncio.sleep(0.3)
+            assert await manager.get_session(user_id) is not None
+            await asyncio.sleep(0.3)
+            assert await manager.get_session(user_id) is not None, "PEXPIRE로 연장되지 않음"
+            await asyncio.sleep(0.6)
+            assert await manager.get_session(user_id) is None
+            await manager.create_session(user_id, 1)
+            print("   ✅ 조회 시 TTL 연장, 조회 없으면 만료")
+
+        print("\n4️⃣ 삭제...")
+        assert await manager.clear_session(user_id)
+        assert not await manager.clear_session(user_id)
+        assert await manager.get_session(user_id) is None
+        print("   ✅ DEL 결과 일치")
+        print(f"\n📊 {manager.backend.stats()}")
+    finally:
+        await manager.shutdown()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="세션 백엔드(redis) 검증")
+    parser.add_argument("--url", help="실제 Redis 호환 서버 주소 (없으면 가짜 서버 사용)")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("📊 세션 백엔드 검증")
+    print("=" * 60)
+
+    if args.url:
+        await run_checks(args.url)
+        return
+    fake = FakeRespServer()
+    url = await fake.start()
+    try:
+        await run_checks(url, fake)
+    finally:
+        await fake.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
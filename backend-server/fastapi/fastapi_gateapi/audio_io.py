@@ -0,0 +1,35 @@
+"""
+STT 업로드용 오디오 처리
+웹소켓으로 받은 WAV 바이트를 디스크를 거치지 않고 그대로 multipart로 STT 서버에 전달
+STT_DEBUG_SAVE_AUDIO=true 일 때만 수신 오디오를 파일로 남김 (디버깅용, 자동 삭제하지 않음)
+"""
+
+import logging
+import os
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+STT_DEBUG_SAVE_AUDIO = os.getenv("STT_DEBUG_SAVE_AUDIO", "false").lower() in ("1", "true", "yes")
+STT_DEBUG_AUDIO_DIR = os.getenv("STT_DEBUG_AUDIO_DIR", "/tmp/stt_debug")
+
+
+def stt_files(audio: bytes, uid: str) -> Dict:
+    """httpx files= 인자 (메모리의 바이트를 그대로 multipart 본문으로 사용)"""
+    return {"audio": (f"{uid}.wav", audio, "audio/wav")}
+
+
+def debug_save_audio(audio: bytes, uid: str) -> Optional[str]:
+    """디버그 설정이 켜져 있으면 수신 오디오를 파일로 저장하고 경로 반환"""
+    if not STT_DEBUG_SAVE_AUDIO:
+        return None
+    try:
+        os.makedirs(STT_DEBUG_AUDIO_DIR, exist_ok=True)
+        path = os.path.join(STT_DEBUG_AUDIO_DIR, f"{uid}.wav")
+        with open(path, "wb") as f:
+            f.write(audio)
+        logger.info(f"STT 디버그 오디오 저장: {path} ({len(audio)} bytes)")
+        return path
+    except Exception as e:
+        logger.warning(f"STT 디버그 오디오 저장 실패: {e}")
+        return None
@@ -0,0 +1,385 @@
+"""
+레시피 챗봇 음성 명령 빠른 경로 (LLM 없이 처리할 의도 분류)
+
+STT 결과를 먼저 로컬에서 분류해 아래 의도는 LLM 왕복 없이 바로 응답한다.
+    next        다음 단계          "다음", "넘어가 줘", "계속"
+    previous    이전 단계          "이전 단계", "뒤로"
+    repeat      현재 단계 다시      "다시 말해줘", "뭐라고?"
+    goto        N단계로 이동       "3단계", "세 번째 단계로 가줘"
+    timer       타이머            "5분 타이머", "타이머 맞춰줘" (시간이 없으면 현재 단계 문장에서 찾음)
+    ingredient  재료 질문          "재료 뭐야?", "양파 얼마나 넣어?"
+분류되지 않은 문장(열린 질문)만 call_llm으로 보낸다.
+
+1단계: 키워드 트라이 (정규화한 문장에서 가장 긴 키워드 매칭, 수 마이크로초)
+2단계(선택): 의도 예문 임베딩 최근접 이웃 (INTENT_EMBEDDING=true, SentenceTransformer 재사용)
+"""
+
+import asyncio
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+NEXT = "next"
+PREVIOUS = "previous"
+REPEAT = "repeat"
+GOTO = "goto"
+TIMER = "timer"
+INGREDIENT = "ingredient"
+
+# 임베딩 최근접 이웃 단계 (기본 꺼짐: 게이트웨이 컨테이너에서 모델 로드 비용이 큼)
+INTENT_EMBEDDING = os.getenv("INTENT_EMBEDDING", "false").lower() in ("1", "true", "yes")
+INTENT_EMBEDDING_MODEL = os.getenv("INTENT_EMBEDDING_MODEL", "snunlp/KR-SBERT-V40K-klueNLI-augSTS")
+INTENT_EMBEDDING_THRESHOLD = float(os.getenv("INTENT_EMBEDDING_THRESHOLD", "0.78"))
+
+# 이보다 긴 문장은 키워드가 있어도 명령이 아닌 질문으로 본다 (예: "다음에 뭘 넣으면 돼?")
+MAX_COMMAND_CHARS = 12
+
+# 명령 뒤에 붙는 말투/조사 (길이 판정에서 제외)
+_FILLERS = re.compile(r"(해|알려|말해|보여|읽어|가|넘어가|넘겨)?(주세요|줘요|줘|줄래|주라|봐|볼래)|(으로|로|가자|할게|요|좀|단계)$")
+# 키워드를 뺀 나머지에서 지우는 말 (남는 말이 없어야 명령으로 봄)
+_COMMAND_FILLERS = re.compile(
+    r"(해|알려|말해|보여|읽어|가|넘어가|넘겨|돌아가)?(주세요|줘요|줘|줄래|주라|봐|볼래)"
+    r"|가자|갈게|할게|해요|해|으로|로|요|좀|단계|번|한번|더|이제|그럼|자|음|어|응|네|빨리|제발|please"
+)
+# 남은 말이 이 길이 이하이면 명령 (예: "다음 거" → "거")
+MAX_COMMAND_REST_CHARS = 1
+# 질문 어미 ("계속 저어야 돼?", "불 다시 켜야 돼?" 는 단계 이동이 아니라 질문)
+_QUESTION_ENDING = re.compile(r"(돼|되|야|까|나|니|지|어|죠)(요)?$")
+_NORMALIZE = re.compile(r"[\s\.,，。!?！？~\"'“”]+")
+_QUESTION_WORDS = ("왜", "어떻게", "무엇", "뭘", "뭐가", "어떤", "언제", "어디")
+
+_KEYWORDS: Dict[str, Sequence[str]] = {
+    NEXT: ("다음", "다음단계", "다음으로", "그다음", "넥스트", "next", "계속", "넘어가", "넘겨", "진행"),
+    PREVIOUS: ("이전", "이전단계", "전단계", "앞단계", "뒤로", "아까단계", "previous", "back", "돌아가"),
+    REPEAT: ("다시", "다시말해", "한번더", "반복", "뭐라고", "못들었", "잘못들었", "repeat", "again", "현재단계", "지금단계"),
+    TIMER: ("타이머", "알람", "timer"),
+}
+_INGREDIENT_KEYWORDS = ("재료", "얼마나", "몇개", "몇그램", "몇스푼", "몇큰술", "몇작은술", "양은", "들어가", "필요")
+
+# "이 단계", "사 와" 처럼 다른 뜻과 겹치는 한 글자 한자어 수(일/이/사/오/구)는 제외
+_KOREAN_NUMBERS = {
+    "한": 1, "하나": 1, "첫": 1,
+    "두": 2, "둘": 2,
+    "세": 3, "셋": 3, "삼": 3,
+    "네": 4, "넷": 4,
+    "다섯": 5,
+    "여섯": 6, "육": 6,
+    "일곱": 7, "칠": 7,
+    "여덟": 8, "팔": 8,
+    "아홉": 9,
+    "열": 10, "십": 10,
+}
+_NUMBER = r"(\d+|" + "|".join(sorted(_KOREAN_NUMBERS, key=len, reverse=True)) + r")"
+# 시간 표현에서는 단위가 바로 붙으므로 한자어 수도 허용 ("오 분", "삼십 초", "십오 분")
+_SINO_DIGITS = {"일": 1, "이": 2, "삼": 3, "사": 4, "오": 5, "육": 6, "칠": 7, "팔": 8, "구": 9}
+_SINO_NUMBER = r"[이삼사오육칠팔구]?십[일이삼사오육칠팔구]?|[일이삼사오육칠팔구]"
+# "3단계", "세 번째 단계", "3번" (한글 수 + "번"은 "한 번 더" 와 겹치므로 숫자만)
+_GOTO_PATTERN = re.compile(_NUMBER + r"\s*(?:번째|단계)|(\d+)\s*번")
+_DURATION_PATTERN = re.compile(r"(" + _NUMBER[1:-1] + "|" + _SINO_NUMBER + r")\s*(시간|분|초)")
+_DURATION_UNITS = {"시간": 3600, "분": 60, "초": 1}
+# 재료 항목에서 이름만 남기기 ("양파 1개" → "양파", "간장(2큰술)" → "간장")
+_INGREDIENT_NAME = re.compile(r"^[^\d(\[:·,/]+")
+_QUANTITY_WORDS = re.compile(r"(약간|적당량|조금|소량|한줌|한꼬집|톡톡)$")
+# 한 글자 재료 이름 뒤에 붙을 수 있는 조사 ("물은", "파를")
+_NAME_PARTICLES = r"(?:으로|이랑|랑|로|을|를|이|가|은|는|과|와|도|만|의|에)?"
+
+
+@dataclass
+class IntentMatch:
+    intent: str
+    step: Optional[int] = None           # goto: 1부터 시작하는 단계 번호
+    seconds: Optional[int] = None        # timer
+    ingredient: Optional[str] = None     # ingredient: 질문한 재료 이름 (없으면 전체 재료)
+    source: str = "keyword"
+    score: float = 1.0
+
+
+def normalize(text: str) -> str:
+    return _NORMALIZE.sub("", text).lower()
+
+
+def _to_number(token: str) -> Optional[int]:
+    if token.isdigit():
+        return int(token)
+    return _KOREAN_NUMBERS.get(token)
+
+
+def _sino_number(token: str) -> Optional[int]:
+    """한자어 수 ("오" → 5, "삼십" → 30, "십오" → 15, 99까지)"""
+    if "십" not in token:
+        return _SINO_DIGITS.get(token)
+    tens, _, ones = token.partition("십")
+    value = (_SINO_DIGITS.get(tens, 0) if tens else 1) * 10
+    return value + (_SINO_DIGITS.get(ones, 0) if ones else 0)
+
+
+def parse_duration(text: str) -> Optional[int]:
+    """문장에서 첫 시간 표현을 초 단위로 ("1시간 30분" 처럼 이어지면 합산)"""
+    total = 0
+    last_end = None
+    for match in _DURATION_PATTERN.finditer(text):
+        if last_end is not None and text[last_end:match.start()].strip():
+            break
+        value = _to_number(match.group(1))
+        if value is None:
+            value = _sino_number(match.group(1))
+        if value is None:
+            break
+        total += value * _DURATION_UNITS[match.group(2)]
+        last_end = match.end()
+    return total or None
+
+
+def ingredient_names(ingredients: Sequence[str]) -> List[Tuple[str, str]]:
+    """재료 목록 → (정규화한 이름, 원문 항목) 목록 ("다진 마늘"은 "다진마늘"과 "마늘" 두 이름으로)"""
+    names = []
+    for item in ingredients:
+        match = _INGREDIENT_NAME.match(item.strip())
+        if not match:
+            continue
+        words = match.group(0).split()
+        variants = [normalize(match.group(0))]
+        if len(words) > 1:
+            variants.append(normalize(words[-1]))
+        for variant in variants:
+            name = _QUANTITY_WORDS.sub("", variant)
+            if len(name) >= 2 or (name and len(variants) == 1):
+                names.append((name, item.strip()))
+    return names
+
+
+def mentions_ingredient(name: str, text: str, normalized: str) -> bool:
+    """
+    문장에 재료 이름이 나오는지
+    한 글자 이름("물", "파")은 "국물", "양파"처럼 다른 단어 안에서 걸리므로
+    공백을 지우기 전 원문에서 조사만 붙은 한 단어로 나올 때만 인정
+    """
+    if len(name) >= 2:
+        return name in normalized
+    pattern = rf"(?<![가-힣]){re.escape(name)}{_NAME_PARTICLES}(?![가-힣])"
+    return re.search(pattern, text.lower()) is not None
+
+
+class KeywordTrie:
+    """문자 단위 트라이 - 문장의 모든 위치에서 가장 긴 키워드를 찾는다"""
+
+    _END = "\0"
+
+    def __init__(self):
+        self._root: Dict = {}
+
+    def add(self, keyword: str, value: str) -> None:
+        node = self._root
+        for ch in normalize(keyword):
+            node = node.setdefault(ch, {})
+        node[self._END] = value
+
+    def find_all(self, text: str) -> List[Tuple[int, int, str]]:
+        """(시작, 끝, 값) 목록 - 같은 시작 위치에서는 가장 긴 매칭만"""
+        found = []
+        for start in range(len(text)):
+            node = self._root
+            best = None
+            for end in range(start, len(text)):
+                node = node.get(text[end])
+                if node is None:
+                    break
+                if self._END in node:
+                    best = (start, end + 1, node[self._END])
+            if best is not None:
+                found.append(best)
+        return found
+
+
+# 임베딩 단계 예문 (매개변수가 없는 의도만)
+_EXEMPLARS: Dict[str, Sequence[str]] = {
+    NEXT: ("다음 거 알려줘", "이제 뭐 해", "그 다음은 뭐야", "다 했어", "됐어 다음", "다음 순서 알려줘"),
+    PREVIOUS: ("방금 전 단계 다시", "앞에 거 다시 알려줘", "전 단계로 돌아가줘"),
+    REPEAT: ("방금 뭐라고 했어", "다시 한 번 말해줄래", "잘 못 들었어", "한 번만 더 읽어줘"),
+    INGREDIENT: ("재료가 뭐 필요해", "뭐 준비해야 돼", "들어가는 재료 알려줘"),
+}
+
+
+class IntentRouter:
+    """키워드 트라이 + (선택) 예문 임베딩 최근접 이웃 의도 분류기"""
+
+    def __init__(self, use_embedding: bool = INTENT_EMBEDDING, model_name: str = INTENT_EMBEDDING_MODEL):
+        self._trie = KeywordTrie()
+        for intent, keywords in _KEYWORDS.items():
+            for keyword in keywords:
+                self._trie.add(keyword, intent)
+        self.use_embedding = use_embedding
+        self.model_name = model_name
+        self._model = None
+        self._exemplar_vectors = None
+        self._exemplar_intents: List[str] = []
+        self.counts: Dict[str, int] = {}
+
+    def _count(self, key: str) -> None:
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    # ---------------- 1단계: 규칙/키워드 ----------------
+
+    def classify(self, text: str, ingredients: Sequence[str] = ()) -> Optional[IntentMatch]:
+        """키워드/패턴으로 의도 분류 (해당 없으면 None → 열린 질문)"""
+        started = time.perf_counter()
+        match = self._classify(text, ingredients)
+        self._count(match.intent if match else "open")
+        logger.debug(f"의도 분류 ({(time.perf_counter() - started) * 1000:.2f}ms): '{text}' → {match}")
+        return match
+
+    def _classify(self, text: str, ingredients: Sequence[str]) -> Optional[IntentMatch]:
+        normalized = normalize(text)
+        if not normalized:
+            return None
+
+        # 재료 질문: 레시피 재료 이름이 들어 있고 재료 관련 표현이 있을 때
+        has_ingredient_word = any(word in normalized for word in _INGREDIENT_KEYWORDS)
+        for name, _ in sorted(ingredient_names(ingredients), key=lambda pair: len(pair[0]), reverse=True):
+            if has_ingredient_word and mentions_ingredient(name, text, normalized):
+                return IntentMatch(INGREDIENT, ingredient=name)
+
+        keywords = self._trie.find_all(normalized)
+        found = {intent for _, _, intent in keywords}
+
+        # 타이머: "타이머"/"알람" 또는 "N분 (재줘|맞춰)" 형태
+        seconds = parse_duration(text)
+        if TIMER in found or (seconds and re.search(r"(재줘|재어|맞춰|설정|세팅|켜줘)", normalized)):
+            return IntentMatch(TIMER, seconds=seconds)
+
+        if normalized.startswith("재료"):
+            return IntentMatch(INGREDIENT)
+
+        # 여기서부터는 짧은 명령만 (긴 문장/의문사가 있으면 LLM으로)
+        command = _FILLERS.sub("", normalized)
+        if len(command) > MAX_COMMAND_CHARS:
+            return None
+        if any(word in normalized for word in _QUESTION_WORDS) and REPEAT not in found:
+            return None
+
+        goto = _GOTO_PATTERN.search(normalized)
+        if goto:
+            step = _to_number(goto.group(1) or goto.group(2))
+            if step and self._is_command(normalized, [(goto.start(), goto.end())], text):
+                return IntentMatch(GOTO, step=step)
+
+        # 여러 의도가 섞이면 가장 긴 키워드 우선 ("다시 다음" 같은 경우)
+        if keywords and self._is_command(normalized, [(start, end) for start, end, _ in keywords], text):
+            start, end, intent = max(keywords, key=lambda item: item[1] - item[0])
+            return IntentMatch(intent)
+        return None
+
+    @staticmethod
+    def _is_command(normalized: str, spans: List[Tuple[int, int]], text: str) -> bool:
+        """
+        키워드와 말투를 뺀 나머지가 (거의) 없을 때만 명령
+        "계속 저어야 돼?" → "저어야돼"가 남으므로 질문 (키워드가 문장 일부로 쓰인 경우)
+        """
+        kept = [True] * len(normalized)
+        for start, end in spans:
+            for index in range(start, end):
+                kept[index] = False
+        rest = "".join(ch for ch, keep in zip(normalized, kept) if keep)
+        rest = _COMMAND_FILLERS.sub("", rest)
+        if not rest:
+            return True
+        # 질문 어미/물음표가 있으면 남은 말이 짧아도 질문으로 봄
+        if text.rstrip().endswith(("?", "？")) or _QUESTION_ENDING.search(rest):
+            return False
+        return len(rest) <= MAX_COMMAND_REST_CHARS
+
+    # ---------------- 2단계: 임베딩 최근접 이웃 ----------------
+
+    def _load_model(self) -> bool:
+        if self._model is not None:
+            return True
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            logger.warning("sentence-transformers 미설치: 의도 임베딩 단계 비활성화")
+            self.use_embedding = False
+            return False
+        started = time.perf_counter()
+        self._model = SentenceTransformer(self.model_name, device="cpu")
+        texts = []
+        for intent, exemplars in _EXEMPLARS.items():
+            for exemplar in exemplars:
+                texts.append(exemplar)
+                self._exemplar_intents.append(intent)
+        self._exemplar_vectors = self._model.encode(texts, normalize_embeddings=True)
+        logger.info(f"의도 임베딩 모델 로드 완료 ({len(texts)}개 예문, {time.perf_counter() - started:.1f}초)")
+        return True
+
+    def _nearest(self, text: str) -> Optional[IntentMatch]:
+        if not self._load_model():
+            return None
+        vector = self._model.encode([text], normalize_embeddings=True)[0]
+        scores = self._exemplar_vectors @ vector
+        best = int(scores.argmax())
+        score = float(scores[best])
+        if score < INTENT_EMBEDDING_THRESHOLD:
+            return None
+        return IntentMatch(self._exemplar_intents[best], source="embedding", score=score)
+
+    async def warmup(self) -> None:
+        """앱 시작 시 임베딩 모델 미리 로드 (사용하지 않으면 아무것도 안 함)"""
+        if self.use_embedding:
+            try:
+                await asyncio.to_thread(self._load_model)
+            except Exception as e:
+                logger.error(f"의도 임베딩 모델 로드 실패: {e}")
+                self.use_embedding = False
+
+    async def route(self, text: str, ingredients: Sequence[str] = ()) -> Optional[IntentMatch]:
+        """키워드 분류 → (켜져 있으면) 임베딩 최근접 이웃 순으로 시도"""
+        match = self.classify(text, ingredients)
+        if match is not None or not self.use_embedding:
+            return match
+        # 길게 이어지는 질문은 임베딩 오분류 위험이 커서 LLM으로 보냄
+        if len(normalize(text)) > MAX_COMMAND_CHARS * 2:
+            return None
+        try:
+            match = await asyncio.to_thread(self._nearest, text)
+        except Exception as e:
+            logger.warning(f"의도 임베딩 분류 실패: {e}")
+            return None
+        if match is not None:
+            self._count(f"{match.intent}_embedding")
+        return match
+
+
+def answer_ingredient(match: IntentMatch, ingredients: Sequence[str]) -> str:
+    """재료 질문 응답 (레시피 재료 목록에서 바로)"""
+    if not ingredients:
+        return "이 레시피에는 재료 정보가 없어요."
+    if match.ingredient:
+        items = list(dict.fromkeys(
+            item for name, item in ingredient_names(ingredients)
+            if match.ingredient in name or name in match.ingredient
+        ))
+        if items:
+            return f"{', '.join(items)} 들어가요."
+        return f"이 레시피 재료에는 {match.ingredient}이(가) 없어요."
+    return f"필요한 재료는 {', '.join(item.strip() for item in ingredients)}입니다."
+
+
+def format_duration(seconds: int) -> str:
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    parts = []
+    if hours:
+        parts.append(f"{hours}시간")
+    if minutes:
+        parts.append(f"{minutes}분")
+    if secs:
+        parts.append(f"{secs}초")
+    return " ".join(parts)
+
+
+# 전역 인스턴스
+intent_router = IntentRouter()
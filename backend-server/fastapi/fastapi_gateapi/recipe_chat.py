@@ -4,7 +4,6 @@
 
 import uvicorn
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-import httpx
 import os
 import uuid
 import logging
@@ -12,6 +11,9 @@ import asyncio
 import json
 import re
 
+from fastapi_gateapi.audio_io import debug_save_audio, stt_files
+from fastapi_gateapi.http_clients import http_clients
+
 # ==================== 로깅 및 기본 설정 ====================
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,8 +21,6 @@ logger = logging.getLogger(__name__)
 # ==================== 서버 주소 및 설정 ====================
 AI_SERVER_LLM_URL = os.getenv("AI_SERVER_LLM_URL", os.getenv("AI_SERVER_URL", "http://203.252.240.65:8001"))
 AI_SERVER_TTS_URL = os.getenv("AI_SERVER_TTS_URL", os.getenv("AI_SERVER_URL", "http://203.252.240.65:8002"))
-TEMP_DIR = "/tmp"
-os.makedirs(TEMP_DIR, exist_ok=True)
 
 # ================================================================
 # 사용자 상태 저장
@@ -39,7 +39,7 @@ def build_llama3_2_prompt(system_prompt: str, user_prompt: str):
 async def call_tts_and_stream(websocket: WebSocket, text: str):
     """TTS 호출 및 오디오 스트리밍"""
     try:
-        async with httpx.AsyncClient(timeout=300.0) as client:
+        async with http_clients.borrow("tts") as client:
             tts_payload = {"text": text}
             async with client.stream("POST", f"{AI_SERVER_TTS_URL}/tts", json=tts_payload) as audio_response:
                 audio_response.raise_for_status()
@@ -55,7 +55,7 @@ async def call_llm(system_prompt: str, user_prompt: str):
     try:
         final_prompt = build_llama3_2_prompt(system_prompt, user_prompt)
         llm_payload = {"prompt": final_prompt, "max_new_tokens": 100}
-        async with httpx.AsyncClient(timeout=300.0) as client:
+        async with http_clients.borrow("llm") as client:
             llm_response = await client.post(f"{AI_SERVER_LLM_URL}/llm-generate", json=llm_payload)
             llm_response.raise_for_status()
             return llm_response.json()["response"]
@@ -117,15 +117,11 @@ async def websocket_recipe_chat_endpoint(websocket: WebSocket):
             # WAV 데이터 수신 (Flutter에서 WAV로 전송)
             wav_data = await websocket.receive_bytes()
             uid = str(uuid.uuid4())
-            wav_path = os.path.join(TEMP_DIR, f"{uid}.wav")
-            with open(wav_path, 'wb') as f: 
-                f.write(wav_data)
-
-            # STT 요청
-            async with httpx.AsyncClient(timeout=300.0) as client:
-                with open(wav_path, "rb") as f_wav:
-                    files = {"audio": (f"{uid}.wav", f_wav, "audio/wav")}
-                    stt_response = await client.post(f"{AI_SERVER_LLM_URL}/stt", files=files)
+            debug_save_audio(wav_data, uid)
+
+            # STT 요청 (디스크를 거치지 않고 메모리의 바이트를 그대로 전송)
+            async with http_clients.borrow("stt") as client:
+                stt_response = await client.post(f"{AI_SERVER_LLM_URL}/stt", files=stt_files(wav_data, uid))
                 stt_response.raise_for_status()
                 user_text = stt_response.json()["text"].strip().lower()
                 await websocket.send_text(json.dumps({"type": "user_text", "data": user_text}))
@@ -162,10 +158,5 @@ async def websocket_recipe_chat_endpoint(websocket: WebSocket):
         if USER_ID in USER_STATES: 
             del USER_STATES[USER_ID]
     finally:
-        try:
-            if 'wav_path' in locals() and os.path.exists(wav_path): 
-                os.remove(wav_path)
-        except Exception:
-            pass
-        logger.info(f"연결 종료 및 임시 파일 정리 완료.")
+        logger.info("연결 종료.")
 
@@ -0,0 +1,100 @@
+"""
+레시피 조리법(content) → 단계 목록 분리
+- 게이트웨이 레시피 챗봇(/ws/recipe-chat)과 요리 세션(/cook/select)이 같은 규칙을 사용
+- 정규식은 모듈 로드 시 한 번만 컴파일, 결과는 content 기준으로 캐시 (get_steps)
+- FAISS 인덱스 구축 시 metadata에 미리 계산해 저장하고, 추천 결과의 "steps"로 전달
+(app/recipe_steps.py 와 동일한 내용 유지 - 게이트웨이 컨테이너에는 app 패키지가 없음)
+"""
+
+import re
+from functools import lru_cache
+from typing import List, Tuple
+
+# "1. ", "12." - 소수점("1.5컵")이나 앞 숫자에 붙은 경우는 단계 번호가 아님
+_STEP_NUMBER = re.compile(r"(?<![\d.])(\d{1,2})\.(?!\d)\s*")
+_LEADING_NUMBER = re.compile(r"^\d+[\.\)]\s*")
+_LEADING_BULLET = re.compile(r"^-\s*")
+# 음성 명령("다음", "다음 단계")과 겹치는 표현 제거
+_NEXT_WORDS = re.compile(r"\s*다음(?:\s*단계)?(?:으로|로)?\s*[\.。]?\s*")
+_WHITESPACE = re.compile(r"\s+")
+_SENTENCE_END = re.compile(r"[.!?]\s+")
+
+# 단계가 하나뿐인데 이보다 길면 문장 단위로 다시 분리
+MAX_SINGLE_STEP_CHARS = 500
+# 번호 없는 줄은 이보다 길어야 단계로 인정
+MIN_LINE_CHARS = 5
+MIN_SENTENCE_CHARS = 10
+
+STEP_CACHE_SIZE = 4096
+
+
+def clean_step(text: str) -> str:
+    """단계 문장 정리 (앞 번호/기호, "다음" 표현, 연속 공백 제거)"""
+    text = _LEADING_NUMBER.sub("", text.strip())
+    text = _NEXT_WORDS.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def _split_numbered(text: str, matches: List[re.Match]) -> List[str]:
+    """"1. ... 2. ..." 형식을 번호 위치 기준으로 분리 (첫 번호 앞부분은 제목 등으로 보고 버림)"""
+    steps = []
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        step = clean_step(text[match.end():end])
+        if step:
+            steps.append(step)
+    return steps
+
+
+def _split_lines(content: str) -> List[str]:
+    """번호가 하나뿐인 경우: 번호/기호로 시작하는 줄을 새 단계로, 나머지 줄은 앞 단계에 이어 붙임"""
+    steps: List[str] = []
+    for line in content.split("\n"):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if _LEADING_NUMBER.match(line) or _LEADING_BULLET.match(line):
+            step = _LEADING_BULLET.sub("", _LEADING_NUMBER.sub("", line)).strip()
+            if step:
+                steps.append(step)
+        elif steps:
+            steps[-1] += " " + line
+        else:
+            steps.append(line)
+    return [step for step in (clean_step(s) for s in steps) if step]
+
+
+def split_steps(content: str) -> List[str]:
+    """조리법 텍스트를 단계 목록으로 분리"""
+    if not content:
+        return []
+
+    matches = list(_STEP_NUMBER.finditer(content))
+    if len(matches) > 1:
+        steps = _split_numbered(content, matches)
+    elif len(matches) == 1:
+        steps = _split_lines(content)
+    else:
+        # 번호가 없으면 줄 단위 (너무 짧은 줄 제외)
+        steps = [clean_step(line) for line in content.split("\n") if len(line.strip()) > MIN_LINE_CHARS]
+        steps = [step for step in steps if step]
+
+    # 하나의 긴 단계만 남으면 문장 단위로 분리
+    if len(steps) == 1 and len(steps[0]) > MAX_SINGLE_STEP_CHARS:
+        steps = [s.strip() for s in _SENTENCE_END.split(steps[0]) if len(s.strip()) > MIN_SENTENCE_CHARS]
+
+    # 단계 안에 번호가 또 여러 개 있으면 (한 줄에 여러 단계) 추가 분리
+    final_steps = []
+    for step in steps:
+        inner = list(_STEP_NUMBER.finditer(step))
+        if len(inner) > 1:
+            final_steps.extend(_split_numbered(step, inner))
+        else:
+            final_steps.append(step)
+    return final_steps
+
+
+@lru_cache(maxsize=STEP_CACHE_SIZE)
+def get_steps(content: str) -> Tuple[str, ...]:
+    """split_steps 결과 캐시 (같은 레시피를 다시 열 때 재파싱하지 않음)"""
+    return tuple(split_steps(content))
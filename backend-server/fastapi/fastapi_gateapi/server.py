@@ -8,24 +8,76 @@ import logging
 import asyncio
 import json
 import re
+from contextlib import asynccontextmanager
+
+from fastapi_gateapi.audio_io import debug_save_audio, stt_files
+from fastapi_gateapi.http_clients import http_clients
+from fastapi_gateapi.intent_router import (
+    GOTO,
+    NEXT,
+    PREVIOUS,
+    REPEAT,
+    TIMER,
+    IntentMatch,
+    answer_ingredient,
+    format_duration,
+    intent_router,
+    parse_duration,
+)
+from fastapi_gateapi.recipe_steps import get_steps
+from fastapi_gateapi.session_store import BoundedSessionStore
+from fastapi_gateapi.tts_cache import TTS_PREFETCH_STEPS, tts_cache
+from fastapi_gateapi.streaming_stt import is_stray_pcm, parse_control, receive_streaming_utterance
+from fastapi_gateapi.voice_pipeline import (
+    speak_pipelined,
+    speak_text_pipelined,
+    stream_llm_tokens,
+    wants_pipeline,
+)
 
 # --- 기본 설정 ---
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
-app = FastAPI()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 업스트림(LLM/STT/TTS/AI) 공유 HTTP 클라이언트 생성/종료
+    await http_clients.startup()
+    await tts_cache.startup()
+    # 고정 안내 문구 오디오는 백그라운드에서 미리 합성
+    tts_cache.prefetch(AI_SERVER_TTS_URL, FIXED_PHRASES)
+    await intent_router.warmup()
+    USER_STATES.start_sweeper()
+    try:
+        yield
+    finally:
+        await USER_STATES.stop_sweeper()
+        await tts_cache.shutdown()
+        await http_clients.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 AI_SERVER_URL = os.getenv("AI_SERVER_URL", "http://203.252.240.65:8001")
 AI_SERVER_LLM_URL = os.getenv("AI_SERVER_LLM_URL", AI_SERVER_URL)
 AI_SERVER_TTS_URL = os.getenv("AI_SERVER_TTS_URL", AI_SERVER_URL.replace(":8001", ":8002") if ":8001" in AI_SERVER_URL else AI_SERVER_URL)
 logger.info(f"AI 서버 주소: {AI_SERVER_URL}")
 logger.info(f"AI LLM 서버 주소: {AI_SERVER_LLM_URL}")
 logger.info(f"AI TTS 서버 주소: {AI_SERVER_TTS_URL}")
-TEMP_DIR = "/tmp"
-os.makedirs(TEMP_DIR, exist_ok=True)
 
 # ================================================================
 # 사용자 상태 저장 (레시피 챗봇용)
 # ================================================================
-USER_STATES = {}
+# 연결이 비정상 종료돼 남은 상태는 TTL/LRU로 정리 (lifespan에서 스위퍼 시작)
+USER_STATES = BoundedSessionStore("recipe_chat")
+
+# 고정 안내 문구 (서버 시작 시 TTS 캐시에 미리 합성)
+STT_TIMEOUT_TEXT = "음성 인식 서버 응답이 지연되고 있습니다. 잠시 후 다시 시도해주세요."
+STT_CONNECT_ERROR_TEXT = "음성 인식 서버에 연결할 수 없습니다. 네트워크를 확인해주세요."
+STT_FAILED_TEXT = "음성 인식에 실패했습니다. 다시 시도해주세요."
+STT_EMPTY_TEXT = "음성을 인식하지 못했습니다. 다시 말씀해주세요."
+COOKING_DONE_TEXT = "요리가 완료되었습니다! 맛있게 드세요."
+ALREADY_DONE_TEXT = "이미 요리가 완료되었습니다. 다음 명령은 없습니다."
 
 # ================================================================
 # LLM/TTS 호출 유틸 (레시피 챗봇용)
@@ -39,12 +91,8 @@ def build_llama3_2_prompt(system_prompt: str, user_prompt: str):
 async def call_tts_and_stream(websocket: WebSocket, text: str):
     """TTS 호출 및 오디오 스트리밍 (레시피 챗봇용)"""
     try:
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            tts_payload = {"text": text}
-            async with client.stream("POST", f"{AI_SERVER_TTS_URL}/tts", json=tts_payload) as audio_response:
-                audio_response.raise_for_status()
-                async for chunk in audio_response.aiter_bytes():
-                    await websocket.send_bytes(chunk)
+        # 같은 문장은 TTS 캐시에서 바로 전송
+        await tts_cache.stream_to(websocket, AI_SERVER_TTS_URL, text)
         await websocket.send_text(json.dumps({"type": "event", "data": "TTS_STREAM_END"}))
     except Exception as e:
         logger.error(f"TTS 호출 실패: {e}")
@@ -54,7 +102,7 @@ async def call_llm(system_prompt: str, user_prompt: str):
     try:
         final_prompt = build_llama3_2_prompt(system_prompt, user_prompt)
         llm_payload = {"prompt": final_prompt, "max_new_tokens": 100}
-        async with httpx.AsyncClient(timeout=300.0) as client:
+        async with http_clients.borrow("llm") as client:
             llm_response = await client.post(f"{AI_SERVER_LLM_URL}/llm-generate", json=llm_payload)
             llm_response.raise_for_status()
             return llm_response.json()["response"]
@@ -62,6 +110,144 @@ async def call_llm(system_prompt: str, user_prompt: str):
         logger.error(f"LLM 호출 실패: {e}")
         return "죄송합니다. 응답을 생성하는 중 오류가 발생했습니다."
 
+# 파이프라인 모드의 일반 대화(/ws/chat) 시스템 프롬프트
+CHAT_SYSTEM_PROMPT = os.getenv(
+    "CHAT_SYSTEM_PROMPT",
+    "당신은 요리 도우미 쿡덕입니다. 친근하고 간결하게 2-3문장으로 답하세요."
+)
+
+def strip_next_words(text: str) -> str:
+    """응답에서 "다음"/"다음단계" 안내 문구 제거 (음성 명령과 혼동 방지)"""
+    text = re.sub(r'\s*다음\s*[\.。]?\s*', ' ', text).strip()
+    text = re.sub(r'\s*다음단계\s*[\.。]?\s*', ' ', text).strip()
+    return re.sub(r'\s+', ' ', text)
+
+# 최종 응답은 strip_next_words를 거치므로 캐시 키도 같은 형태로
+FIXED_PHRASES = (
+    STT_TIMEOUT_TEXT, STT_CONNECT_ERROR_TEXT, STT_FAILED_TEXT, STT_EMPTY_TEXT,
+    COOKING_DONE_TEXT, strip_next_words(ALREADY_DONE_TEXT),
+)
+
+def format_step(recipe_steps: list, index: int) -> str:
+    """index번째 단계 안내 문장 ("N단계. 내용") - 단계 하나만, 너무 길면 재파싱/자르기"""
+    step_content = recipe_steps[index]
+
+    # 만약 단계 내용이 너무 길면 (전체 레시피가 하나의 단계로 들어간 경우) 다시 파싱 시도
+    if len(step_content) > 500:
+        logger.warning(f"레시피 챗봇: 단계 내용이 너무 깁니다 ({len(step_content)}자). 재파싱 시도...")
+        # 숫자 패턴으로 다시 분리 시도
+        pattern = r'(\d+)\.\s*'
+        matches = list(re.finditer(pattern, step_content))
+        if len(matches) > 1:
+            # 여러 단계가 포함된 경우 첫 번째만 사용
+            first_match = matches[0]
+            if len(matches) > 1:
+                second_match = matches[1]
+                step_content = step_content[first_match.end():second_match.start()].strip()
+            else:
+                step_content = step_content[first_match.end():].strip()
+            logger.info(f"레시피 챗봇: 재파싱된 단계 내용 (길이: {len(step_content)}자): {step_content[:100]}...")
+        else:
+            # 줄바꿈으로 분리 시도
+            lines = step_content.split('\n')
+            if len(lines) > 1:
+                # 첫 번째 줄만 사용
+                step_content = lines[0].strip()
+                logger.info(f"레시피 챗봇: 줄바꿈으로 재파싱된 단계 내용: {step_content[:100]}...")
+
+    # 단계 내용이 여전히 너무 길면 강제로 자르기 (200자 제한)
+    if len(step_content) > 200:
+        logger.warning(f"레시피 챗봇: 단계 내용이 여전히 깁니다 ({len(step_content)}자). 200자로 제한합니다.")
+        # 마침표나 쉼표로 자연스럽게 자르기
+        truncated = step_content[:200]
+        last_period = truncated.rfind('.')
+        last_comma = truncated.rfind(',')
+        cut_pos = max(last_period, last_comma)
+        if cut_pos > 100:  # 최소 100자는 보장
+            step_content = step_content[:cut_pos + 1]
+        else:
+            step_content = step_content[:200] + "..."
+
+    # 단계 내용에서 "다음" 관련 텍스트 제거 (혹시 포함된 경우)
+    step_content = re.sub(r'\s*다음\s*[\.。]?\s*', ' ', step_content).strip()
+    step_content = re.sub(r'\s*다음단계\s*[\.。]?\s*', ' ', step_content).strip()
+    step_content = re.sub(r'\s+', ' ', step_content)  # 연속된 공백 제거
+
+    return f"{index + 1}단계. {step_content}"
+
+def prefetch_step_audio(state: dict) -> None:
+    """다음에 안내할 몇 단계의 오디오를 백그라운드에서 미리 합성 ("다음" 응답을 캐시에서 바로 전송)"""
+    recipe_steps = state["steps"]
+    start = state["current_step"]
+    texts = [
+        strip_next_words(format_step(recipe_steps, index))
+        for index in range(start, min(start + TTS_PREFETCH_STEPS, len(recipe_steps)))
+    ]
+    tts_cache.prefetch(AI_SERVER_TTS_URL, texts)
+
+async def answer_intent(websocket: WebSocket, intent: IntentMatch, state: dict) -> str:
+    """빠른 경로 의도 응답 (단계 이동 의도는 state["current_step"]을 갱신)"""
+    recipe_steps = state["steps"]
+    total = len(recipe_steps)
+    # current_step: 다음에 안내할 단계 인덱스 → 마지막으로 안내한 단계는 그 앞
+    current_step = state["current_step"]
+    shown = min(current_step, total) - 1
+
+    if intent.intent == NEXT:
+        if current_step < total:
+            state["current_step"] += 1
+            return format_step(recipe_steps, current_step)
+        if current_step == total:
+            state["current_step"] += 1
+            return COOKING_DONE_TEXT
+        return ALREADY_DONE_TEXT
+
+    if intent.intent in (REPEAT, PREVIOUS):
+        target = shown if intent.intent == REPEAT else shown - 1
+        if target < 0:
+            # 아직 시작 전이거나 첫 단계에서 뒤로 가면 첫 단계 안내
+            state["current_step"] = 1
+            prefix = "첫 단계예요. " if intent.intent == PREVIOUS and shown == 0 else ""
+            return prefix + format_step(recipe_steps, 0)
+        state["current_step"] = target + 1
+        return format_step(recipe_steps, target)
+
+    if intent.intent == GOTO:
+        if 1 <= intent.step <= total:
+            state["current_step"] = intent.step
+            return format_step(recipe_steps, intent.step - 1)
+        return f"이 레시피는 {total}단계까지 있어요."
+
+    if intent.intent == TIMER:
+        seconds = intent.seconds
+        if seconds is None and shown >= 0:
+            # 시간을 말하지 않았으면 지금 단계 문장에서 찾음 ("10분간 끓인다")
+            seconds = parse_duration(recipe_steps[shown])
+        if not seconds:
+            return "몇 분으로 맞춰 드릴까요? 예를 들어 '5분 타이머'라고 말씀해 주세요."
+        await websocket.send_text(json.dumps({
+            "type": "timer",
+            "data": {"seconds": seconds, "step": shown + 1 if shown >= 0 else None}
+        }))
+        return f"{format_duration(seconds)} 타이머를 시작할게요."
+
+    return answer_ingredient(intent, state.get("ingredients", []))
+
+async def speak_llm_pipelined(websocket: WebSocket, system_prompt: str, user_prompt: str, clean=None, max_chars=None):
+    """LLM 토큰 스트림을 문장 단위 TTS로 바로 전달 (스트리밍 실패 시 일반 호출 결과를 문장 단위로 전달)"""
+    final_prompt = build_llama3_2_prompt(system_prompt, user_prompt)
+    try:
+        return await speak_pipelined(
+            websocket, AI_SERVER_TTS_URL, stream_llm_tokens(AI_SERVER_LLM_URL, final_prompt),
+            clean=clean, max_chars=max_chars
+        )
+    except WebSocketDisconnect:
+        raise
+    except Exception as e:
+        logger.warning(f"LLM 토큰 스트리밍 실패, 일반 호출로 대체: {e}")
+    text = await call_llm(system_prompt, user_prompt)
+    return await speak_text_pipelined(websocket, AI_SERVER_TTS_URL, text, clean=clean, max_chars=max_chars)
+
 # 헬스체크 엔드포인트
 @app.get("/")
 async def root():
@@ -71,6 +257,21 @@ async def root():
 async def health():
     return {"status": "healthy", "service": "fastapi-gateapi"}
 
+@app.get("/metrics/upstreams")
+async def upstream_metrics():
+    """업스트림별 HTTP 연결 풀 지표"""
+    return http_clients.stats()
+
+@app.get("/metrics/sessions")
+async def session_metrics():
+    """레시피 챗봇 세션 저장소 지표 (개수, 추정 메모리, 만료/삭제 수)"""
+    return USER_STATES.stats()
+
+@app.get("/metrics/tts-cache")
+async def tts_cache_metrics():
+    """TTS 오디오 캐시 지표 (적중률, 크기, 미리 받기)"""
+    return tts_cache.stats()
+
 async def stream_audio(websocket: WebSocket, client: httpx.AsyncClient, audio_filename: str):
     """오디오를 스트리밍합니다."""
     async with client.stream("GET", f"{AI_SERVER_URL}/audio/{audio_filename}") as audio_response:
@@ -85,14 +286,14 @@ async def stream_audio(websocket: WebSocket, client: httpx.AsyncClient, audio_fi
 async def websocket_chat_endpoint(websocket: WebSocket):
     await websocket.accept()
     logger.info("클라이언트와 WebSocket 연결 성공.")
+    pipeline = wants_pipeline(websocket)
     
-    local_temp_files = []
     server1_response_files = []
     
     try:
         # --- 초기 인사말 전송 ---
         try:
-            async with httpx.AsyncClient(timeout=90.0) as client:
+            async with http_clients.borrow("ai") as client:
                 greeting_info_response = await client.post(f"{AI_SERVER_URL}/generate-greeting")
                 greeting_info_response.raise_for_status()
                 greeting_info = greeting_info_response.json()
@@ -106,19 +307,15 @@ async def websocket_chat_endpoint(websocket: WebSocket):
 
         # --- 사용자 음성 요청 처리 루프 ---
         while True:
-            # 1. 클라이언트 음성 수신 및 임시 파일 생성
+            # 1. 클라이언트 음성 수신 (메모리에 유지, 디버그 설정 시에만 파일 저장)
             wav_data = await websocket.receive_bytes()
             uid = str(uuid.uuid4())
-            wav_path = os.path.join(TEMP_DIR, f"{uid}.wav")
-            local_temp_files.append(wav_path)
-            with open(wav_path, 'wb') as f: f.write(wav_data)
+            debug_save_audio(wav_data, uid)
             
             # 2. STT 요청 및 사용자 텍스트 우선 전송
             user_text = ""
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                with open(wav_path, "rb") as f_wav:
-                    files = {"audio": (f"{uid}.wav", f_wav, "audio/wav")}
-                    stt_response = await client.post(f"{AI_SERVER_URL}/stt", files=files)
+            async with http_clients.borrow("stt") as client:
+                stt_response = await client.post(f"{AI_SERVER_URL}/stt", files=stt_files(wav_data, uid))
                 stt_response.raise_for_status()
                 user_text = stt_response.json()["text"]
                 
@@ -127,7 +324,13 @@ async def websocket_chat_endpoint(websocket: WebSocket):
                 logger.info(f"사용자 텍스트 우선 전송 완료: {user_text}")
             
             # 3. LLM/TTS 요청 및 결과 전송
-            async with httpx.AsyncClient(timeout=90.0) as client:
+            if pipeline:
+                # 파이프라인 모드: LLM 토큰을 문장 단위로 바로 TTS에 전달
+                bot_response_text = await speak_llm_pipelined(websocket, CHAT_SYSTEM_PROMPT, user_text)
+                logger.info(f"봇 응답 파이프라인 전송 완료: {bot_response_text}")
+                continue
+
+            async with http_clients.borrow("ai") as client:
                 payload = {"text": user_text}
                 llm_info_response = await client.post(f"{AI_SERVER_URL}/generate-llm-response", json=payload)
                 llm_info_response.raise_for_status()
@@ -150,18 +353,12 @@ async def websocket_chat_endpoint(websocket: WebSocket):
     except Exception as e:
         logger.error(f"WebSocket 처리 중 예상치 못한 에러 발생: {e}")
     finally:
-        # 세션 종료 시 모든 임시 파일 정리
+        # 세션 종료 시 AI 서버의 응답 오디오 정리
         logger.info("세션 종료. 파일 정리를 시작합니다.")
-        for file_path in local_temp_files:
-            try:
-                if os.path.exists(file_path): os.remove(file_path)
-            except Exception as e:
-                logger.error(f"로컬 임시 파일 삭제 실패 {file_path}: {e}")
-        
         if server1_response_files:
             logger.info(f"서버 1의 응답 오디오 파일 {len(server1_response_files)}개 정리 시작...")
             try:
-                async with httpx.AsyncClient() as client:
+                async with http_clients.borrow("ai") as client:
                     delete_tasks = [client.delete(f"{AI_SERVER_URL}/audio/{fname}") for fname in server1_response_files]
                     await asyncio.gather(*delete_tasks, return_exceptions=True)
                 logger.info("서버 1 응답 오디오 파일 정리 완료.")
@@ -177,6 +374,7 @@ async def websocket_chat_endpoint(websocket: WebSocket):
 async def websocket_recipe_chat_endpoint(websocket: WebSocket):
     await websocket.accept()
     logger.info("레시피 챗봇: 클라이언트와 WebSocket 연결 성공.")
+    pipeline = wants_pipeline(websocket)
 
     USER_ID = str(uuid.uuid4())
 
@@ -193,102 +391,13 @@ async def websocket_recipe_chat_endpoint(websocket: WebSocket):
         if not title or not content:
             raise Exception("레시피 제목 또는 내용이 JSON 데이터에 포함되어 있지 않습니다.")
 
-        # ===== 안전한 단계 분리 =====
-        # 한 줄에 여러 단계가 있을 수 있으므로 숫자. 패턴으로 직접 분리
-        # 예: "1. 양파는... 3. 샐러리는... 4. 양송이는..." 같은 경우
-        steps_list = []
-        
-        # 정규식으로 모든 "숫자. " 패턴 찾기 (공백 선택적)
-        pattern = r'(\d+)\.\s*'
-        matches = list(re.finditer(pattern, content))
-        
-        logger.info(f"레시피 챗봇: 단계 파싱 시작. content 길이: {len(content)}자, 숫자 패턴 발견: {len(matches)}개")
-        
-        if len(matches) > 1:
-            # 여러 단계가 있는 경우 - 각 단계를 분리
-            for i in range(len(matches)):
-                start_pos = matches[i].end()
-                # 다음 단계의 시작 위치 또는 끝까지
-                if i + 1 < len(matches):
-                    end_pos = matches[i + 1].start()
-                else:
-                    end_pos = len(content)
-                
-                step_text = content[start_pos:end_pos].strip()
-                # 앞뒤 공백 제거 및 불필요한 문자 제거
-                step_text = re.sub(r'^\d+\.\s*', '', step_text).strip()  # 혹시 남아있는 숫자. 제거
-                # "다음" 관련 텍스트 제거 (레시피 내용에 포함된 경우)
-                step_text = re.sub(r'\s*다음\s*[\.。]?\s*', ' ', step_text).strip()
-                step_text = re.sub(r'\s*다음단계\s*[\.。]?\s*', ' ', step_text).strip()
-                step_text = re.sub(r'\s+', ' ', step_text)  # 연속된 공백 제거
-                if step_text:
-                    steps_list.append(step_text)
-                    logger.debug(f"레시피 챗봇: 단계 {i+1} 파싱: {step_text[:50]}... (길이: {len(step_text)}자)")
-            
-            logger.info(f"레시피 챗봇: 방법 1로 파싱 완료. {len(steps_list)}개 단계 발견")
-        elif len(matches) == 1:
-            # 단계가 하나만 있는 경우 (줄바꿈으로 분리 시도)
-            logger.warning(f"레시피 챗봇: 숫자 패턴이 1개만 발견됨. 줄바꿈으로 재시도...")
-            lines = content.split('\n')
-            for line in lines:
-                line = line.strip()
-                if line and not line.startswith('#'):
-                    # 숫자. 또는 숫자) 또는 - 로 시작하는 줄을 새 단계로 인식
-                    if re.match(r'^\d+[\.\)]\s*', line) or re.match(r'^-\s*', line):
-                        step_text = re.sub(r'^\d+[\.\)]\s*', '', line).strip()
-                        step_text = re.sub(r'^-\s*', '', step_text).strip()
-                        if step_text:
-                            steps_list.append(step_text)
-                    elif steps_list:
-                        # 이전 단계에 추가
-                        steps_list[-1] += " " + line
-                    else:
-                        # 첫 단계
-                        steps_list.append(line)
+        # 단계 목록: 추천 결과에 미리 계산된 steps가 있으면 그대로, 없으면 공용 분리기(캐시)로
+        steps_list = selected_recipe_data.get("steps")
+        if not (isinstance(steps_list, list) and steps_list and all(isinstance(step, str) and step.strip() for step in steps_list)):
+            steps_list = list(get_steps(content))
+            logger.info(f"레시피 챗봇: 단계 분리 완료. content 길이: {len(content)}자, {len(steps_list)}개 단계")
         else:
-            # 숫자 패턴이 없는 경우 - 줄바꿈으로 분리
-            logger.warning(f"레시피 챗봇: 숫자 패턴이 없음. 줄바꿈으로 분리...")
-            lines = content.split('\n')
-            for line in lines:
-                line = line.strip()
-                if line and len(line) > 5:  # 너무 짧은 줄 제외
-                    steps_list.append(line)
-        
-        # 방법 2: 여전히 하나의 긴 단계만 있으면 문장 단위로 분리
-        if len(steps_list) == 1 and len(steps_list[0]) > 500:
-            logger.warning(f"레시피 챗봇: 단계가 하나만 있고 너무 깁니다 ({len(steps_list[0])}자). 문장 단위로 분리...")
-            # 마침표나 느낌표로 문장 분리
-            sentences = re.split(r'[.!?]\s+', steps_list[0])
-            steps_list = [s.strip() for s in sentences if s.strip() and len(s.strip()) > 10]
-        
-        # 방법 3: 각 단계 내부에 또 다른 숫자 패턴이 있으면 추가 분리
-        final_steps_list = []
-        for step in steps_list:
-            # 단계 내부에 "숫자. " 패턴이 있는지 확인
-            inner_matches = list(re.finditer(r'(\d+)\.\s*', step))
-            if len(inner_matches) > 1:
-                # 내부에 여러 단계가 있는 경우 분리
-                logger.info(f"레시피 챗봇: 단계 내부에 {len(inner_matches)}개 패턴 발견. 추가 분리...")
-                for i in range(len(inner_matches)):
-                    start_pos = inner_matches[i].end()
-                    if i + 1 < len(inner_matches):
-                        end_pos = inner_matches[i + 1].start()
-                    else:
-                        end_pos = len(step)
-                    inner_step = step[start_pos:end_pos].strip()
-                    inner_step = re.sub(r'^\d+\.\s*', '', inner_step).strip()
-                    # "다음" 관련 텍스트 제거
-                    inner_step = re.sub(r'\s*다음\s*[\.。]?\s*', ' ', inner_step).strip()
-                    inner_step = re.sub(r'\s*다음단계\s*[\.。]?\s*', ' ', inner_step).strip()
-                    inner_step = re.sub(r'\s+', ' ', inner_step)  # 연속된 공백 제거
-                    if inner_step:
-                        final_steps_list.append(inner_step)
-            else:
-                final_steps_list.append(step)
-        
-        if len(final_steps_list) > len(steps_list):
-            logger.info(f"레시피 챗봇: 추가 분리 완료. {len(steps_list)}개 → {len(final_steps_list)}개 단계")
-            steps_list = final_steps_list
+            logger.info(f"레시피 챗봇: 미리 계산된 단계 사용 ({len(steps_list)}개)")
         
         if not steps_list:
             error_text = f"'{title}' 레시피의 요리 단계를 파싱할 수 없습니다."
@@ -300,7 +409,13 @@ async def websocket_recipe_chat_endpoint(websocket: WebSocket):
         
         logger.info(f"레시피 챗봇: 단계 파싱 완료. 총 {len(steps_list)}개 단계 (첫 단계 길이: {len(steps_list[0]) if steps_list else 0}자)")
 
-        USER_STATES[USER_ID] = {"title": title, "steps": steps_list, "current_step": 0}
+        ingredients = selected_recipe_data.get("ingredients") or []
+        if isinstance(ingredients, str):
+            ingredients = [item.strip() for item in re.split(r'[,\n]', ingredients) if item.strip()]
+
+        USER_STATES[USER_ID] = {"title": title, "steps": steps_list, "current_step": 0, "ingredients": ingredients}
+        # 인사말을 말하는 동안 앞쪽 단계 오디오를 미리 합성
+        prefetch_step_audio(USER_STATES[USER_ID])
 
         greeting_text = f"안녕하세요 쿡덕입니다! 사용자님이 선택하신 {title} 레시피를 알려드릴게요! \"다음\" 또는 \"다음단계\"라고 말씀하시면 레시피를 차례대로 안내해 드립니다."
         await websocket.send_text(json.dumps({"type": "bot_text", "data": greeting_text}))
@@ -316,37 +431,39 @@ async def websocket_recipe_chat_endpoint(websocket: WebSocket):
         return
 
     # --- 2. 음성 수신 및 단계별 안내 루프 ---
-    local_temp_files = []  # 임시 파일 추적용
+    # 스트리밍(PCM 프레임) 프로토콜을 쓴 적이 있으면 발화 종료 후 늦게 온 프레임을 걸러냄
+    streamed_before = False
     try:
         while True:
             # WAV 데이터 수신 (Flutter에서 WAV로 전송)
             logger.info("레시피 챗봇: 오디오 데이터 수신 대기 중...")
-            wav_path = None
+            audio_data = None
+            stream_start = None
             try:
                 # 메시지 타입 확인 (바이너리 또는 텍스트)
                 message = await websocket.receive()
                 logger.info(f"레시피 챗봇: 메시지 수신 (keys: {list(message.keys())})")
                 
-                if "bytes" in message:
+                if message.get("bytes") is not None:
+                    if streamed_before and is_stray_pcm(message["bytes"]):
+                        # 스트리밍 발화 종료 후 늦게 도착한 PCM 프레임은 버림
+                        continue
                     audio_data = message["bytes"]
                     logger.info(f"레시피 챗봇: 오디오 데이터 수신 완료 ({len(audio_data)} bytes)")
-                    
-                    # WAV 파일로 저장
                     uid = str(uuid.uuid4())
-                    wav_path = os.path.join(TEMP_DIR, f"{uid}.wav")
-                    try:
-                        with open(wav_path, 'wb') as f: 
-                            f.write(audio_data)
-                        local_temp_files.append(wav_path)
-                        file_size = os.path.getsize(wav_path)
-                        logger.info(f"레시피 챗봇: 오디오 파일 저장 완료 ({wav_path}, 크기: {file_size} bytes)")
-                    except Exception as file_err:
-                        logger.error(f"레시피 챗봇: 오디오 파일 저장 실패: {file_err}")
+                    debug_save_audio(audio_data, uid)
+                elif message.get("text") is not None:
+                    control = parse_control(message["text"])
+                    if control is None or control["type"] != "audio_start":
+                        # 스트리밍 시작이 아닌 텍스트 메시지는 무시하고 다시 대기
+                        if control is None:
+                            logger.warning(f"레시피 챗봇: 예상치 못한 텍스트 메시지 수신: {message['text'][:100]}")
                         continue
-                elif "text" in message:
-                    # 텍스트 메시지가 오면 무시하고 다시 대기
-                    logger.warning(f"레시피 챗봇: 예상치 못한 텍스트 메시지 수신: {message['text'][:100]}")
-                    continue
+                    stream_start = control
+                    streamed_before = True
+                elif message.get("type") == "websocket.disconnect":
+                    logger.info(f"레시피 챗봇: 클라이언트({USER_ID})가 연결 종료")
+                    break
                 else:
                     logger.warning(f"레시피 챗봇: 알 수 없는 메시지 타입: {message}")
                     continue
@@ -369,54 +486,57 @@ async def websocket_recipe_chat_endpoint(websocket: WebSocket):
                     break
                 continue
             
-            if not wav_path or not os.path.exists(wav_path):
-                logger.error("레시피 챗봇: WAV 파일이 생성되지 않았습니다.")
+            if stream_start is None and not audio_data:
+                logger.error("레시피 챗봇: 오디오 데이터가 비어 있습니다.")
                 continue
 
             # STT 요청
-            logger.info(f"레시피 챗봇: STT 서버로 요청 전송 중... ({AI_SERVER_LLM_URL}/stt)")
             user_text = None
             try:
-                if not os.path.exists(wav_path):
-                    logger.error(f"레시피 챗봇: WAV 파일이 존재하지 않음: {wav_path}")
-                    continue
-                
-                file_size = os.path.getsize(wav_path)
-                logger.info(f"레시피 챗봇: STT 요청 시작 (파일: {wav_path}, 크기: {file_size} bytes)")
-                
-                async with httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=10.0)) as client:
-                    logger.info(f"레시피 챗봇: STT POST 요청 준비 중... (파일명: {uid}.wav)")
-                    with open(wav_path, "rb") as f_wav:
-                        files = {"audio": (f"{uid}.wav", f_wav, "audio/wav")}
-                        logger.info(f"레시피 챗봇: STT POST 요청 전송 중... (URL: {AI_SERVER_LLM_URL}/stt)")
-                        stt_response = await client.post(f"{AI_SERVER_LLM_URL}/stt", files=files)
+                if stream_start is not None:
+                    # 스트리밍 모드: 발화 중에 PCM 프레임을 STT로 바로 전달하고 VAD로 발화 끝을 판단
+                    logger.info(f"레시피 챗봇: 스트리밍 오디오 수신 시작 ({stream_start})")
+                    user_text = await receive_streaming_utterance(websocket, stream_start, AI_SERVER_LLM_URL)
+                    logger.info(f"레시피 챗봇: 스트리밍 STT 결과: '{user_text}'")
+                else:
+                    logger.info(f"레시피 챗봇: STT 요청 시작 (파일명: {uid}.wav, 크기: {len(audio_data)} bytes)")
+
+                    async with http_clients.borrow("stt") as client:
+                        stt_response = await client.post(
+                            f"{AI_SERVER_LLM_URL}/stt",
+                            files=stt_files(audio_data, uid),
+                            timeout=httpx.Timeout(30.0, connect=10.0)
+                        )
                         logger.info(f"레시피 챗봇: STT 응답 수신 (상태 코드: {stt_response.status_code})")
-                    
-                    stt_response.raise_for_status()
-                    response_json = stt_response.json()
-                    logger.info(f"레시피 챗봇: STT 응답 JSON: {response_json}")
-                    user_text = response_json.get("text", "").strip().lower()
-                    logger.info(f"레시피 챗봇: STT 결과: '{user_text}'")
+
+                        stt_response.raise_for_status()
+                        response_json = stt_response.json()
+                        logger.info(f"레시피 챗봇: STT 응답 JSON: {response_json}")
+                        user_text = response_json.get("text", "").strip().lower()
+                        logger.info(f"레시피 챗봇: STT 결과: '{user_text}'")
+            except WebSocketDisconnect:
+                logger.info(f"레시피 챗봇: 클라이언트({USER_ID})가 음성 스트리밍 중 연결 종료")
+                break
             except httpx.TimeoutException as timeout_err:
                 logger.error(f"레시피 챗봇: STT 요청 타임아웃 (30초 초과): {timeout_err}")
-                await websocket.send_text(json.dumps({"type": "bot_text", "data": "음성 인식 서버 응답이 지연되고 있습니다. 잠시 후 다시 시도해주세요."}))
-                await call_tts_and_stream(websocket, "음성 인식 서버 응답이 지연되고 있습니다. 잠시 후 다시 시도해주세요.")
+                await websocket.send_text(json.dumps({"type": "bot_text", "data": STT_TIMEOUT_TEXT}))
+                await call_tts_and_stream(websocket, STT_TIMEOUT_TEXT)
                 continue
             except httpx.ConnectError as conn_err:
                 logger.error(f"레시피 챗봇: STT 서버 연결 실패: {conn_err}")
-                await websocket.send_text(json.dumps({"type": "bot_text", "data": "음성 인식 서버에 연결할 수 없습니다. 네트워크를 확인해주세요."}))
-                await call_tts_and_stream(websocket, "음성 인식 서버에 연결할 수 없습니다. 네트워크를 확인해주세요.")
+                await websocket.send_text(json.dumps({"type": "bot_text", "data": STT_CONNECT_ERROR_TEXT}))
+                await call_tts_and_stream(websocket, STT_CONNECT_ERROR_TEXT)
                 continue
             except Exception as stt_error:
                 logger.error(f"레시피 챗봇: STT 요청 실패: {stt_error}", exc_info=True)
-                await websocket.send_text(json.dumps({"type": "bot_text", "data": "음성 인식에 실패했습니다. 다시 시도해주세요."}))
-                await call_tts_and_stream(websocket, "음성 인식에 실패했습니다. 다시 시도해주세요.")
+                await websocket.send_text(json.dumps({"type": "bot_text", "data": STT_FAILED_TEXT}))
+                await call_tts_and_stream(websocket, STT_FAILED_TEXT)
                 continue
             
             if not user_text or len(user_text.strip()) == 0:
                 logger.warning("레시피 챗봇: STT 결과가 비어있음")
-                await websocket.send_text(json.dumps({"type": "bot_text", "data": "음성을 인식하지 못했습니다. 다시 말씀해주세요."}))
-                await call_tts_and_stream(websocket, "음성을 인식하지 못했습니다. 다시 말씀해주세요.")
+                await websocket.send_text(json.dumps({"type": "bot_text", "data": STT_EMPTY_TEXT}))
+                await call_tts_and_stream(websocket, STT_EMPTY_TEXT)
                 continue
             
             # 사용자 텍스트 전송
@@ -427,70 +547,13 @@ async def websocket_recipe_chat_endpoint(websocket: WebSocket):
                 raise Exception("사용자 상태 정보(USER_STATE) 없음.")
 
             # 레시피 단계 처리
-            # "다음" 명령어 정규화 (점, 공백, 특수문자 제거)
-            normalized_user_text = re.sub(r'[\.\s,，。]+', '', user_text).lower()
-            is_next_command = normalized_user_text in ["다음", "다음단계", "next", "넥스트", "다음단계로", "다음으로"]
-            
-            if is_next_command:
-                current_step = state["current_step"]
-                recipe_steps = state["steps"]
-                
-                logger.info(f"레시피 챗봇: '다음' 명령 수신. 현재 단계: {current_step}, 총 단계: {len(recipe_steps)}")
-                
-                if current_step < len(recipe_steps):
-                    # 현재 단계만 반환 (전체가 아닌 하나의 단계만)
-                    step_content = recipe_steps[current_step]
-                    
-                    # 만약 단계 내용이 너무 길면 (전체 레시피가 하나의 단계로 들어간 경우) 다시 파싱 시도
-                    if len(step_content) > 500:
-                        logger.warning(f"레시피 챗봇: 단계 내용이 너무 깁니다 ({len(step_content)}자). 재파싱 시도...")
-                        # 숫자 패턴으로 다시 분리 시도
-                        pattern = r'(\d+)\.\s*'
-                        matches = list(re.finditer(pattern, step_content))
-                        if len(matches) > 1:
-                            # 여러 단계가 포함된 경우 첫 번째만 사용
-                            first_match = matches[0]
-                            if len(matches) > 1:
-                                second_match = matches[1]
-                                step_content = step_content[first_match.end():second_match.start()].strip()
-                            else:
-                                step_content = step_content[first_match.end():].strip()
-                            logger.info(f"레시피 챗봇: 재파싱된 단계 내용 (길이: {len(step_content)}자): {step_content[:100]}...")
-                        else:
-                            # 줄바꿈으로 분리 시도
-                            lines = step_content.split('\n')
-                            if len(lines) > 1:
-                                # 첫 번째 줄만 사용
-                                step_content = lines[0].strip()
-                                logger.info(f"레시피 챗봇: 줄바꿈으로 재파싱된 단계 내용: {step_content[:100]}...")
-                    
-                    # 단계 내용이 여전히 너무 길면 강제로 자르기 (200자 제한)
-                    if len(step_content) > 200:
-                        logger.warning(f"레시피 챗봇: 단계 내용이 여전히 깁니다 ({len(step_content)}자). 200자로 제한합니다.")
-                        # 마침표나 쉼표로 자연스럽게 자르기
-                        truncated = step_content[:200]
-                        last_period = truncated.rfind('.')
-                        last_comma = truncated.rfind(',')
-                        cut_pos = max(last_period, last_comma)
-                        if cut_pos > 100:  # 최소 100자는 보장
-                            step_content = step_content[:cut_pos + 1]
-                        else:
-                            step_content = step_content[:200] + "..."
-                    
-                    # 단계 내용에서 "다음" 관련 텍스트 제거 (혹시 포함된 경우)
-                    step_content = re.sub(r'\s*다음\s*[\.。]?\s*', ' ', step_content).strip()
-                    step_content = re.sub(r'\s*다음단계\s*[\.。]?\s*', ' ', step_content).strip()
-                    step_content = re.sub(r'\s+', ' ', step_content)  # 연속된 공백 제거
-                    
-                    bot_response_text = f"{current_step + 1}단계. {step_content}"
-                    state["current_step"] += 1
-                    logger.info(f"레시피 챗봇: 단계 {current_step} 반환 완료 (내용 길이: {len(step_content)}자, 응답 길이: {len(bot_response_text)}자)")
-                elif current_step == len(recipe_steps):
-                    bot_response_text = "요리가 완료되었습니다! 맛있게 드세요."
-                    state["current_step"] += 1
-                else:
-                    bot_response_text = "이미 요리가 완료되었습니다. 다음 명령은 없습니다."
+            # 다음/이전/반복/N단계/타이머/재료 질문은 LLM 없이 바로 응답
+            intent = await intent_router.route(user_text, state.get("ingredients", []))
+            if intent is not None:
+                logger.info(f"레시피 챗봇: 빠른 경로 의도 '{intent.intent}' ({intent.source}). 현재 단계: {state['current_step']}, 총 단계: {len(state['steps'])}")
+                bot_response_text = await answer_intent(websocket, intent, state)
                 USER_STATES[USER_ID] = state
+                prefetch_step_audio(state)
             else:
                 # LLM을 통한 일반 응답 (전체 레시피를 반환하지 않도록 명시)
                 system_prompt = (
@@ -498,6 +561,13 @@ async def websocket_recipe_chat_endpoint(websocket: WebSocket):
                     f"**중요: 사용자가 레시피 전체를 요청해도 절대 전체 레시피를 나열하지 마세요. "
                     f"간단하고 짧게 답변하거나, '다음' 또는 '다음 단계'라고 말씀하시면 단계별로 안내해드린다고 안내하세요.**"
                 )
+                if pipeline:
+                    # 파이프라인 모드: 문장이 생성되는 대로 TTS 전송 (300자 넘으면 생성 중단)
+                    bot_response_text = await speak_llm_pipelined(
+                        websocket, system_prompt, user_text, clean=strip_next_words, max_chars=300
+                    )
+                    logger.info(f"레시피 챗봇: 파이프라인 응답 전송 완료 ({len(bot_response_text)}자)")
+                    continue
                 bot_response_text = await call_llm(system_prompt, user_text)
                 # LLM 응답이 너무 길면 (전체 레시피를 반환한 경우) 잘라내기
                 if len(bot_response_text) > 300:
@@ -505,12 +575,14 @@ async def websocket_recipe_chat_endpoint(websocket: WebSocket):
                     bot_response_text = bot_response_text[:300] + "... (전체 레시피는 '다음' 또는 '다음 단계'라고 말씀하시면 단계별로 안내해드립니다.)"
 
             # 봇 응답에서 "다음" 관련 텍스트 최종 제거 (혹시 LLM 응답에 포함된 경우)
-            bot_response_text = re.sub(r'\s*다음\s*[\.。]?\s*', ' ', bot_response_text).strip()
-            bot_response_text = re.sub(r'\s*다음단계\s*[\.。]?\s*', ' ', bot_response_text).strip()
-            bot_response_text = re.sub(r'\s+', ' ', bot_response_text)  # 연속된 공백 제거
+            bot_response_text = strip_next_words(bot_response_text)
             
             # 봇 응답 전송
             logger.info(f"레시피 챗봇: 봇 응답 생성 완료: '{bot_response_text[:50]}...'")
+            if pipeline and not tts_cache.contains(bot_response_text):
+                # 캐시에 있는 문장(미리 받은 단계 등)은 파이프라인보다 캐시 전송이 빠름
+                await speak_text_pipelined(websocket, AI_SERVER_TTS_URL, bot_response_text)
+                continue
             await websocket.send_text(json.dumps({"type": "bot_text", "data": bot_response_text}))
             logger.info("레시피 챗봇: 봇 텍스트 메시지 전송 완료, TTS 시작")
             await call_tts_and_stream(websocket, bot_response_text)
@@ -525,15 +597,7 @@ async def websocket_recipe_chat_endpoint(websocket: WebSocket):
         if USER_ID in USER_STATES: 
             del USER_STATES[USER_ID]
     finally:
-        # 임시 파일 정리
-        try:
-            for temp_file in local_temp_files:
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
-                    logger.debug(f"레시피 챗봇: 임시 파일 삭제 완료: {temp_file}")
-        except Exception as cleanup_error:
-            logger.warning(f"레시피 챗봇: 임시 파일 정리 중 에러: {cleanup_error}")
-        logger.info(f"레시피 챗봇: 연결 종료 및 임시 파일 정리 완료.")
+        logger.info("레시피 챗봇: 연결 종료.")
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000, reload=False)
@@ -0,0 +1,337 @@
+"""
+스트리밍 STT 수신 (레시피 챗봇 /ws/recipe-chat)
+
+클라이언트가 발화 전체 WAV 대신 작은 PCM 프레임을 보내면, 게이트웨이가 에너지 기반 VAD로
+발화 시작/끝을 판단하면서 프레임을 바로 STT 업스트림으로 흘려보낸다.
+사용자가 말하는 동안 업로드와 인식이 함께 진행되므로 발화 종료 후 대기 시간이 줄어든다.
+
+프로토콜:
+    → {"type": "audio_start", "sample_rate": 16000, "channels": 1}   (텍스트, 16-bit little-endian PCM)
+    → <PCM 프레임 (20~100ms 권장)> ...                                 (바이너리)
+    ← {"type": "event", "data": "VAD_ENDPOINT"}                        발화 끝 감지 → 전송 중단
+    → {"type": "audio_end"}                                            (선택) 클라이언트가 직접 끝낼 때
+
+STT_STREAM_BACKEND:
+    buffered - 프레임을 모아 발화가 끝나면 WAV로 /stt 요청 (기본값, 현재 AI 서버에는 /stt만 있음)
+    http     - AI 서버 스트리밍 엔드포인트(AI_SERVER_STT_STREAM_PATH)로 청크 업로드
+               (실패 시 모은 PCM을 WAV로 /stt 재요청 - 스트리밍 엔드포인트를 배포한 뒤에 사용)
+    local    - 업스트림 없이 고정 문장을 돌려주는 로컬 대체 구현 (테스트용)
+"""
+
+import asyncio
+import io
+import json
+import logging
+import os
+import uuid
+import wave
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, List, Optional, Tuple
+
+import numpy as np
+from fastapi import WebSocket, WebSocketDisconnect
+
+from fastapi_gateapi.audio_io import debug_save_audio, stt_files
+from fastapi_gateapi.http_clients import http_clients
+
+logger = logging.getLogger(__name__)
+
+STT_STREAM_BACKEND = os.getenv("STT_STREAM_BACKEND", "buffered")
+STT_STREAM_PATH = os.getenv("AI_SERVER_STT_STREAM_PATH", "/stt-stream")
+STT_LOCAL_TRANSCRIPT = os.getenv("STT_LOCAL_TRANSCRIPT", "다음")
+
+# VAD / 엔드포인트 설정 (ms)
+VAD_SILENCE_MS = int(os.getenv("VAD_SILENCE_MS", "700"))        # 발화 후 이만큼 조용하면 끝
+VAD_MIN_SPEECH_MS = int(os.getenv("VAD_MIN_SPEECH_MS", "90"))   # 이만큼 연속으로 소리가 나야 발화 시작
+VAD_PREROLL_MS = 240                                             # 발화 시작 직전 오디오 (첫 음절 잘림 방지)
+VAD_MAX_UTTERANCE_MS = 15000
+VAD_NO_SPEECH_TIMEOUT_MS = 8000
+# 음성 판정: RMS가 (배경 소음 × 비율) 과 최소값보다 클 때
+VAD_THRESHOLD_RATIO = 3.0
+VAD_MIN_RMS = 300.0
+
+
+@dataclass
+class AudioFormat:
+    sample_rate: int = 16000
+    channels: int = 1
+    sample_width: int = 2  # 16-bit PCM
+
+    def duration_ms(self, frame: bytes) -> float:
+        return len(frame) * 1000.0 / (self.sample_rate * self.channels * self.sample_width)
+
+    def to_wav(self, pcm: bytes) -> bytes:
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(self.channels)
+            wav.setsampwidth(self.sample_width)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(pcm)
+        return buffer.getvalue()
+
+
+class EnergyEndpointer:
+    """RMS 에너지 기반 발화 시작/끝 판단 (배경 소음 수준은 무음 구간에서 지수이동평균으로 추정)"""
+
+    def __init__(
+        self,
+        fmt: AudioFormat,
+        silence_ms: int = VAD_SILENCE_MS,
+        min_speech_ms: int = VAD_MIN_SPEECH_MS,
+        preroll_ms: int = VAD_PREROLL_MS,
+        max_utterance_ms: int = VAD_MAX_UTTERANCE_MS,
+        no_speech_timeout_ms: int = VAD_NO_SPEECH_TIMEOUT_MS
+    ):
+        self.fmt = fmt
+        self.silence_ms = silence_ms
+        self.min_speech_ms = min_speech_ms
+        self.preroll_ms = preroll_ms
+        self.max_utterance_ms = max_utterance_ms
+        self.no_speech_timeout_ms = no_speech_timeout_ms
+
+        self.noise_rms: Optional[float] = None
+        self.in_speech = False
+        self._voiced_ms = 0.0
+        self._silence_ms = 0.0
+        self._speech_total_ms = 0.0
+        self._elapsed_ms = 0.0
+        self._preroll: Deque[Tuple[bytes, float]] = deque()
+        self._preroll_total = 0.0
+
+    @property
+    def heard_speech(self) -> bool:
+        return self.in_speech
+
+    def _rms(self, frame: bytes) -> float:
+        usable = len(frame) - len(frame) % self.fmt.sample_width
+        if usable <= 0:
+            return 0.0
+        samples = np.frombuffer(frame[:usable], dtype="<i2").astype(np.float32)
+        return float(np.sqrt(np.mean(samples * samples)))
+
+    def _is_voiced(self, rms: float) -> bool:
+        threshold = VAD_MIN_RMS
+        if self.noise_rms is not None:
+            threshold = max(threshold, self.noise_rms * VAD_THRESHOLD_RATIO)
+        return rms > threshold
+
+    def push(self, frame: bytes) -> Tuple[List[bytes], bool]:
+        """
+        프레임 하나 처리
+
+        Returns:
+            (STT로 보낼 프레임 목록, 발화 끝 여부)
+            발화 시작 전에는 프레임을 보관만 하고, 시작되는 순간 보관분(pre-roll)과 함께 내보낸다.
+        """
+        duration = self.fmt.duration_ms(frame)
+        self._elapsed_ms += duration
+        rms = self._rms(frame)
+        voiced = self._is_voiced(rms)
+
+        if not self.in_speech:
+            self._preroll.append((frame, duration))
+            self._preroll_total += duration
+            while self._preroll and self._preroll_total - self._preroll[0][1] >= self.preroll_ms:
+                self._preroll_total -= self._preroll.popleft()[1]
+
+            if voiced:
+                self._voiced_ms += duration
+            else:
+                self._voiced_ms = 0.0
+                # 무음 구간에서만 배경 소음 갱신
+                self.noise_rms = rms if self.noise_rms is None else 0.95 * self.noise_rms + 0.05 * rms
+
+            if self._voiced_ms >= self.min_speech_ms:
+                self.in_speech = True
+                frames = [f for f, _ in self._preroll]
+                self._speech_total_ms = self._preroll_total
+                self._preroll.clear()
+                self._preroll_total = 0.0
+                return frames, False
+            return [], self._elapsed_ms >= self.no_speech_timeout_ms
+
+        self._speech_total_ms += duration
+        self._silence_ms = 0.0 if voiced else self._silence_ms + duration
+        done = self._silence_ms >= self.silence_ms or self._speech_total_ms >= self.max_utterance_ms
+        return [frame], done
+
+
+class StreamingSTTSession:
+    """
+    발화 하나에 대한 STT 세션 (start → feed* → finish, 중단 시 abort)
+    기본 동작은 프레임을 모았다가 finish에서 한 번에 /stt 요청 (buffered)
+    """
+
+    def __init__(self, base_url: str, fmt: AudioFormat):
+        self.base_url = base_url
+        self.fmt = fmt
+        self._pcm = bytearray()
+
+    async def start(self) -> None:
+        pass
+
+    async def feed(self, frame: bytes) -> None:
+        self._pcm.extend(frame)
+
+    async def finish(self) -> str:
+        return await self._transcribe_wav()
+
+    async def abort(self) -> None:
+        pass
+
+    async def _transcribe_wav(self) -> str:
+        """모은 PCM을 WAV로 감싸 기존 /stt 엔드포인트로 인식"""
+        uid = str(uuid.uuid4())
+        wav_bytes = self.fmt.to_wav(bytes(self._pcm))
+        debug_save_audio(wav_bytes, uid)
+        async with http_clients.borrow("stt") as client:
+            response = await client.post(f"{self.base_url}/stt", files=stt_files(wav_bytes, uid))
+            response.raise_for_status()
+            return response.json().get("text", "")
+
+
+class BufferedSTTSession(StreamingSTTSession):
+    """프레임을 모았다가 발화가 끝나면 한 번에 /stt 요청 (기본 동작 그대로)"""
+
+
+class HTTPStreamingSTTSession(StreamingSTTSession):
+    """
+    청크 전송(chunked) POST로 프레임을 받는 즉시 업스트림에 업로드
+    업스트림은 요청 본문이 끝나면 {"text": ...} 를 돌려준다.
+    스트리밍 요청이 실패하면 보관해 둔 PCM으로 /stt 재요청.
+    """
+
+    def __init__(self, base_url: str, fmt: AudioFormat):
+        super().__init__(base_url, fmt)
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _body(self):
+        while True:
+            frame = await self._queue.get()
+            if frame is None:
+                return
+            yield frame
+
+    async def _upload(self) -> str:
+        params = {
+            "sample_rate": self.fmt.sample_rate,
+            "channels": self.fmt.channels,
+            "encoding": "pcm_s16le",
+        }
+        async with http_clients.borrow("stt") as client:
+            response = await client.post(
+                f"{self.base_url}{STT_STREAM_PATH}",
+                params=params,
+                content=self._body(),
+                headers={"Content-Type": f"audio/L16; rate={self.fmt.sample_rate}; channels={self.fmt.channels}"}
+            )
+            response.raise_for_status()
+            return response.json().get("text", "")
+
+    async def start(self) -> None:
+        self._task = asyncio.ensure_future(self._upload())
+
+    async def feed(self, frame: bytes) -> None:
+        await super().feed(frame)
+        if self._task is not None and not self._task.done():
+            await self._queue.put(frame)
+
+    async def finish(self) -> str:
+        await self._queue.put(None)
+        try:
+            return await self._task
+        except Exception as e:
+            logger.warning(f"스트리밍 STT 실패, 모은 오디오로 /stt 재요청: {e}")
+            return await self._transcribe_wav()
+
+    async def abort(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+
+class LocalStandInSTTSession(StreamingSTTSession):
+    """업스트림 없이 동작하는 대체 구현 (테스트/로컬 개발용) - 발화가 있으면 고정 문장 반환"""
+
+    def __init__(self, base_url: str, fmt: AudioFormat, transcript: str = STT_LOCAL_TRANSCRIPT):
+        super().__init__(base_url, fmt)
+        self.transcript = transcript
+
+    async def finish(self) -> str:
+        logger.info(f"로컬 STT 대체: {self.fmt.duration_ms(bytes(self._pcm)):.0f}ms 오디오 → '{self.transcript}'")
+        return self.transcript if self._pcm else ""
+
+
+_SESSION_TYPES = {
+    "http": HTTPStreamingSTTSession,
+    "buffered": BufferedSTTSession,
+    "local": LocalStandInSTTSession,
+}
+
+
+def create_stt_session(base_url: str, fmt: AudioFormat, backend: str = STT_STREAM_BACKEND) -> StreamingSTTSession:
+    session_type = _SESSION_TYPES.get(backend)
+    if session_type is None:
+        logger.warning(f"알 수 없는 STT_STREAM_BACKEND '{backend}', buffered 사용")
+        session_type = BufferedSTTSession
+    return session_type(base_url, fmt)
+
+
+def parse_control(text: str) -> Optional[dict]:
+    """스트리밍 제어 메시지(audio_start/audio_end)면 dict, 아니면 None"""
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    if isinstance(data, dict) and data.get("type") in ("audio_start", "audio_end"):
+        return data
+    return None
+
+
+def is_stray_pcm(data: bytes) -> bool:
+    """
+    스트리밍 발화가 끝난 뒤 늦게 도착한 PCM 프레임인지 판단
+    (기존 방식의 발화 단위 업로드는 WAV 헤더로 시작한다)
+    """
+    return not data.startswith(b"RIFF")
+
+
+async def receive_streaming_utterance(websocket: WebSocket, start_message: dict, base_url: str) -> str:
+    """
+    audio_start 이후의 PCM 프레임을 받아 VAD로 발화 끝을 찾고 인식 결과를 반환
+
+    프레임은 발화가 시작된 순간부터 STT 세션으로 바로 전달된다.
+    발화가 감지되지 않으면 빈 문자열.
+    """
+    fmt = AudioFormat(
+        sample_rate=int(start_message.get("sample_rate", 16000)),
+        channels=int(start_message.get("channels", 1))
+    )
+    endpointer = EnergyEndpointer(fmt)
+    session = create_stt_session(base_url, fmt)
+    await session.start()
+    try:
+        while True:
+            message = await websocket.receive()
+            if message.get("type") == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes") is not None:
+                frames, done = endpointer.push(message["bytes"])
+                for frame in frames:
+                    await session.feed(frame)
+                if done:
+                    break
+            elif message.get("text") is not None:
+                control = parse_control(message["text"])
+                if control is not None and control["type"] == "audio_end":
+                    break
+
+        await websocket.send_text(json.dumps({"type": "event", "data": "VAD_ENDPOINT"}))
+        if not endpointer.heard_speech:
+            await session.abort()
+            return ""
+        return (await session.finish()).strip().lower()
+    except BaseException:
+        await session.abort()
+        raise
@@ -0,0 +1,289 @@
+"""
+TTS 오디오 캐시 (내용 주소 기반)
+
+같은 문장(고정 안내 문구, 레시피 단계)을 매번 TTS 서버에서 다시 합성하지 않도록
+(음성, 정규화한 텍스트) 의 해시를 키로 WAV 바이트를 디스크에 저장한다.
+- 디스크 위치: TTS_CACHE_DIR (docker-compose의 gateapi-tts-cache 볼륨)
+- 전체 크기가 TTS_CACHE_MAX_BYTES를 넘으면 가장 오래 쓰지 않은 항목부터 삭제 (LRU, 파일 mtime으로 영속)
+- 같은 텍스트에 대한 동시 합성은 하나로 합침 (요리 시작 시 미리 받기와 실제 요청이 겹치는 경우)
+- prefetch(): 다음 몇 단계 오디오를 백그라운드에서 미리 합성
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set
+
+from fastapi import WebSocket
+
+from fastapi_gateapi.http_clients import http_clients
+
+logger = logging.getLogger(__name__)
+
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tts_cache"))
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_MB", "512")) * 1024 * 1024
+# TTS 서버 음성/모델 이름 (바뀌면 캐시 키가 달라져 이전 오디오를 쓰지 않음)
+TTS_VOICE = os.getenv("TTS_VOICE", "default")
+# 요리 시작/단계 이동 시 미리 합성할 다음 단계 수
+TTS_PREFETCH_STEPS = int(os.getenv("TTS_PREFETCH_STEPS", "3"))
+# 미리 받기 동시 요청 수 (실시간 요청이 TTS 서버를 먼저 쓰도록 작게)
+TTS_PREFETCH_CONCURRENCY = 1
+
+# 캐시에서 보낼 때 웹소켓 메시지 하나의 크기
+SEND_CHUNK_BYTES = 64 * 1024
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def cache_key(text: str, voice: str = TTS_VOICE) -> str:
+    return hashlib.sha256(f"{voice}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """디스크 영속 + 크기 제한 LRU TTS 오디오 캐시"""
+
+    def __init__(
+        self,
+        directory: str = TTS_CACHE_DIR,
+        max_bytes: int = TTS_CACHE_MAX_BYTES,
+        voice: str = TTS_VOICE,
+        enabled: bool = TTS_CACHE_ENABLED
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.voice = voice
+        self.enabled = enabled
+        # 키 → 파일 크기 (앞쪽이 가장 오래 쓰지 않은 항목)
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._prefetch_tasks: Set[asyncio.Task] = set()
+        self._prefetch_semaphore: Optional[asyncio.Semaphore] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.prefetched = 0
+        self.errors = 0
+
+    # ---------------- 디스크 ----------------
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.wav")
+
+    def _load_index(self) -> None:
+        """기존 캐시 파일을 mtime 순서로 읽어 LRU 인덱스 복원"""
+        entries = []
+        if os.path.isdir(self.directory):
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    if not name.endswith(".wav"):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        entries.sort()
+        self._index = OrderedDict((key, size) for _, key, size in entries)
+        self._total_bytes = sum(self._index.values())
+        self._evict()
+
+    def _read(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+            os.utime(self._path(key))  # 재시작 후에도 LRU 순서 유지
+            return data
+        except OSError:
+            return None
+
+    def _write(self, key: str, audio: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(audio)
+        os.replace(tmp_path, path)  # 쓰는 도중의 파일을 다른 요청이 읽지 않도록
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    # ---------------- 조회/저장 ----------------
+
+    def contains(self, text: str) -> bool:
+        return self.enabled and cache_key(text, self.voice) in self._index
+
+    async def get(self, text: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        key = cache_key(text, self.voice)
+        if key not in self._index:
+            return None
+        audio = await asyncio.to_thread(self._read, key)
+        if audio is None:
+            # 파일이 외부에서 지워진 경우
+            self._total_bytes -= self._index.pop(key, 0)
+            return None
+        self._index.move_to_end(key)
+        return audio
+
+    async def put(self, text: str, audio: bytes) -> None:
+        if not self.enabled or not audio:
+            return
+        key = cache_key(text, self.voice)
+        try:
+            await asyncio.to_thread(self._write, key, audio)
+        except OSError as e:
+            self.errors += 1
+            logger.warning(f"TTS 캐시 저장 실패: {e}")
+            return
+        self._total_bytes += len(audio) - self._index.pop(key, 0)
+        self._index[key] = len(audio)
+        self._evict()
+
+    async def _synthesize(self, tts_base_url: str, text: str) -> bytes:
+        async with http_clients.borrow("tts") as client:
+            response = await client.post(f"{tts_base_url}/tts", json={"text": text})
+            response.raise_for_status()
+            return response.content
+
+    async def fetch(self, tts_base_url: str, text: str) -> bytes:
+        """캐시에서 찾고, 없으면 합성해서 저장 후 반환 (같은 텍스트 동시 합성은 하나로)"""
+        audio = await self.get(text)
+        if audio is not None:
+            self.hits += 1
+            return audio
+        key = cache_key(text, self.voice)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            # 다른 요청이 합성 중이면 그 결과를 기다림 (기다리는 쪽이 취소돼도 합성은 계속)
+            await asyncio.wait({inflight})
+            if not inflight.cancelled() and inflight.exception() is None:
+                self.hits += 1
+                return inflight.result()
+            # 먼저 시작한 합성이 실패/취소되면 직접 합성
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            audio = await self._synthesize(tts_base_url, text)
+            await self.put(text, audio)
+            future.set_result(audio)
+            return audio
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # 기다리는 쪽이 없어도 경고가 남지 않도록
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def stream_to(self, websocket: WebSocket, tts_base_url: str, text: str) -> None:
+        """
+        텍스트 오디오를 웹소켓으로 전송
+        캐시에 있거나 미리 받는 중이면 그 결과를, 없으면 TTS 서버 스트림을 그대로 전달하면서 저장한다.
+        """
+        key = cache_key(text, self.voice)
+        if self.enabled and (key in self._index or key in self._inflight):
+            audio = await self.fetch(tts_base_url, text)
+            for start in range(0, len(audio), SEND_CHUNK_BYTES):
+                await websocket.send_bytes(audio[start:start + SEND_CHUNK_BYTES])
+            return
+
+        self.misses += 1
+        chunks = []
+        async with http_clients.borrow("tts") as client:
+            async with client.stream("POST", f"{tts_base_url}/tts", json={"text": text}) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes():
+                    chunks.append(chunk)
+                    await websocket.send_bytes(chunk)
+        await self.put(text, b"".join(chunks))
+
+    # ---------------- 미리 받기 ----------------
+
+    async def _prefetch_one(self, tts_base_url: str, text: str) -> None:
+        if self._prefetch_semaphore is None:
+            self._prefetch_semaphore = asyncio.Semaphore(TTS_PREFETCH_CONCURRENCY)
+        async with self._prefetch_semaphore:
+            if self.contains(text):
+                return
+            try:
+                await self.fetch(tts_base_url, text)
+                self.prefetched += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"TTS 미리 받기 실패 ('{text[:30]}...'): {e}")
+
+    def prefetch(self, tts_base_url: str, texts: Iterable[str]) -> None:
+        """캐시에 없는 텍스트를 백그라운드에서 순서대로 합성 (결과를 기다리지 않음)"""
+        if not self.enabled:
+            return
+        for text in texts:
+            if not text or self.contains(text) or cache_key(text, self.voice) in self._inflight:
+                continue
+            task = asyncio.ensure_future(self._prefetch_one(tts_base_url, text))
+            self._prefetch_tasks.add(task)
+            task.add_done_callback(self._prefetch_tasks.discard)
+
+    # ---------------- 수명 주기 / 지표 ----------------
+
+    async def startup(self) -> None:
+        if not self.enabled:
+            logger.info("TTS 캐시 비활성화")
+            return
+        await asyncio.to_thread(self._load_index)
+        logger.info(
+            f"TTS 캐시 준비 완료: {len(self._index)}개, {self._total_bytes / 1024 / 1024:.1f}MB "
+            f"(최대 {self.max_bytes / 1024 / 1024:.0f}MB, 경로: {self.directory})"
+        )
+
+    async def shutdown(self) -> None:
+        for task in list(self._prefetch_tasks):
+            task.cancel()
+        self._prefetch_tasks.clear()
+        self._prefetch_semaphore = None
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "voice": self.voice,
+            "entries": len(self._index),
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "prefetched": self.prefetched,
+            "prefetching": len(self._prefetch_tasks),
+            "errors": self.errors,
+        }
+
+
+# 전역 인스턴스
+tts_cache = TTSCache()
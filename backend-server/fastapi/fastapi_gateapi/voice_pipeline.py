@@ -0,0 +1,262 @@
+"""
+LLM 토큰 스트리밍 + 문장 단위 TTS 파이프라인 (음성 챗봇용)
+
+LLM 응답을 토큰 스트림으로 받아 문장 경계에서 자르고, 문장이 완성되는 즉시 TTS를 호출해
+오디오 청크를 웹소켓으로 전달한다. 뒤 문장은 앞 문장 오디오를 보내는 동안 계속 생성되므로
+첫 오디오까지의 시간이 (LLM 전체 + TTS 전체) 에서 대략 (첫 문장 생성 + 첫 문장 TTS) 로 줄어든다.
+
+파이프라인 모드 웹소켓 메시지 (클라이언트가 ?tts_pipeline=true 로 접속했을 때):
+    {"type": "bot_text_delta", "data": "<문장>"}      문장이 완성될 때마다
+    <오디오 바이트 ...>                                 해당 문장의 WAV 청크
+    {"type": "event", "data": "TTS_SEGMENT_END"}       문장 하나의 오디오 끝 (여기서 재생 가능)
+    {"type": "bot_text", "data": "<전체 응답>"}         모든 문장이 끝난 뒤
+    {"type": "event", "data": "TTS_STREAM_END"}
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+from typing import AsyncIterator, Callable, List, Optional
+
+from fastapi import WebSocket
+
+from fastapi_gateapi.http_clients import http_clients
+
+logger = logging.getLogger(__name__)
+
+# 파이프라인 모드 기본값 (클라이언트가 tts_pipeline 쿼리 파라미터로 덮어쓸 수 있음)
+VOICE_TTS_PIPELINE = os.getenv("VOICE_TTS_PIPELINE", "false").lower() in ("1", "true", "yes")
+# AI 서버의 토큰 스트리밍 엔드포인트 (NDJSON / SSE / 일반 텍스트 청크 모두 허용)
+LLM_STREAM_PATH = os.getenv("AI_SERVER_LLM_STREAM_PATH", "/llm-generate-stream")
+# 동시에 진행할 문장 TTS 요청 수 (다음 문장 오디오를 미리 받아 둠)
+TTS_PREFETCH = int(os.getenv("VOICE_TTS_PREFETCH", "2"))
+
+# 너무 짧은 조각은 다음 문장과 합쳐서 TTS 호출 수를 줄임
+MIN_SENTENCE_CHARS = 8
+# 문장부호 없이 길어지면 쉼표/공백에서 강제로 자름
+MAX_SENTENCE_CHARS = 120
+
+# 문장 끝: 마침표/물음표/느낌표/말줄임표 뒤에 공백이 오거나 줄바꿈
+# (공백을 확인해야 "1.5컵" 같은 소수점에서 자르지 않음)
+_SENTENCE_END = re.compile(r"[.!?。！？…~]+[\"')\]]*(?=\s)|\n+")
+_SOFT_BREAK = re.compile(r"[,，、]\s|\s")
+
+
+def wants_pipeline(websocket: WebSocket) -> bool:
+    """웹소켓 쿼리 파라미터(tts_pipeline) 또는 환경변수로 파이프라인 모드 여부 결정"""
+    value = websocket.query_params.get("tts_pipeline")
+    if value is None:
+        return VOICE_TTS_PIPELINE
+    return value.lower() in ("1", "true", "yes")
+
+
+class SentenceSplitter:
+    """토큰 조각을 받아 완성된 문장을 돌려주는 증분 분할기"""
+
+    def __init__(self, min_chars: int = MIN_SENTENCE_CHARS, max_chars: int = MAX_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        self._buffer += text
+        sentences = []
+        while True:
+            sentence = self._next_sentence()
+            if sentence is None:
+                break
+            if sentence:
+                sentences.append(sentence)
+        return sentences
+
+    def _next_sentence(self) -> Optional[str]:
+        search_from = 0
+        while True:
+            match = _SENTENCE_END.search(self._buffer, search_from)
+            if match is None:
+                break
+            if len(self._buffer[:match.end()].strip()) >= self.min_chars:
+                return self._cut(match.end())
+            search_from = match.end()
+
+        if len(self._buffer) > self.max_chars:
+            # 문장부호 없이 길어진 경우 마지막 쉼표/공백에서 자름
+            cut = None
+            for soft in _SOFT_BREAK.finditer(self._buffer, 0, self.max_chars):
+                cut = soft.end()
+            return self._cut(cut or self.max_chars)
+        return None
+
+    def _cut(self, end: int) -> str:
+        sentence, self._buffer = self._buffer[:end], self._buffer[end:]
+        return sentence.strip()
+
+    def flush(self) -> Optional[str]:
+        rest, self._buffer = self._buffer.strip(), ""
+        return rest or None
+
+
+async def stream_llm_tokens(base_url: str, prompt: str, max_new_tokens: int = 100) -> AsyncIterator[str]:
+    """
+    AI 서버 토큰 스트리밍 엔드포인트에서 텍스트 조각을 순서대로 내보냄
+
+    응답 형식은 Content-Type으로 판단:
+    - application/x-ndjson: 줄마다 {"token": ...} / {"text": ...} / {"response": ...}
+    - text/event-stream: "data: ..." 줄 (JSON이면 위와 같은 키, 아니면 원문)
+    - 그 외: 받은 텍스트 청크 그대로
+    """
+    payload = {"prompt": prompt, "max_new_tokens": max_new_tokens, "stream": True}
+    async with http_clients.borrow("llm") as client:
+        async with client.stream("POST", f"{base_url}{LLM_STREAM_PATH}", json=payload) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("content-type", "")
+            if "ndjson" in content_type or "event-stream" in content_type:
+                async for line in response.aiter_lines():
+                    token = _parse_stream_line(line, sse="event-stream" in content_type)
+                    if token:
+                        yield token
+            else:
+                async for chunk in response.aiter_text():
+                    if chunk:
+                        yield chunk
+
+
+def _parse_stream_line(line: str, sse: bool) -> Optional[str]:
+    line = line.strip()
+    if sse:
+        if not line.startswith("data:"):
+            return None
+        line = line[5:].strip()
+        if line == "[DONE]":
+            return None
+    if not line:
+        return None
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return line if sse else None
+    if isinstance(data, dict):
+        return data.get("token") or data.get("text") or data.get("response")
+    return None
+
+
+async def _iter_text(text: str) -> AsyncIterator[str]:
+    yield text
+
+
+async def _synthesize(base_url: str, text: str, out: asyncio.Queue, semaphore: asyncio.Semaphore) -> None:
+    """문장 하나를 TTS로 변환해 청크를 큐에 넣음 (끝은 None, 실패 시 예외 객체)"""
+    try:
+        async with semaphore:
+            async with http_clients.borrow("tts") as client:
+                async with client.stream("POST", f"{base_url}/tts", json={"text": text}) as response:
+                    response.raise_for_status()
+                    async for chunk in response.aiter_bytes():
+                        await out.put(chunk)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        await out.put(e)
+    finally:
+        await out.put(None)
+
+
+async def speak_pipelined(
+    websocket: WebSocket,
+    tts_base_url: str,
+    tokens: AsyncIterator[str],
+    clean: Optional[Callable[[str], str]] = None,
+    max_chars: Optional[int] = None
+) -> str:
+    """
+    토큰 스트림을 문장 단위로 잘라 TTS와 파이프라인으로 처리하고 전체 응답 텍스트 반환
+
+    Args:
+        websocket: 클라이언트 웹소켓
+        tts_base_url: TTS 서버 주소
+        tokens: LLM 토큰(또는 이미 완성된 텍스트) 스트림
+        clean: 문장별 후처리 함수 (빈 문자열을 돌려주면 그 문장은 건너뜀)
+        max_chars: 누적 응답이 이 길이를 넘으면 생성 중단
+    """
+    splitter = SentenceSplitter()
+    semaphore = asyncio.Semaphore(max(TTS_PREFETCH, 1))
+    # (문장, 오디오 큐) 를 순서대로 담는 큐, 끝은 None
+    # 웹소켓 송신은 아래 소비 루프 한 곳에서만 한다 (동시 send 방지)
+    segments: asyncio.Queue = asyncio.Queue()
+    spoken: List[str] = []
+    tts_tasks: List[asyncio.Task] = []
+
+    async def produce() -> None:
+        total = 0
+
+        async def emit(sentence: str) -> bool:
+            nonlocal total
+            if clean is not None:
+                sentence = clean(sentence)
+            if not sentence:
+                return True
+            spoken.append(sentence)
+            total += len(sentence)
+            audio: asyncio.Queue = asyncio.Queue()
+            tts_tasks.append(asyncio.ensure_future(_synthesize(tts_base_url, sentence, audio, semaphore)))
+            await segments.put((sentence, audio))
+            return max_chars is None or total < max_chars
+
+        try:
+            async for token in tokens:
+                for sentence in splitter.feed(token):
+                    if not await emit(sentence):
+                        logger.info(f"응답이 {max_chars}자를 넘어 생성 중단")
+                        return
+            rest = splitter.flush()
+            if rest:
+                await emit(rest)
+        finally:
+            await segments.put(None)
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        # 문장 순서대로 오디오 전달 (뒤 문장은 그동안 생성/합성 진행)
+        while True:
+            segment = await segments.get()
+            if segment is None:
+                break
+            sentence, audio = segment
+            await websocket.send_text(json.dumps({"type": "bot_text_delta", "data": sentence}))
+            while True:
+                chunk = await audio.get()
+                if chunk is None:
+                    break
+                if isinstance(chunk, Exception):
+                    logger.error(f"문장 TTS 실패: {chunk}")
+                    continue
+                await websocket.send_bytes(chunk)
+            await websocket.send_text(json.dumps({"type": "event", "data": "TTS_SEGMENT_END"}))
+        try:
+            await producer
+        except Exception as e:
+            if not spoken:
+                raise  # 아무것도 말하지 못했으면 호출자가 일반 경로로 대체
+            logger.error(f"LLM 스트림 중단, 생성된 {len(spoken)}개 문장까지만 전달: {e}")
+    finally:
+        for task in [producer, *tts_tasks]:
+            if not task.done():
+                task.cancel()
+
+    full_text = " ".join(spoken)
+    await websocket.send_text(json.dumps({"type": "bot_text", "data": full_text}))
+    await websocket.send_text(json.dumps({"type": "event", "data": "TTS_STREAM_END"}))
+    return full_text
+
+
+async def speak_text_pipelined(
+    websocket: WebSocket,
+    tts_base_url: str,
+    text: str,
+    clean: Optional[Callable[[str], str]] = None,
+    max_chars: Optional[int] = None
+) -> str:
+    """이미 완성된 텍스트를 문장 단위 TTS로 전달 (긴 단계 안내의 첫 오디오 지연 단축)"""
+    return await speak_pipelined(websocket, tts_base_url, _iter_text(text), clean=clean, max_chars=max_chars)
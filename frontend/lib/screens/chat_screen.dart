@@ -162,6 +162,7 @@ class _ChatScreenState extends State<ChatScreen> {
               'id': widget.recipe!.id,
               'title': widget.recipe!.title,
               'content': widget.recipe!.content,
+              'steps': widget.recipe!.steps,
               'description': widget.recipe!.description,
               'ingredients': widget.recipe!.ingredients,
               'servings': widget.recipe!.servings,